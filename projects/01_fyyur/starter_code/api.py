@@ -0,0 +1,281 @@
+import hashlib
+import json
+import dateutil.parser
+from datetime import datetime, timedelta
+from flask import Blueprint, current_app, request, jsonify, abort, url_for, stream_with_context
+from werkzeug.exceptions import HTTPException
+from models import db, Venue, Artist, Show
+from routing import replica_reads
+from listings import (area_listing, venue_page, artist_page, artist_listing, show_listing_page, show_listing_dict,
+                      show_calendar_page, show_calendar, show_calendar_dict, recommendations)
+from formatting import ical_calendar
+from summaries import show_clock, genre_facets
+from bookings import SHOW_LENGTH, free_slots
+
+#----------------------------------------------------------------------------#
+# JSON API.
+#----------------------------------------------------------------------------#
+
+# Read-only JSON versions of the venue, artist and show pages under /api/v1.
+#
+# Every response carries an ETag and Last-Modified derived from the version
+# stamps on Venue and Artist (see models.py), which are read with one small
+# query. A client that sends back a matching If-None-Match or If-Modified-Since
+# gets a 304 before any show is queried. Resources that split shows into
+# upcoming and past also change as time passes, so their validators include
+# the current API_ETAG_WINDOW-second time window. The calendar exports, a
+# venue's free slots and the recommendations are answered afresh every time.
+
+api = Blueprint('api', __name__, url_prefix='/api/v1')
+
+# Errors raised by the API views are answered in JSON rather than by the
+# app's HTML error pages; 404 and 500 are named as well because the app's own
+# handlers for those codes would otherwise be found first. URLs under the
+# prefix that match no route reach the app's handlers, which call this too.
+@api.errorhandler(HTTPException)
+@api.errorhandler(404)
+@api.errorhandler(500)
+def json_error(error):
+    response = jsonify({"status": error.code, "error": error.name, "message": error.description})
+    if getattr(error, "valid_methods", None):
+        response.headers["Allow"] = ", ".join(error.valid_methods)
+    return response, error.code
+
+def time_window(window):
+    # start of the current window of the given seconds, in UTC
+    now = datetime.utcnow()
+    return now - timedelta(seconds=(now - datetime(1970, 1, 1)).total_seconds() % window)
+
+def make_etag(*parts):
+    return hashlib.sha1("-".join(str(part) for part in parts).encode()).hexdigest()
+
+def validators_match(if_none_match, since, etag, last_modified):
+    # whether a client sending these If-None-Match (werkzeug ETags) and
+    # If-Modified-Since values already has the current representation
+    if if_none_match:
+        return if_none_match.contains(etag)
+    if since is None or last_modified is None:
+        return False
+    if since.tzinfo is not None:
+        since = since.replace(tzinfo=None) - since.utcoffset()
+    # HTTP dates have whole-second precision
+    return last_modified.replace(microsecond=0) <= since
+
+def not_modified(etag, last_modified):
+    return validators_match(request.if_none_match, request.if_modified_since, etag, last_modified)
+
+def conditional(etag, last_modified, build):
+    # answer 304 if the client's copy is current, else the JSON from build()
+    if not_modified(etag, last_modified):
+        response = current_app.response_class(status=304)
+    else:
+        response = jsonify(build())
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    return response
+
+def iso_start_times(shows):
+    for show in shows:
+        show["start_time"] = show["start_time"].isoformat()
+    return shows
+
+
+def genre_args():
+    # ?genre=Jazz&genre=Blues matches listings with either genre, adding
+    # &match=all those with both
+    return request.args.getlist('genre'), request.args.get('match') == 'all'
+
+@api.route('/venues')
+@replica_reads
+def venues():
+    window = time_window(current_app.config["API_ETAG_WINDOW"])
+    count, updated_at = db.session.query(db.func.count(Venue.id), db.func.max(Venue.updated_at)).one()
+    last_modified = max(updated_at or window, window)
+    etag = make_etag("venues", count, updated_at, window, request.query_string.decode())
+    return conditional(etag, last_modified, lambda: {
+        "areas": area_listing(*genre_args())
+    })
+
+@api.route('/venues/<int:venue_id>')
+@replica_reads
+def show_venue(venue_id):
+    stamp = db.session.query(Venue.version, Venue.updated_at).filter(Venue.id == venue_id).first()
+    if stamp is None:
+        abort(404)
+    window = time_window(current_app.config["API_ETAG_WINDOW"])
+    etag = make_etag("venue", venue_id, stamp.version, window)
+
+    def build():
+        data = venue_page(Venue.query.get(venue_id))
+        iso_start_times(data["past_shows"])
+        iso_start_times(data["upcoming_shows"])
+        return data
+    return conditional(etag, max(stamp.updated_at, window), build)
+
+@api.route('/venues/<int:venue_id>/recommended-artists')
+@replica_reads
+def venue_recommendations(venue_id):
+    if Venue.query.get(venue_id) is None:
+        abort(404)
+    return jsonify({"venue_id": venue_id, "artists": recommendations("venue", venue_id)})
+
+@api.route('/artists')
+@replica_reads
+def artists():
+    count, updated_at = db.session.query(db.func.count(Artist.id), db.func.max(Artist.updated_at)).one()
+    etag = make_etag("artists", count, updated_at, request.query_string.decode())
+    return conditional(etag, updated_at, lambda: {"artists": artist_listing(*genre_args())})
+
+@api.route('/artists/<int:artist_id>/recommended-venues')
+@replica_reads
+def artist_recommendations(artist_id):
+    if Artist.query.get(artist_id) is None:
+        abort(404)
+    return jsonify({"artist_id": artist_id, "venues": recommendations("artist", artist_id)})
+
+@api.route('/genres')
+@replica_reads
+def genres():
+    # how many venues and artists list each genre, from the GenreCount table;
+    # genre writes insert or update listings, which changes these stamps
+    venues_count, venues_updated = db.session.query(db.func.count(Venue.id), db.func.max(Venue.updated_at)).one()
+    artists_count, artists_updated = db.session.query(db.func.count(Artist.id), db.func.max(Artist.updated_at)).one()
+    last_modified = max(filter(None, [venues_updated, artists_updated]), default=None)
+    etag = make_etag("genres", venues_count, venues_updated, artists_count, artists_updated)
+
+    def build():
+        facets = genre_facets()
+        return {
+            "venues": [{"genre": genre, "count": total} for genre, total in facets["venue"]],
+            "artists": [{"genre": genre, "count": total} for genre, total in facets["artist"]]
+        }
+    return conditional(etag, last_modified, build)
+
+@api.route('/artists/<int:artist_id>')
+@replica_reads
+def show_artist(artist_id):
+    stamp = db.session.query(Artist.version, Artist.updated_at).filter(Artist.id == artist_id).first()
+    if stamp is None:
+        abort(404)
+    window = time_window(current_app.config["API_ETAG_WINDOW"])
+    etag = make_etag("artist", artist_id, stamp.version, window)
+
+    def build():
+        data = artist_page(Artist.query.get(artist_id))
+        iso_start_times(data["past_shows"])
+        iso_start_times(data["upcoming_shows"])
+        return data
+    return conditional(etag, max(stamp.updated_at, window), build)
+
+def after_key():
+    # (start time, show id) after which a show listing continues
+    after_time = request.args.get('after_time')
+    after_id = request.args.get('after_id', type=int)
+    if after_time:
+        try:
+            after_time = dateutil.parser.parse(after_time)
+        except (ValueError, OverflowError):
+            abort(400)
+    return after_time or None, after_id
+
+def show_list_validators(name):
+    # shows are only ever added, or removed with their venue, which bumps the
+    # artists that played there; renames and moves bump the venue or artist
+    last_show = db.session.query(db.func.max(Show.id)).scalar()
+    venues_updated = db.session.query(db.func.max(Venue.updated_at)).scalar()
+    artists_updated = db.session.query(db.func.max(Artist.updated_at)).scalar()
+    last_modified = max(filter(None, [venues_updated, artists_updated]), default=None)
+    etag = make_etag(name, last_show, venues_updated, artists_updated, request.query_string.decode())
+    return etag, last_modified
+
+@api.route('/shows')
+@replica_reads
+def shows():
+    after_time, after_id = after_key()
+    etag, last_modified = show_list_validators("shows")
+
+    def build():
+        rows, next_key = show_listing_page(current_app.config["SHOWS_PAGE_SIZE"], after_time, after_id)
+        next_page = None
+        if next_key is not None:
+            next_page = url_for('api.shows', after_time=next_key[0].isoformat(), after_id=next_key[1])
+        return {
+            "shows": iso_start_times([show_listing_dict(row) for row in rows]),
+            "next": next_page
+        }
+    return conditional(etag, last_modified, build)
+
+def calendar_filters():
+    # start and end (wall clock times like the show times), city and state
+    try:
+        start, end = [dateutil.parser.parse(request.args[name], ignoretz=True) if request.args.get(name) else None
+                      for name in ("start", "end")]
+    except (ValueError, OverflowError):
+        abort(400)
+    return start, end, request.args.get('city') or None, request.args.get('state') or None
+
+@api.route('/shows/calendar')
+@replica_reads
+def calendar():
+    # shows in a date range and/or area, e.g. a city's next weekend:
+    # ?start=2030-06-07&end=2030-06-10&city=San Francisco&state=CA
+    filters = calendar_filters()
+    after_time, after_id = after_key()
+    etag, last_modified = show_list_validators("calendar")
+
+    def build():
+        rows, next_key = show_calendar_page(current_app.config["SHOWS_PAGE_SIZE"], *filters,
+                                            after_time=after_time, after_id=after_id)
+        next_page = None
+        if next_key is not None:
+            args = dict(request.args.items(), after_time=next_key[0].isoformat(), after_id=next_key[1])
+            next_page = url_for('api.calendar', **args)
+        return {
+            "shows": iso_start_times([show_calendar_dict(row) for row in rows]),
+            "next": next_page
+        }
+    return conditional(etag, last_modified, build)
+
+@api.route('/shows/calendar.<any(ics, jsonl):format>')
+@replica_reads
+def calendar_export(format):
+    # the whole range as iCalendar or JSON lines, streamed while the rows are
+    # read from a server-side cursor
+    rows = show_calendar(*calendar_filters())
+    if format == "jsonl":
+        lines = (json.dumps(iso_start_times([show_calendar_dict(row)])[0], sort_keys=True) + "\n" for row in rows)
+        return current_app.response_class(stream_with_context(lines), mimetype="application/x-ndjson")
+    host = request.host
+    events = ({
+        "uid": "show-%d@%s" % (row.show_id, host),
+        "start": row.start_time,
+        "end": row.start_time + SHOW_LENGTH,
+        "summary": "%s at %s" % (row.artist_name, row.venue_name),
+        "location": ", ".join(filter(None, [row.venue_name, row.address, row.city, row.state]))
+    } for row in rows)
+    calendar = ical_calendar(events, current_app.config["SHOWS_TIMEZONE"])
+    return current_app.response_class(stream_with_context(calendar), mimetype="text/calendar")
+
+@api.route('/venues/<int:venue_id>/free-slots')
+def venue_free_slots(venue_id):
+    # when the venue, and optionally an artist, is free between start
+    # (default now) and end (default a week later), wall clock times like the
+    # show times; read from the primary since bookers act on the answer
+    try:
+        start = dateutil.parser.parse(request.args['start'], ignoretz=True) if 'start' in request.args else show_clock()
+        end = dateutil.parser.parse(request.args['end'], ignoretz=True) if 'end' in request.args else start + timedelta(days=7)
+    except (ValueError, OverflowError):
+        abort(400)
+    if not start < end <= start + timedelta(days=current_app.config["FREE_SLOTS_MAX_DAYS"]):
+        abort(400)
+    artist_id = request.args.get('artist_id', type=int)
+    if Venue.query.get(venue_id) is None or (artist_id is not None and Artist.query.get(artist_id) is None):
+        abort(404)
+    return jsonify({
+        "venue_id": venue_id,
+        "artist_id": artist_id,
+        "show_length_minutes": int(SHOW_LENGTH.total_seconds() // 60),
+        "free_slots": [{"from": slot_start.isoformat(), "until": slot_end.isoformat()}
+                       for slot_start, slot_end in free_slots(venue_id, start, end, SHOW_LENGTH, artist_id)]
+    })
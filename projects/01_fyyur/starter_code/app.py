@@ -2,14 +2,13 @@
 # Imports
 #----------------------------------------------------------------------------#
 
-import json
+import click
 import dateutil.parser
-import babel
 from flask import (
-  Flask,
   render_template,
   request,
   Response,
+  stream_with_context,
   flash,
   redirect,
   url_for,
@@ -17,60 +16,52 @@ from flask import (
   abort
 )
 from flask_moment import Moment
-from flask_sqlalchemy import SQLAlchemy
 import logging
 from logging import Formatter, FileHandler
-from flask_wtf import Form
 from forms import *
-from flask_migrate import Migrate
-from datetime import datetime
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 
 #----------------------------------------------------------------------------#
 # App Config.
 #----------------------------------------------------------------------------#
 
-from models import app, db, Venue, Artist, Show
+from models import app, db, Venue, Artist, Show, bump_versions
+from search import search_names, venue_index, artist_index, init_search
+from summaries import upcoming_show_counts, refresh_area_summary, init_area_summary, add_to_feed, add_show_totals, rebuild_show_feed, rebuild_genre_counts
+from formatting import DateTimeFormatter
+from listings import area_listing, venue_page, artist_page, artist_listing, show_listing, show_listing_page, show_listing_dict
+from importer import import_file
+from catalog import delete_venues, update_listing
+from bookings import booking_conflicts, SHOW_LENGTH
+from api import api, json_error
+from profiler import query_profiler
+from pool import pool_monitor
+from routing import replica_reads, init_replica_routing
+from cache import page_cache, next_show_start, invalidate_venue, invalidate_deleted_venues, invalidate_artist, invalidate_show
 
 app.config.from_object('config')
 moment = Moment(app)
 db.init_app(app)
+pool_monitor.init_app(app)
+init_replica_routing(app)
+page_cache.init_app(app)
+app.register_blueprint(api)
+query_profiler.init_app(app)
+init_search(app)
+init_area_summary(app)
 
 
 #----------------------------------------------------------------------------#
 # Filters.
 #----------------------------------------------------------------------------#
 
+datetime_formatter = DateTimeFormatter(app.config["DATETIME_LOCALE"], app.config["DATETIME_CACHE_SIZE"])
+
 def format_datetime(value, format='medium'):
-  if isinstance(value, datetime):
-    date = value
-  else:
-    date = dateutil.parser.parse(value)
-  if format == 'full':
-      format="EEEE MMMM, d, y 'at' h:mma"
-  elif format == 'medium':
-      format="EE MM, dd, y h:mma"
-  return babel.dates.format_datetime(date, format, locale='en_US')
+  return datetime_formatter.format(value, format)
 
 app.jinja_env.filters['datetime'] = format_datetime
 
-#----------------------------------------------------------------------------#
-# Random Utility Functions.
-#----------------------------------------------------------------------------#
-
-def upcoming_shows(objectID, object="venue"):
-  if object=="venue":
-    all_shows = Show.query.filter_by(venue_id = objectID).all()
-  elif object=="artist":
-    all_shows = Show.query.filter_by(artist_id = objectID).all()
-  else:
-    raise ValueError("object must be venue or artist")
-  current_time = datetime.now()
-  counter = 0
-  for show in all_shows:
-    if show.time > current_time:
-      counter += 1
-  return counter
-
 #----------------------------------------------------------------------------#
 # Controllers.
 #----------------------------------------------------------------------------#
@@ -84,105 +75,44 @@ def index():
 #  ----------------------------------------------------------------
 
 @app.route('/venues')
+@replica_reads
 def venues():
-  venues_by_location = {}
-
-  venues = Venue.query.all()
-  for venue in venues:
-    venue_dict = {}
-    venue_dict["id"] = venue.id
-    venue_dict["name"] = venue.name
-    venue_dict["num_upcoming_shows"] = upcoming_shows(venue.id)
-    # add venue to the location dictionary of venues
-    location = (venue.city, venue.state)
-    try:
-      venues_by_location[location].append(venue_dict)
-    except KeyError:
-      venues_by_location[location] = [venue_dict]
-  
-  data = []
-
-  for location in venues_by_location:
-    loc_dict = {}
-    loc_dict["city"] = location[0]
-    loc_dict["state"] = location[1]
-    loc_dict["venues"] = venues_by_location[location]
-    data.append(loc_dict)
-
-  return render_template('pages/venues.html', areas=data);
+  cached = page_cache.get("venues;")
+  if cached is not None:
+    return cached
+  data = area_listing()
+  page = render_template('pages/venues.html', areas=data)
+  page_cache.set("venues;", page, expires_at=next_show_start())
+  return page
 
 @app.route('/venues/search', methods=['POST'])
+@replica_reads
 def search_venues():
-  response={
-    "count": 1,
-    "data": [{
-      "id": 2,
-      "name": "The Dueling Pianos Bar",
-      "num_upcoming_shows": 0,
-    }]
-  }
-
   search_term=request.form.get('search_term', '')
+  page=request.form.get('page', 1, type=int)
 
-  all_venues = Venue.query.all()
-  matches = []
-  for venue in all_venues:
-    if search_term.upper() in venue.name.upper():
-      match = {
-        "id": venue.id,
-        "name": venue.name,
-        "num_upcoming_shows": upcoming_shows(venue.id)
-      }
-      matches.append(match)
-  
-  response = {}
-  response["count"] = len(matches)
-  response["data"] = matches
+  response = search_names(Venue, search_term, page, app.config["SEARCH_PAGE_SIZE"], app.config["SEARCH_ENGINE"],
+                          app.config["SEARCH_MIN_TERM_LENGTH"], app.config["SEARCH_MAX_COUNT"])
+  show_counts = upcoming_show_counts([match["id"] for match in response["data"]])
+  for match in response["data"]:
+    match["num_upcoming_shows"] = show_counts.get(match["id"], 0)
 
   return render_template('pages/search_venues.html', results=response, search_term=search_term)
 
 @app.route('/venues/<int:venue_id>')
+@replica_reads
 def show_venue(venue_id):
+  cached = page_cache.get("venue:%d;" % venue_id)
+  if cached is not None:
+    return cached
   venue = Venue.query.get(venue_id)
-  data = {
-    "id": venue.id,
-    "name": venue.name,
-    "genres": venue.genres,
-    "address": venue.address,
-    "city": venue.city,
-    "state": venue.state,
-    "phone": venue.phone,
-    "website": venue.website_link,
-    "facebook_link": venue.facebook_link,
-    "seeking_talent": venue.seeking_talent,
-    "image_link": venue.image_link
-  }
-  if venue.seeking_talent == True:
-    data["seeking_description"] = venue.seeking_talent_message
-  
-  # bucket associated shows
-  past_shows = []
-  upcoming_shows = []
-  current_time = datetime.now()
-  all_shows = Show.query.filter_by(venue_id = venue_id).all()
-  for show in all_shows:
-    show_dict = {
-      "artist_id": show.artist.id,
-      "artist_name": show.artist.name,
-      "artist_image_link": show.artist.image_link,
-      "start_time": show.time
-    }
-    if show.time > current_time:
-      upcoming_shows.append(show_dict)
-    else:
-      past_shows.append(show_dict)
-  
-  data["past_shows"] = past_shows
-  data["upcoming_shows"] = upcoming_shows
-  data["past_shows_count"] = len(past_shows)
-  data["upcoming_shows_count"] = len(upcoming_shows)
+  data = venue_page(venue)
 
-  return render_template('pages/show_venue.html', venue=data)
+  page = render_template('pages/show_venue.html', venue=data)
+  # the page changes when its next upcoming show starts
+  next_show = data["upcoming_shows"][0]["start_time"] if data["upcoming_shows"] else None
+  page_cache.set("venue:%d;" % venue_id, page, expires_at=next_show)
+  return page
 
 #  Create Venue
 #  ----------------------------------------------------------------
@@ -201,8 +131,8 @@ def create_venue_submission():
     return render_template('forms/new_venue.html', form=form)
   else:
     # check for existing venue with the same name in the same city
-    duplicate_venues = Venue.query.filter_by(name = form.data["name"], city = form.data["city"], state = form.data["state"]).all()
-    if len(duplicate_venues) > 0:
+    duplicate_venue = Venue.query.filter_by(name = form.data["name"], city = form.data["city"], state = form.data["state"]).first()
+    if duplicate_venue is not None:
       flash("Venue " + form.data["name"] + " in " + form.data["city"] + " already exists.")
       return render_template('forms/new_venue.html', form=form)
     # prepare and execute db write
@@ -217,8 +147,17 @@ def create_venue_submission():
       ##test_other = field_value["genres"]
       db.session.add(venue)
       db.session.commit()
+      venue_index.add(venue.id, venue.name)
+      refresh_area_summary([venue.id])
+      page_cache.invalidate("venues;")
       flash('Venue ' + form.data["name"] + ' was successfully listed!')
-    except():
+    except IntegrityError:
+      # created meanwhile by another request (unique index)
+      db.session.rollback()
+      flash("Venue " + form.data["name"] + " in " + form.data["city"] + " already exists.")
+      return render_template('forms/new_venue.html', form=form)
+    except SQLAlchemyError:
+      app.logger.exception('Creating venue %s failed', form.data["name"])
       db.session.rollback()
       flash('An error occurred. Venue ' + form.data["name"] + ' could not be listed.')
     finally:
@@ -228,102 +167,106 @@ def create_venue_submission():
 
 @app.route('/venues/<venue_id>', methods=['DELETE'])
 def delete_venue(venue_id):
+  try:
+    venue_id = int(venue_id)
+  except ValueError:
+    abort(404)
+  counts = remove_venues([venue_id])
+  if not counts['venues']:
+    abort(404)
+  return jsonify(dict(counts, success=True))
+
+@app.route('/venues/delete', methods=['POST'])
+def delete_venues_submission():
+  # batch delete: {"venue_ids": [1, 2, ...]} as JSON
+  data = request.get_json(silent=True) or {}
+  venue_ids = data.get('venue_ids')
+  if not isinstance(venue_ids, list) or len(venue_ids) > app.config['VENUE_DELETE_MAX_IDS']:
+    abort(400)
+  try:
+    venue_ids = {int(venue_id) for venue_id in venue_ids}
+  except (TypeError, ValueError):
+    abort(400)
+  return jsonify(dict(remove_venues(venue_ids), success=True))
+
+def remove_venues(venue_ids):
+  # shared by the single and batch deletes: the shows go with their venues
+  # in a few set-based statements (see catalog.py)
   error = False
   try:
-    venue = Venue.query.get(venue_id)
-    db.session.delete(venue)
+    venues, shows, artist_ids = delete_venues(venue_ids)
     db.session.commit()
-  except():
+    for venue_id in venue_ids:
+      venue_index.remove(venue_id)
+    refresh_area_summary(list(venue_ids))
+    invalidate_deleted_venues(venue_ids, artist_ids)
+  except SQLAlchemyError:
+    app.logger.exception('Deleting venues %s failed', venue_ids)
     db.session.rollback()
     error = True
   finally:
     db.session.close()
   if error:
     abort(500)
-  else:
-    return jsonify({'success': True})
+  return {'venues': venues, 'shows': shows}
 
 #  Artists
 #  ----------------------------------------------------------------
 @app.route('/artists')
+@replica_reads
 def artists():
-  all_artists = Artist.query.all()
-  data = []
-  for artist in all_artists:
-    data.append({"id": artist.id, "name": artist.name})
-
-  return render_template('pages/artists.html', artists=data)
+  cached = page_cache.get("artists;")
+  if cached is not None:
+    return cached
+  page = render_template('pages/artists.html', artists=artist_listing())
+  page_cache.set("artists;", page)
+  return page
 
 @app.route('/artists/search', methods=['POST'])
+@replica_reads
 def search_artists():
   search_term=request.form.get('search_term', '')
+  page=request.form.get('page', 1, type=int)
 
-  all_artists = Artist.query.all()
-  matches = []
-  for artist in all_artists:
-    if search_term.upper() in artist.name.upper():
-      match = {
-        "id": artist.id,
-        "name": artist.name,
-        "num_upcoming_shows": upcoming_shows(artist.id, object="artist")
-      }
-      matches.append(match)
-  
-  response = {}
-  response["count"] = len(matches)
-  response["data"] = matches
+  response = search_names(Artist, search_term, page, app.config["SEARCH_PAGE_SIZE"], app.config["SEARCH_ENGINE"],
+                          app.config["SEARCH_MIN_TERM_LENGTH"], app.config["SEARCH_MAX_COUNT"])
+  show_counts = upcoming_show_counts([match["id"] for match in response["data"]], object="artist")
+  for match in response["data"]:
+    match["num_upcoming_shows"] = show_counts.get(match["id"], 0)
 
   return render_template('pages/search_artists.html', results=response, search_term=search_term)
 
 @app.route('/artists/<int:artist_id>')
+@replica_reads
 def show_artist(artist_id):
+  cached = page_cache.get("artist:%d;" % artist_id)
+  if cached is not None:
+    return cached
   artist = Artist.query.get(artist_id)
-  data = {
-    "id": artist.id,
-    "name": artist.name,
-    "genres": artist.genres,
-    "city": artist.city,
-    "state": artist.state,
-    "phone": artist.phone,
-    "website": artist.website_link,
-    "facebook_link": artist.facebook_link,
-    "seeking_venue": artist.seeking_venue,
-    "image_link": artist.image_link
-  }
-  if artist.seeking_venue == True:
-    data["seeking_description"] = artist.seeking_venue_message
-  
-  # bucket associated shows in past vs upcoming
-  past_shows = []
-  upcoming_shows = []
-  current_time = datetime.now()
-  all_shows = Show.query.filter_by(artist_id = artist_id).all()
-  for show in all_shows:
-    show_dict = {
-      "venue_id": show.venue.id,
-      "venue_name": show.venue.name,
-      "venue_image_link": show.venue.image_link,
-      "start_time": show.time
-    }
-    if show.time > current_time:
-      upcoming_shows.append(show_dict)
-    else:
-      past_shows.append(show_dict)
-  
-  data["past_shows"] = past_shows
-  data["upcoming_shows"] = upcoming_shows
-  data["past_shows_count"] = len(past_shows)
-  data["upcoming_shows_count"] = len(upcoming_shows)
+  data = artist_page(artist)
 
-  return render_template('pages/show_artist.html', artist=data)
+  page = render_template('pages/show_artist.html', artist=data)
+  # the page changes when its next upcoming show starts
+  next_show = data["upcoming_shows"][0]["start_time"] if data["upcoming_shows"] else None
+  page_cache.set("artist:%d;" % artist_id, page, expires_at=next_show)
+  return page
 
 #  Update
 #  ----------------------------------------------------------------
 @app.route('/artists/<int:artist_id>/edit', methods=['GET'])
+@replica_reads
 def edit_artist(artist_id):
-  artist = Artist.query.get(artist_id)
+  artist = Artist.query.get_or_404(artist_id)
   form = ArtistForm(obj=artist)
-  return render_template('forms/edit_artist.html', form=form, artist=artist)
+  return render_template('forms/edit_artist.html', form=form, artist=artist, version=artist.edit_version)
+
+def edit_artist_again(artist_id, form, version=None):
+  # show a submitted edit form again with its values; without a version the
+  # current one goes in, so that saving it again overwrites
+  artist = Artist.query.get_or_404(artist_id)
+  if version is None:
+    version = artist.edit_version
+  return render_template('forms/edit_artist.html', form=form, artist=artist, version=version)
 
 @app.route('/artists/<int:artist_id>/edit', methods=['POST'])
 def edit_artist_submission(artist_id):
@@ -335,6 +278,11 @@ def edit_artist_submission(artist_id):
     flash("Please correct the following errors: " + str(form.errors))
     return redirect(url_for('edit_artist_submission', artist_id=artist_id))
   else:
+    # check for another artist with the same name in the same city
+    duplicate_artist = Artist.query.filter(Artist.id != artist_id).filter_by(name = form.data["name"], city = form.data["city"], state = form.data["state"]).first()
+    if duplicate_artist is not None:
+      flash("An artist named " + form.data["name"] + " already exists in " + form.data["city"] + ".")
+      return edit_artist_again(artist_id, form, request.form.get('edit_version', type=int))
     # prepare and execute db write
     try:
       # clean up and augment field values
@@ -344,13 +292,26 @@ def edit_artist_submission(artist_id):
         field_values["seeking_venue"] = False
       else:
         field_values["seeking_venue"] = True
-      # try and persist the updated artist date in the database
-      artist = Artist.query.get(artist_id)
-      for key, value in field_values.items():
-        setattr(artist, key, value)
+      # write only the changed columns, unless the artist was edited meanwhile
+      changes = update_listing(Artist, artist_id, field_values, request.form.get('edit_version', type=int))
+      if changes is None:
+        flash('Artist with ID' + str(artist_id) + ' was changed meanwhile. Your changes are shown below: review them and save again to overwrite.')
+        return edit_artist_again(artist_id, form)
       db.session.commit()
+      if not changes:
+        flash('Artist with ID' + str(artist_id) + ' had no changes to save.')
+        return redirect(url_for('show_artist', artist_id=artist_id))
+      if "name" in changes:
+        artist_index.add(artist_id, changes["name"])
+      invalidate_artist(artist_id)
       flash('Artist with ID' + str(artist_id) + ' was successfully updated!')
-    except():
+    except IntegrityError:
+      # the same name and city saved meanwhile (unique index)
+      db.session.rollback()
+      flash("An artist named " + form.data["name"] + " already exists in " + form.data["city"] + ".")
+      return edit_artist_again(artist_id, form, request.form.get('edit_version', type=int))
+    except SQLAlchemyError:
+      app.logger.exception('Updating artist %s failed', artist_id)
       db.session.rollback()
       flash('An error occurred. Artist with ID' + str(artist_id) + ' could not be updated.')
     finally:
@@ -358,10 +319,19 @@ def edit_artist_submission(artist_id):
     return redirect(url_for('show_artist', artist_id=artist_id))
 
 @app.route('/venues/<int:venue_id>/edit', methods=['GET'])
+@replica_reads
 def edit_venue(venue_id):
-  venue = Venue.query.get(venue_id)
+  venue = Venue.query.get_or_404(venue_id)
   form = VenueForm(obj=venue)
-  return render_template('forms/edit_venue.html', form=form, venue=venue)
+  return render_template('forms/edit_venue.html', form=form, venue=venue, version=venue.edit_version)
+
+def edit_venue_again(venue_id, form, version=None):
+  # show a submitted edit form again with its values; without a version the
+  # current one goes in, so that saving it again overwrites
+  venue = Venue.query.get_or_404(venue_id)
+  if version is None:
+    version = venue.edit_version
+  return render_template('forms/edit_venue.html', form=form, venue=venue, version=version)
 
 @app.route('/venues/<int:venue_id>/edit', methods=['POST'])
 def edit_venue_submission(venue_id):
@@ -371,6 +341,11 @@ def edit_venue_submission(venue_id):
     flash("Please correct the following errors: " + str(form.errors))
     return redirect(url_for('edit_venue_submission', venue_id=venue_id))
   else:
+    # check for another venue with the same name in the same city
+    duplicate_venue = Venue.query.filter(Venue.id != venue_id).filter_by(name = form.data["name"], city = form.data["city"], state = form.data["state"]).first()
+    if duplicate_venue is not None:
+      flash("Venue " + form.data["name"] + " in " + form.data["city"] + " already exists.")
+      return edit_venue_again(venue_id, form, request.form.get('edit_version', type=int))
     # prepare and execute db write
     try:
       # clean up and augment field values
@@ -380,13 +355,28 @@ def edit_venue_submission(venue_id):
         field_values["seeking_talent"] = False
       else:
         field_values["seeking_talent"] = True
-      # try and persist the updated venued data in the database
-      venue = Venue.query.get(venue_id)
-      for key, value in field_values.items():
-        setattr(venue, key, value)
+      # write only the changed columns, unless the venue was edited meanwhile
+      changes = update_listing(Venue, venue_id, field_values, request.form.get('edit_version', type=int))
+      if changes is None:
+        flash('Venue with ID' + str(venue_id) + ' was changed meanwhile. Your changes are shown below: review them and save again to overwrite.')
+        return edit_venue_again(venue_id, form)
       db.session.commit()
+      if not changes:
+        flash('Venue with ID' + str(venue_id) + ' had no changes to save.')
+        return redirect(url_for('show_venue', venue_id=venue_id))
+      if "name" in changes:
+        venue_index.add(venue_id, changes["name"])
+      if changes.keys() & {"name", "city", "state"}:
+        refresh_area_summary([venue_id])
+      invalidate_venue(venue_id)
       flash('Venue with ID' + str(venue_id) + ' was successfully updated!')
-    except():
+    except IntegrityError:
+      # the same name and city saved meanwhile (unique index)
+      db.session.rollback()
+      flash("Venue " + form.data["name"] + " in " + form.data["city"] + " already exists.")
+      return edit_venue_again(venue_id, form, request.form.get('edit_version', type=int))
+    except SQLAlchemyError:
+      app.logger.exception('Updating venue %s failed', venue_id)
       db.session.rollback()
       flash('Venue with ID' + str(venue_id) + ' could not be updated.')
     finally:
@@ -411,8 +401,8 @@ def create_artist_submission():
     return render_template('forms/new_artist.html', form=form)
   else:
     # check for existing artist with the same name in the same city
-    duplicate_artists = Artist.query.filter_by(name = form.data["name"], city = form.data["city"], state = form.data["state"]).all()
-    if len(duplicate_artists) > 0:
+    duplicate_artist = Artist.query.filter_by(name = form.data["name"], city = form.data["city"], state = form.data["state"]).first()
+    if duplicate_artist is not None:
       flash("An artist named " + form.data["name"] + " already exists in " + form.data["city"] + ".")
       return render_template('forms/new_artist.html', form=form)
     # prepare and execute db write
@@ -426,8 +416,16 @@ def create_artist_submission():
       artist = Artist(**field_values)
       db.session.add(artist)
       db.session.commit()
+      artist_index.add(artist.id, artist.name)
+      page_cache.invalidate("artists;")
       flash('Artist ' + form.data['name'] + ' was successfully listed!')
-    except():
+    except IntegrityError:
+      # created meanwhile by another request (unique index)
+      db.session.rollback()
+      flash("An artist named " + form.data["name"] + " already exists in " + form.data["city"] + ".")
+      return render_template('forms/new_artist.html', form=form)
+    except SQLAlchemyError:
+      app.logger.exception('Creating artist %s failed', form.data["name"])
       db.session.rollback()
       flash('An error occurred. Artist ' + form.data['name'] + ' could not be listed.')
     finally:
@@ -439,20 +437,37 @@ def create_artist_submission():
 #  ----------------------------------------------------------------
 
 @app.route('/shows')
+@replica_reads
 def shows():
-  all_shows = Show.query.all()
-  data = []
-  for show in all_shows:
-    show_dict = {
-      "venue_id": show.venue_id,
-      "venue_name": show.venue.name,
-      "artist_id": show.artist_id,
-      "artist_name": show.artist.name,
-      "artist_image_link": show.artist.image_link,
-      "start_time": show.time
-    }
-    data.append(show_dict)
-  return render_template('pages/shows.html', shows=data)
+  # streamed mode renders every show while rows are still being fetched
+  if request.args.get('stream'):
+    rows = show_listing().execution_options(stream_results=True).yield_per(app.config["SHOWS_STREAM_CHUNK_SIZE"])
+    context = {"shows": (show_listing_dict(row) for row in rows), "next_page": None}
+    app.update_template_context(context)
+    template = app.jinja_env.get_template('pages/shows.html')
+    return Response(stream_with_context(template.generate(context)))
+
+  after_time = request.args.get('after_time')
+  after_id = request.args.get('after_id', type=int)
+  if after_time:
+    try:
+      after_time = dateutil.parser.parse(after_time)
+    except (ValueError, OverflowError):
+      abort(400)
+  # keyed on the parsed arguments only, so other query strings share a page
+  cache_key = "shows:%s,%s;" % (after_time.isoformat() if after_time else "", "" if after_id is None else after_id)
+  cached = page_cache.get(cache_key)
+  if cached is not None:
+    return cached
+
+  rows, next_key = show_listing_page(app.config["SHOWS_PAGE_SIZE"], after_time or None, after_id)
+  next_page = None
+  if next_key is not None:
+    next_page = url_for('shows', after_time=next_key[0].isoformat(), after_id=next_key[1])
+  data = [show_listing_dict(row) for row in rows]
+  page = render_template('pages/shows.html', shows=data, next_page=next_page)
+  page_cache.set(cache_key, page)
+  return page
 
 @app.route('/shows/create')
 def create_shows():
@@ -485,6 +500,12 @@ def create_show_submission():
     except:
       error = True
       flash("Please provide a valid Venue ID.")    
+    if not error:
+      # neither the venue nor the artist may have another show at the time
+      for show in booking_conflicts(venue.id, artist.id, form.data["start_time"], SHOW_LENGTH):
+        error = True
+        flash("%s already has a show at %s at %s." % (
+          venue.name if show.venue_id == venue.id else artist.name, show.venue.name, show.time))
     if error == True:
       flash('Show could not be listed.')
       return render_template('forms/new_show.html', form=form)
@@ -493,19 +514,88 @@ def create_show_submission():
       try:
         show = Show(venue_id = form.data["venue_id"], artist_id = form.data["artist_id"], time = form.data["start_time"])
         db.session.add(show)
+        db.session.flush()
+        add_to_feed(show_ids=[show.id])
+        add_show_totals("venue", [show.venue_id])
+        add_show_totals("artist", [show.artist_id])
+        bump_versions(Venue, [show.venue_id])
+        bump_versions(Artist, [show.artist_id])
         db.session.commit()
+        refresh_area_summary([int(form.data["venue_id"])])
+        invalidate_show(int(form.data["venue_id"]), int(form.data["artist_id"]))
         flash('Show was successfully listed!')
-      except():
+      except IntegrityError:
+        # the exclusion constraints caught a show booked meanwhile
+        db.session.rollback()
+        flash('The venue or artist was booked meanwhile. Show could not be listed.')
+      except SQLAlchemyError:
+        app.logger.exception('Creating show failed')
         db.session.rollback()
         flash('An error occurred. Show could not be listed.')
       finally:
         db.session.close()
       return render_template('pages/home.html')
 
+#  Commands
+#  ----------------------------------------------------------------
+
+@app.cli.command('refresh-area-summary')
+def refresh_area_summary_command():
+  # rebuild the venues-by-area summary now, rather than at AREA_SUMMARY_MAX_AGE
+  refresh_area_summary()
+  print('Area summary refreshed.')
+
+@app.cli.command('rebuild-show-feed')
+def rebuild_show_feed_command():
+  # recreate the show listings' read model from the Show, Venue and Artist tables
+  rebuild_show_feed()
+  print('Show feed rebuilt.')
+
+@app.cli.command('rebuild-genre-counts')
+def rebuild_genre_counts_command():
+  # recount the genre facets from the Venue and Artist tables
+  rebuild_genre_counts()
+  print('Genre counts rebuilt.')
+
+@app.cli.command('build-recommendations')
+def build_recommendations_command():
+  # rescore seeking venues and artists, e.g. nightly from cron; needs NumPy
+  # and SciPy (requirements-batch.txt), so the batch module is only imported here
+  from recommendations import build_recommendations
+  venues, artists = build_recommendations()
+  print('Recommendations built for ' + str(venues) + ' venues and ' + str(artists) + ' artists.')
+
+@app.cli.command('import-catalog')
+@click.argument('kind', type=click.Choice(['venues', 'artists', 'shows']))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--chunk-size', type=int, default=None, help='Rows validated and inserted per batch.')
+def import_catalog_command(kind, path, chunk_size):
+  # bulk load venues, artists or shows from a .csv or .jsonl file
+  result = import_file(kind, path, chunk_size or app.config["IMPORT_CHUNK_SIZE"])
+  for line_number, errors in result.errors:
+    click.echo('Line ' + str(line_number) + ': ' + str(errors), err=True)
+  if kind != 'artists':
+    refresh_area_summary()
+  page_cache.invalidate('')
+  click.echo('Imported ' + str(result.inserted) + ' ' + kind + ', skipped ' + str(result.skipped) + ' duplicates, unknown references or overlapping shows, rejected ' + str(len(result.errors)) + ' invalid rows.')
+
+# URLs under the API prefix that match no route, or no method of a route,
+# never reach the blueprint's handlers, so they are answered in JSON here
+def api_request():
+    return request.path.startswith(api.url_prefix + '/')
+
 @app.errorhandler(404)
 def not_found_error(error):
+    if api_request():
+        return json_error(error)
     return render_template('errors/404.html'), 404
 
+@app.errorhandler(405)
+def method_not_allowed_error(error):
+    if api_request():
+        return json_error(error)
+    return error
+
 @app.errorhandler(500)
 def server_error(error):
     return render_template('errors/500.html'), 500
@@ -0,0 +1,234 @@
+import json
+import random
+import re
+import time
+from urllib.parse import parse_qs, urlencode
+import dateutil.parser
+from asgiref.wsgi import WsgiToAsgi
+from sqlalchemy import select
+from sqlalchemy.engine.url import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+from werkzeug.http import http_date, parse_cookie, parse_date, parse_etags
+
+from app import app
+from models import db, Venue, Artist, Show
+from api import time_window, make_etag, validators_match, iso_start_times
+from listings import (venue_shows_query, artist_shows_query, show_counts_query, venue_page_dict,
+                      artist_page_dict, show_listing_page_query, split_page, show_listing_dict)
+from summaries import now_in
+from routing import STICKY_COOKIE
+
+#----------------------------------------------------------------------------#
+# Async serving mode.
+#----------------------------------------------------------------------------#
+
+# An ASGI application for running Fyyur under an async server:
+#
+#   uvicorn asgi:application --workers 2
+#
+# The busiest read routes, the JSON venue, artist and show listings, are
+# answered here on an async SQLAlchemy engine, so a request waiting on the
+# database holds a coroutine instead of a thread and one process keeps
+# hundreds of requests in flight on ASYNC_POOL_SIZE connections. They build
+# the same queries and JSON as api.py and honour the same validators, replicas
+# and read-your-writes cookie. Everything else, and anything these handlers
+# would answer with an error, is passed on to the Flask app, which runs in
+# asgiref's thread pool as before.
+#
+# Needs SQLAlchemy 1.4 or later with asgiref, an async server such as uvicorn,
+# and asyncpg (Postgres) or aiosqlite (SQLite):
+#
+#   pip install -r requirements-async.txt
+
+ASYNC_DRIVERS = {
+    "postgres": "postgresql+asyncpg",
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+def async_url(url):
+    url = make_url(url)
+    return url.set(drivername=ASYNC_DRIVERS.get(url.drivername, url.drivername))
+
+def async_engine_options(config, url):
+    options = {"pool_pre_ping": config["DATABASE_POOL_PRE_PING"], "pool_recycle": config["DATABASE_POOL_RECYCLE"]}
+    if not url.drivername.startswith("postgresql"):
+        return options
+    if config["DATABASE_PGBOUNCER"]:
+        # asyncpg prepares statements, which transaction pooling breaks
+        options.update(poolclass=NullPool, connect_args={"statement_cache_size": 0, "prepared_statement_cache_size": 0})
+        return options
+    options.update(pool_size=config["ASYNC_POOL_SIZE"], max_overflow=config["ASYNC_MAX_OVERFLOW"],
+                   pool_timeout=config["DATABASE_POOL_TIMEOUT"], pool_use_lifo=True)
+    if config["DATABASE_STATEMENT_TIMEOUT"]:
+        options["connect_args"] = {"server_settings": {"statement_timeout": str(config["DATABASE_STATEMENT_TIMEOUT"])}}
+    return options
+
+def create_engine_for(config, url):
+    url = async_url(url)
+    return create_async_engine(url, **async_engine_options(config, url))
+
+
+class AsyncRequest:
+
+    def __init__(self, scope):
+        self.method = scope["method"]
+        self.path = scope["path"]
+        self.query_string = scope["query_string"].decode()
+        self.args = {key: values[0] for key, values in parse_qs(self.query_string).items()}
+        self.headers = {name.decode("latin-1"): value.decode("latin-1") for name, value in scope["headers"]}
+        self.cookies = parse_cookie(self.headers.get("cookie", ""))
+
+    def not_modified(self, etag, last_modified):
+        return validators_match(parse_etags(self.headers.get("if-none-match")),
+                                parse_date(self.headers.get("if-modified-since")), etag, last_modified)
+
+
+class AsyncReads:
+
+    def __init__(self, flask_app):
+        self.flask_app = flask_app
+        self.config = flask_app.config
+        self.fallback = WsgiToAsgi(flask_app)
+        self.primary = None
+        self.replicas = []
+        self.routes = [
+            (re.compile(r"^/api/v1/venues/(\d+)$"), self.venue),
+            (re.compile(r"^/api/v1/artists/(\d+)$"), self.artist),
+            (re.compile(r"^/api/v1/shows$"), self.shows),
+        ]
+
+    def start(self):
+        self.primary = create_engine_for(self.config, self.config["SQLALCHEMY_DATABASE_URI"])
+        self.replicas = [create_engine_for(self.config, url) for url in self.config["DATABASE_REPLICA_URLS"]]
+
+    async def stop(self):
+        for engine in [self.primary] + self.replicas:
+            if engine is not None:
+                await engine.dispose()
+        self.primary, self.replicas = None, []
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            return await self.lifespan(receive, send)
+        if scope["type"] == "http" and scope["method"] in ("GET", "HEAD"):
+            for pattern, handler in self.routes:
+                match = pattern.match(scope["path"])
+                if match is None:
+                    continue
+                if self.primary is None:
+                    self.start()
+                response = await handler(AsyncRequest(scope), *match.groups())
+                if response is not None:
+                    return await self.send_response(send, scope["method"], *response)
+                break
+        await self.fallback(scope, receive, send)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                self.start()
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await self.stop()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def send_response(self, send, method, status, etag, last_modified, data=None):
+        headers = [(b"etag", ('"%s"' % etag).encode())]
+        if last_modified is not None:
+            headers.append((b"last-modified", http_date(last_modified).encode()))
+        body = b""
+        if data is not None:
+            body = (json.dumps(data, sort_keys=True, separators=(",", ":")) + "\n").encode()
+            headers.append((b"content-type", b"application/json"))
+        headers.append((b"content-length", str(len(body)).encode()))
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        await send({"type": "http.response.body", "body": body if method == "GET" else b""})
+
+    def engine_for(self, request):
+        # same rule as routing.py: replicas unless this browser just wrote
+        sticky_until = request.cookies.get(STICKY_COOKIE, type=float)
+        if self.replicas and (sticky_until is None or sticky_until < time.time()):
+            return random.choice(self.replicas)
+        return self.primary
+
+    # Handlers return (status, etag, last modified, data), or None to let the
+    # Flask app answer.
+
+    async def venue(self, request, venue_id):
+        venues = Venue.__table__
+        async with self.engine_for(request).connect() as conn:
+            venue = (await conn.execute(venues.select().where(venues.c.id == int(venue_id)))).first()
+            if venue is None:
+                return None
+            window = time_window(self.config["API_ETAG_WINDOW"])
+            etag = make_etag("venue", venue.id, venue.version, window)
+            last_modified = max(venue.updated_at, window)
+            if request.not_modified(etag, last_modified):
+                return 304, etag, last_modified
+            current_time = now_in(self.config["SHOWS_TIMEZONE"])
+            per_bucket = self.config["SHOWS_PER_BUCKET"]
+            upcoming = (await conn.execute(venue_shows_query(venue.id, current_time, True, per_bucket).statement)).all()
+            past = (await conn.execute(venue_shows_query(venue.id, current_time, False, per_bucket).statement)).all()
+            counts = (await conn.execute(show_counts_query("venue", venue.id, current_time).statement)).one()
+        data = venue_page_dict(venue, upcoming, past, counts)
+        iso_start_times(data["past_shows"])
+        iso_start_times(data["upcoming_shows"])
+        return 200, etag, last_modified, data
+
+    async def artist(self, request, artist_id):
+        artists = Artist.__table__
+        async with self.engine_for(request).connect() as conn:
+            artist = (await conn.execute(artists.select().where(artists.c.id == int(artist_id)))).first()
+            if artist is None:
+                return None
+            window = time_window(self.config["API_ETAG_WINDOW"])
+            etag = make_etag("artist", artist.id, artist.version, window)
+            last_modified = max(artist.updated_at, window)
+            if request.not_modified(etag, last_modified):
+                return 304, etag, last_modified
+            current_time = now_in(self.config["SHOWS_TIMEZONE"])
+            per_bucket = self.config["SHOWS_PER_BUCKET"]
+            upcoming = (await conn.execute(artist_shows_query(artist.id, current_time, True, per_bucket).statement)).all()
+            past = (await conn.execute(artist_shows_query(artist.id, current_time, False, per_bucket).statement)).all()
+            counts = (await conn.execute(show_counts_query("artist", artist.id, current_time).statement)).one()
+        data = artist_page_dict(artist, upcoming, past, counts)
+        iso_start_times(data["past_shows"])
+        iso_start_times(data["upcoming_shows"])
+        return 200, etag, last_modified, data
+
+    async def shows(self, request):
+        after_time = request.args.get("after_time")
+        after_id = request.args.get("after_id")
+        try:
+            after_time = dateutil.parser.parse(after_time) if after_time else None
+            after_id = int(after_id) if after_id is not None else None
+        except (ValueError, OverflowError):
+            return None
+        page_size = self.config["SHOWS_PAGE_SIZE"]
+        async with self.engine_for(request).connect() as conn:
+            last_show, venues_updated, artists_updated = (await conn.execute(select([
+                select([db.func.max(Show.id)]).scalar_subquery(),
+                select([db.func.max(Venue.updated_at)]).scalar_subquery(),
+                select([db.func.max(Artist.updated_at)]).scalar_subquery(),
+            ]))).one()
+            last_modified = max(filter(None, [venues_updated, artists_updated]), default=None)
+            etag = make_etag("shows", last_show, venues_updated, artists_updated, request.query_string)
+            if request.not_modified(etag, last_modified):
+                return 304, etag, last_modified
+            rows = (await conn.execute(show_listing_page_query(page_size, after_time, after_id).statement)).all()
+        rows, next_key = split_page(rows, page_size)
+        next_page = None
+        if next_key is not None:
+            next_page = "/api/v1/shows?" + urlencode({"after_time": next_key[0].isoformat(), "after_id": next_key[1]})
+        return 200, etag, last_modified, {
+            "shows": iso_start_times([show_listing_dict(row) for row in rows]),
+            "next": next_page
+        }
+
+
+application = AsyncReads(app)
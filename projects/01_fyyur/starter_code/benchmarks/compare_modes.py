@@ -0,0 +1,116 @@
+#----------------------------------------------------------------------------#
+# Sync vs async serving benchmark.
+#
+# Starts the app once as a threaded WSGI server and once under an ASGI server
+# (see asgi.py), on the same database, and puts both under the same load: the
+# read routes that the async mode serves natively, with --concurrency
+# requests in flight. Prints latency percentiles and throughput side by side
+# and writes them as JSON next to the benchmarks/run.py results.
+#
+#   python benchmarks/compare_modes.py --database-url sqlite:////tmp/fyyur-bench.db \
+#       --concurrency 200 --requests 2000
+#
+# The server commands can be replaced, e.g. to compare against gunicorn:
+#
+#   --sync-command "gunicorn -w 1 --threads 32 -b 127.0.0.1:{port} app:app"
+#----------------------------------------------------------------------------#
+
+import argparse
+import json
+import os
+import shlex
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+from datetime import datetime
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.dirname(BENCHMARK_DIR)
+sys.path.insert(0, APP_DIR)
+sys.path.insert(0, BENCHMARK_DIR)
+
+import run
+
+SYNC_COMMAND = "flask run --with-threads --no-reload --port {port}"
+ASYNC_COMMAND = "uvicorn asgi:application --port {port} --no-access-log"
+ASYNC_ROUTES = ("api_venue", "api_artist", "api_shows")
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def wait_until_up(base_url, server, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if server.poll() is not None:
+            sys.exit("The server exited with status %d." % server.returncode)
+        try:
+            urllib.request.urlopen(base_url + "/api/v1/shows").read()
+            return
+        except OSError:
+            time.sleep(0.2)
+    server.terminate()
+    sys.exit("The server did not come up on %s." % base_url)
+
+def benchmark_server(command, environment, routes, requests, concurrency):
+    port = free_port()
+    base_url = "http://127.0.0.1:%d" % port
+    server = subprocess.Popen(shlex.split(command.format(port=port)), cwd=APP_DIR, env=environment,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_until_up(base_url, server)
+        # one round to warm up connections and caches
+        run.run_http(base_url, routes, concurrency, concurrency)
+        return run.run_http(base_url, routes, requests, concurrency)
+    finally:
+        server.terminate()
+        server.wait()
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the sync and async serving modes under the same load.")
+    parser.add_argument("--database-url", help="database both servers use (default: DATABASE_URL or config.py)")
+    parser.add_argument("--requests", type=int, default=1000, help="requests per route")
+    parser.add_argument("--concurrency", type=int, default=100, help="requests in flight")
+    parser.add_argument("--sync-command", default=SYNC_COMMAND)
+    parser.add_argument("--async-command", default=ASYNC_COMMAND)
+    parser.add_argument("--output", help="where to write the JSON results")
+    args = parser.parse_args()
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+
+    from app import app
+    with app.app_context():
+        routes = [route for route in run.sample_routes() if route[0] in ASYNC_ROUTES]
+
+    environment = dict(os.environ, FLASK_APP="app.py", FLASK_ENV="production", FLASK_DEBUG="0")
+    results = {}
+    for mode, command in (("sync", args.sync_command), ("async", args.async_command)):
+        results[mode] = benchmark_server(command, environment, routes, args.requests, args.concurrency)
+
+    print("%-12s %-6s %9s %9s %9s %10s" % ("route", "mode", "p50 ms", "p95 ms", "p99 ms", "req/s"))
+    for name, _, _, _ in routes:
+        for mode in results:
+            stats = results[mode][name]
+            print("%-12s %-6s %9s %9s %9s %10s" % (name, mode, stats["p50_ms"], stats["p95_ms"],
+                                                   stats["p99_ms"], stats["throughput_rps"]))
+
+    report = {
+        "commit": run.current_commit(),
+        "timestamp": datetime.utcnow().isoformat(),
+        "database": app.config["SQLALCHEMY_DATABASE_URI"].split(":")[0],
+        "requests_per_route": args.requests,
+        "concurrency": args.concurrency,
+        "commands": {"sync": args.sync_command, "async": args.async_command},
+        "results": results,
+    }
+    output = args.output or os.path.join(BENCHMARK_DIR, "results", "%s-modes.json" % report["commit"])
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w") as results_file:
+        json.dump(report, results_file, indent=2)
+    print("Results written to " + output)
+
+if __name__ == "__main__":
+    main()
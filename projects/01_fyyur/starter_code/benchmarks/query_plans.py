@@ -0,0 +1,92 @@
+#----------------------------------------------------------------------------#
+# Query plans for the Show and duplicate-check indexes.
+#
+# Prints the plan of the hot lookups in app.py as the database runs them with
+# the indexes from migration b7e3a90c1f25, then again with index access turned
+# off (planner settings on Postgres, NOT INDEXED on SQLite), which is the plan
+# these lookups had before the migration. Nothing is dropped or changed. Run
+# from the starter_code directory after "flask db upgrade":
+#
+#   python benchmarks/query_plans.py [--analyze]
+#----------------------------------------------------------------------------#
+
+import argparse
+import os
+import sys
+from datetime import datetime
+from sqlalchemy import text
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app
+from models import db
+
+# {table} placeholders are filled in with the quoted table name, plus an
+# index hint where the dialect needs one
+QUERIES = [
+    ("upcoming shows of a venue", "Show",
+     'SELECT * FROM {table} WHERE venue_id = :venue_id AND "time" > :now ORDER BY "time"'),
+    ("past shows of an artist", "Show",
+     'SELECT * FROM {table} WHERE artist_id = :artist_id AND "time" <= :now ORDER BY "time" DESC'),
+    ("upcoming show count of a venue", "Show",
+     'SELECT count(id) FROM {table} WHERE venue_id = :venue_id AND "time" > :now'),
+    ("venue duplicate check", "Venue",
+     'SELECT id FROM {table} WHERE name = :name AND city = :city AND state = :state LIMIT 1'),
+    ("artist duplicate check", "Artist",
+     'SELECT id FROM {table} WHERE name = :name AND city = :city AND state = :state LIMIT 1'),
+]
+
+# Postgres planner settings that keep it from using any index
+NO_INDEX_SETTINGS = ["enable_indexscan", "enable_indexonlyscan", "enable_bitmapscan"]
+
+def sample_params(conn):
+    # look up real ids and names so the planner sees realistic selectivity
+    params = {"now": datetime.now(), "venue_id": 0, "artist_id": 0, "name": "", "city": "", "state": ""}
+    show = conn.execute(text('SELECT venue_id, artist_id FROM "Show" LIMIT 1')).first()
+    if show is not None:
+        params["venue_id"], params["artist_id"] = show
+    venue = conn.execute(text('SELECT name, city, state FROM "Venue" LIMIT 1')).first()
+    if venue is not None:
+        params["name"], params["city"], params["state"] = venue
+    return params
+
+def explain_prefix(conn, analyze):
+    if conn.dialect.name == "sqlite":
+        return "EXPLAIN QUERY PLAN "
+    if analyze:
+        return "EXPLAIN (ANALYZE, BUFFERS) "
+    return "EXPLAIN "
+
+def print_plans(conn, params, analyze, use_indexes=True):
+    prefix = explain_prefix(conn, analyze)
+    for label, table, query in QUERIES:
+        table = '"%s"' % table
+        if not use_indexes and conn.dialect.name == "sqlite":
+            table += " NOT INDEXED"
+        print("-- " + label)
+        for row in conn.execute(text(prefix + query.format(table=table)), params):
+            print("   " + " ".join(str(column) for column in row))
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare query plans with and without the Show indexes.")
+    parser.add_argument("--analyze", action="store_true", help="run EXPLAIN ANALYZE on Postgres")
+    args = parser.parse_args()
+
+    with app.app_context():
+        conn = db.engine.connect()
+        params = sample_params(conn)
+        print("== with indexes")
+        print_plans(conn, params, args.analyze)
+        transaction = conn.begin()
+        try:
+            if conn.dialect.name == "postgresql":
+                for setting in NO_INDEX_SETTINGS:
+                    conn.execute(text("SET LOCAL %s = off" % setting))
+            print("== without indexes")
+            print_plans(conn, params, args.analyze, use_indexes=False)
+        finally:
+            transaction.rollback()
+            conn.close()
+
+if __name__ == "__main__":
+    main()
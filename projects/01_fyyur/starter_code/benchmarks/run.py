@@ -0,0 +1,196 @@
+#----------------------------------------------------------------------------#
+# Endpoint benchmarks.
+#
+# Requests every read route of the app a number of times and reports p50, p95
+# and p99 latency, queries per request (from the profiler's X-Query-Count
+# header) and memory, then writes the results as JSON so runs on different
+# commits can be compared. Routes that write are left out so runs are
+# repeatable; seed the database first with benchmarks/seed.py.
+#
+#   # in process, through the Flask test client
+#   python benchmarks/run.py --database-url sqlite:////tmp/fyyur-bench.db
+#
+#   # against a running server, 16 requests in flight
+#   python benchmarks/run.py --base-url http://localhost:5000 --concurrency 16
+#
+#   # compare with an earlier run
+#   python benchmarks/run.py --compare benchmarks/results/<commit>.json
+#
+# The page cache is switched off in test client mode unless --with-cache is
+# given, so the numbers measure the handlers themselves.
+#----------------------------------------------------------------------------#
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARK_DIR))
+
+def percentile(sorted_values, fraction):
+    # nearest-rank percentile of an already sorted list
+    if not sorted_values:
+        return None
+    rank = max(1, int(round(fraction * len(sorted_values) + 0.5)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+def summarize(latencies, queries):
+    latencies = sorted(latencies)
+    return {
+        "requests": len(latencies),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 2),
+        "queries_per_request": round(sum(queries) / len(queries), 2) if queries else None,
+    }
+
+def sample_routes():
+    # (name, method, path, form data) for every read route, using real ids
+    from models import db, Venue, Artist
+    venue = db.session.query(Venue.id, Venue.name).order_by(Venue.id).first()
+    artist = db.session.query(Artist.id, Artist.name).order_by(Artist.id).first()
+    if venue is None or artist is None:
+        sys.exit("The database is empty; run benchmarks/seed.py first.")
+    venue_term = venue.name.split()[1]
+    artist_term = artist.name.split()[0]
+    return [
+        ("home", "GET", "/", None),
+        ("venues", "GET", "/venues", None),
+        ("show_venue", "GET", "/venues/%d" % venue.id, None),
+        ("search_venues", "POST", "/venues/search", {"search_term": venue_term}),
+        ("edit_venue", "GET", "/venues/%d/edit" % venue.id, None),
+        ("artists", "GET", "/artists", None),
+        ("show_artist", "GET", "/artists/%d" % artist.id, None),
+        ("search_artists", "POST", "/artists/search", {"search_term": artist_term}),
+        ("edit_artist", "GET", "/artists/%d/edit" % artist.id, None),
+        ("shows", "GET", "/shows", None),
+        ("shows_stream", "GET", "/shows?stream=1", None),
+        ("api_venues", "GET", "/api/v1/venues", None),
+        ("api_venue", "GET", "/api/v1/venues/%d" % venue.id, None),
+        ("api_artists", "GET", "/api/v1/artists", None),
+        ("api_artist", "GET", "/api/v1/artists/%d" % artist.id, None),
+        ("api_shows", "GET", "/api/v1/shows", None),
+    ]
+
+def run_client(app, routes, requests):
+    client = app.test_client()
+    results = {}
+    for name, method, path, data in routes:
+        latencies, queries = [], []
+        for _ in range(requests):
+            start = time.perf_counter()
+            response = client.open(path, method=method, data=data)
+            response.get_data()
+            latencies.append(time.perf_counter() - start)
+            if "X-Query-Count" in response.headers:
+                queries.append(int(response.headers["X-Query-Count"]))
+        # tracing slows Python down a lot, so memory gets its own request
+        tracemalloc.start()
+        client.open(path, method=method, data=data).get_data()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        results[name] = summarize(latencies, queries)
+        results[name]["peak_alloc_kb"] = peak // 1024
+    return results
+
+def timed_request(base_url, method, path, data):
+    body = urllib.parse.urlencode(data).encode() if data else None
+    request = urllib.request.Request(base_url + path, data=body, method=method)
+    start = time.perf_counter()
+    with urllib.request.urlopen(request) as response:
+        response.read()
+        query_count = response.headers.get("X-Query-Count")
+    return time.perf_counter() - start, query_count
+
+def run_http(base_url, routes, requests, concurrency):
+    results = {}
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for name, method, path, data in routes:
+            start = time.perf_counter()
+            timings = list(pool.map(lambda _: timed_request(base_url, method, path, data), range(requests)))
+            elapsed = time.perf_counter() - start
+            results[name] = summarize([latency for latency, _ in timings],
+                                      [int(count) for _, count in timings if count is not None])
+            results[name]["throughput_rps"] = round(requests / elapsed, 1)
+    return results
+
+def current_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=BENCHMARK_DIR).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def print_results(results, baseline=None):
+    print("%-16s %9s %9s %9s %8s" % ("route", "p50 ms", "p95 ms", "p99 ms", "queries"))
+    for name, stats in results.items():
+        line = "%-16s %9s %9s %9s %8s" % (name, stats["p50_ms"], stats["p95_ms"], stats["p99_ms"], stats["queries_per_request"])
+        previous = (baseline or {}).get(name)
+        if previous and previous["p50_ms"]:
+            line += "   p50 %+.0f%%" % ((stats["p50_ms"] / previous["p50_ms"] - 1) * 100)
+        print(line)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Fyyur read routes.")
+    parser.add_argument("--database-url", help="database to use in test client mode")
+    parser.add_argument("--base-url", help="benchmark a running server over HTTP instead")
+    parser.add_argument("--requests", type=int, default=50, help="requests per route")
+    parser.add_argument("--concurrency", type=int, default=8, help="requests in flight in HTTP mode")
+    parser.add_argument("--with-cache", action="store_true", help="keep the page cache on in test client mode")
+    parser.add_argument("--output", help="where to write the JSON results")
+    parser.add_argument("--compare", help="earlier JSON results to compare against")
+    args = parser.parse_args()
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+
+    from app import app
+    from cache import page_cache
+
+    app.config["PROFILER_PANEL"] = False
+    if not args.with_cache:
+        app.config["PAGE_CACHE_BACKEND"] = "none"
+        page_cache.init_app(app)
+
+    with app.app_context():
+        routes = sample_routes()
+        database = app.config["SQLALCHEMY_DATABASE_URI"].split(":")[0]
+    if args.base_url:
+        results = run_http(args.base_url.rstrip("/"), routes, args.requests, args.concurrency)
+        mode = "http"
+    else:
+        results = run_client(app, routes, args.requests)
+        mode = "client"
+
+    report = {
+        "commit": current_commit(),
+        "timestamp": datetime.utcnow().isoformat(),
+        "mode": mode,
+        "database": database,
+        "requests_per_route": args.requests,
+        "concurrency": args.concurrency if mode == "http" else 1,
+        "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "results": results,
+    }
+    output = args.output or os.path.join(BENCHMARK_DIR, "results", "%s-%s.json" % (report["commit"], mode))
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w") as results_file:
+        json.dump(report, results_file, indent=2)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            baseline = json.load(baseline_file)["results"]
+    print_results(results, baseline)
+    print("Results written to " + output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+#----------------------------------------------------------------------------#
+# Synthetic data generator.
+#
+# Fills a database with venues, artists and shows for benchmarking. Output is
+# fully determined by --seed. Venues cluster in a few large cities, a small
+# share of artists and venues get most of the bookings, and shows are spread
+# over the past few years and the coming months, mostly on evenings, without
+# double-booking any venue or artist.
+#
+#   python benchmarks/seed.py --database-url sqlite:////tmp/fyyur-bench.db \
+#       --venues 2000 --artists 10000 --shows 200000 --reset
+#
+# Without --database-url the DATABASE_URL environment variable or config.py
+# decides which database is filled.
+#----------------------------------------------------------------------------#
+
+import argparse
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+CITIES = [
+    ("New York", "NY", 30), ("Los Angeles", "CA", 22), ("Chicago", "IL", 14),
+    ("Austin", "TX", 10), ("Nashville", "TN", 9), ("San Francisco", "CA", 8),
+    ("Seattle", "WA", 6), ("New Orleans", "LA", 6), ("Denver", "CO", 4),
+    ("Portland", "OR", 4), ("Atlanta", "GA", 3), ("Boston", "MA", 3),
+    ("Detroit", "MI", 2), ("Minneapolis", "MN", 2), ("Memphis", "TN", 1),
+    ("Burlington", "VT", 1),
+]
+
+GENRES = [
+    "Alternative", "Blues", "Classical", "Country", "Electronic", "Folk",
+    "Funk", "Hip-Hop", "Heavy Metal", "Instrumental", "Jazz",
+    "Musical Theatre", "Pop", "Punk", "R&B", "Reggae", "Rock n Roll", "Soul",
+    "Other",
+]
+
+WORDS = [
+    "Blue", "Red", "Velvet", "Electric", "Golden", "Silver", "Midnight",
+    "Crooked", "Lucky", "Wild", "Hollow", "Neon", "Rusty", "Paper", "Iron",
+    "Honey", "Broken", "Little", "Royal", "Lonely",
+]
+VENUE_NOUNS = ["Room", "Hall", "Lounge", "Tavern", "Club", "Theater", "Bar", "Stage", "Cellar", "Garden"]
+ARTIST_NOUNS = ["Owls", "Rivers", "Kings", "Shadows", "Echoes", "Wolves", "Saints", "Engines", "Ghosts", "Tides"]
+
+def weighted_city(rng):
+    return rng.choices(CITIES, weights=[weight for _, _, weight in CITIES])[0][:2]
+
+def genres(rng):
+    return rng.sample(GENRES, rng.choice([1, 1, 2, 2, 3]))
+
+def phone(rng):
+    return "%03d-%03d-%04d" % (rng.randint(200, 999), rng.randint(200, 999), rng.randint(0, 9999))
+
+def venue_rows(rng, count):
+    for number in range(count):
+        city, state = weighted_city(rng)
+        message = rng.random() < 0.3 and "Looking for local acts to fill our weekends." or ""
+        yield {
+            "name": "The %s %s %d" % (rng.choice(WORDS), rng.choice(VENUE_NOUNS), number),
+            "city": city,
+            "state": state,
+            "address": "%d %s St" % (rng.randint(1, 9999), rng.choice(WORDS)),
+            "phone": phone(rng),
+            "genres": genres(rng),
+            "image_link": "https://picsum.photos/seed/venue%d/600/400" % number,
+            "website_link": "https://venue%d.example.com" % number,
+            "facebook_link": "https://www.facebook.com/venue%d" % number,
+            "seeking_talent": message != "",
+            "seeking_talent_message": message,
+        }
+
+def artist_rows(rng, count):
+    for number in range(count):
+        city, state = weighted_city(rng)
+        message = rng.random() < 0.4 and "Looking for shows in the area." or ""
+        yield {
+            "name": "%s %s %d" % (rng.choice(WORDS), rng.choice(ARTIST_NOUNS), number),
+            "city": city,
+            "state": state,
+            "phone": phone(rng),
+            "genres": genres(rng),
+            "image_link": "https://picsum.photos/seed/artist%d/600/400" % number,
+            "website_link": "https://artist%d.example.com" % number,
+            "facebook_link": "https://www.facebook.com/artist%d" % number,
+            "seeking_venue": message != "",
+            "seeking_venue_message": message,
+        }
+
+def show_rows(rng, count, venue_ids, artist_ids, now, show_length):
+    # popularity follows a power law: a few venues and artists host most shows.
+    # Shows start on a grid of three slots a day, show_length apart, mostly the
+    # two evening ones, so they never overlap; a draw whose slot is already
+    # taken by its venue or artist is redrawn a few times and then dropped,
+    # which only happens for the busiest venues and artists.
+    first_slot = timedelta(hours=24) - 3 * show_length
+    booked = set()
+    for _ in range(count):
+        for _ in range(20):
+            venue_id = venue_ids[int(len(venue_ids) * rng.random() ** 2.5)]
+            artist_id = artist_ids[int(len(artist_ids) * rng.random() ** 2.5)]
+            day = now.date() + timedelta(days=rng.randint(-3 * 365, 180))
+            slot = rng.choice([0, 1, 1, 2, 2])
+            start = datetime(day.year, day.month, day.day) + first_slot + slot * show_length
+            if ("venue", venue_id, start) not in booked and ("artist", artist_id, start) not in booked:
+                booked.add(("venue", venue_id, start))
+                booked.add(("artist", artist_id, start))
+                yield {"venue_id": venue_id, "artist_id": artist_id, "time": start}
+                break
+
+def insert_chunks(table, rows, chunk_size):
+    from models import db
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            db.session.execute(table.insert(), chunk)
+            db.session.commit()
+            chunk = []
+    if chunk:
+        db.session.execute(table.insert(), chunk)
+        db.session.commit()
+
+def main():
+    parser = argparse.ArgumentParser(description="Fill a database with synthetic Fyyur data.")
+    parser.add_argument("--database-url", help="database to fill (default: DATABASE_URL or config.py)")
+    parser.add_argument("--venues", type=int, default=1000)
+    parser.add_argument("--artists", type=int, default=5000)
+    parser.add_argument("--shows", type=int, default=50000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--chunk-size", type=int, default=5000)
+    parser.add_argument("--reset", action="store_true", help="drop and recreate all tables first")
+    args = parser.parse_args()
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+
+    from app import app
+    from models import db, Venue, Artist, Show
+    from summaries import refresh_area_summary, rebuild_show_feed, rebuild_genre_counts
+    from bookings import SHOW_LENGTH
+
+    rng = random.Random(args.seed)
+    now = datetime.now()
+    with app.app_context():
+        if args.reset:
+            db.drop_all()
+        db.create_all()
+        insert_chunks(Venue.__table__, venue_rows(rng, args.venues), args.chunk_size)
+        insert_chunks(Artist.__table__, artist_rows(rng, args.artists), args.chunk_size)
+        venue_ids = [row.id for row in db.session.query(Venue.id).order_by(Venue.id)]
+        artist_ids = [row.id for row in db.session.query(Artist.id).order_by(Artist.id)]
+        insert_chunks(Show.__table__, show_rows(rng, args.shows, venue_ids, artist_ids, now, SHOW_LENGTH),
+                      args.chunk_size)
+        show_count = db.session.query(Show).count()
+        refresh_area_summary()
+        rebuild_show_feed()
+        rebuild_genre_counts()
+        print("Seeded %d venues, %d artists and %d shows." % (len(venue_ids), len(artist_ids), show_count))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+from bisect import bisect_right, insort
+from datetime import timedelta
+from models import db, Show
+
+#----------------------------------------------------------------------------#
+# Show booking.
+#----------------------------------------------------------------------------#
+
+# A show occupies its venue and its artist for SHOW_LENGTH minutes from its
+# start. Every show has the same length, so two shows overlap exactly when
+# their starts are less than SHOW_LENGTH apart: a conflict check is a range
+# scan of the (venue_id, time) and (artist_id, time) indexes on Show, and
+# BookingIndex does the same with a binary search over start times held in
+# memory. On Postgres, exclusion constraints on Show (migration a4d6c1e9f273)
+# also reject overlapping shows booked concurrently.
+#
+# SHOW_LENGTH is fixed rather than a setting because those constraints spell
+# out the same 180 minutes; changing it takes a migration that replaces them.
+
+SHOW_LENGTH = timedelta(minutes=180)
+
+def booking_conflicts(venue_id, artist_id, start_time, length):
+    # shows that would overlap a show at start_time, at the venue or with the
+    # artist, by start time
+    window = (Show.time > start_time - length, Show.time < start_time + length)
+    at_venue = Show.query.filter(Show.venue_id == venue_id, *window)
+    with_artist = Show.query.filter(Show.artist_id == artist_id, *window)
+    return at_venue.union(with_artist).order_by(Show.time).all()
+
+def free_slots(venue_id, start, end, length, artist_id=None):
+    # (from, until) stretches of at least length between start and end in
+    # which the venue, and the artist when given, has no show; a new show
+    # fits if it starts between from and until - length
+    times = db.session.query(Show.time).filter(Show.time > start - length, Show.time < end)
+    if artist_id is None:
+        times = times.filter(Show.venue_id == venue_id)
+    else:
+        times = times.filter(db.or_(Show.venue_id == venue_id, Show.artist_id == artist_id))
+    slots = []
+    busy_until = start
+    for (show_time,) in times.order_by(Show.time):
+        if show_time - busy_until >= length:
+            slots.append((busy_until, show_time))
+        busy_until = max(busy_until, show_time + length)
+    if end - busy_until >= length:
+        slots.append((busy_until, end))
+    return slots
+
+
+class BookingIndex:
+    # sorted start times of the shows of each venue and artist, for checking
+    # many new shows at once
+
+    def __init__(self, length):
+        self.length = length
+        self.times = {}
+
+    @classmethod
+    def load(cls, venue_ids, artist_ids, first, last, length):
+        # the booked shows that could overlap new shows of these venues and
+        # artists starting between first and last
+        index = cls(length)
+        rows = db.session.query(Show.venue_id, Show.artist_id, Show.time).filter(
+            db.or_(Show.venue_id.in_(venue_ids), Show.artist_id.in_(artist_ids)),
+            Show.time > first - length, Show.time < last + length)
+        for row in rows:
+            index.add(row.venue_id, row.artist_id, row.time)
+        return index
+
+    def add(self, venue_id, artist_id, start_time):
+        insort(self.times.setdefault(("venue", venue_id), []), start_time)
+        insort(self.times.setdefault(("artist", artist_id), []), start_time)
+
+    def conflicts(self, venue_id, artist_id, start_time):
+        for key in (("venue", venue_id), ("artist", artist_id)):
+            times = self.times.get(key, [])
+            position = bisect_right(times, start_time - self.length)
+            if position < len(times) and times[position] < start_time + self.length:
+                return True
+        return False
@@ -0,0 +1,208 @@
+import hashlib
+import os
+import threading
+import time
+import tempfile
+from collections import OrderedDict
+from urllib.parse import quote
+from flask import g, request, session
+from models import db, Show
+from summaries import show_clock
+
+#----------------------------------------------------------------------------#
+# Page cache.
+#----------------------------------------------------------------------------#
+
+# Rendered pages are cached by key ("venues;", "venue:<id>;", "shows:<after>;")
+# and dropped by the write handlers through the invalidate_* helpers below.
+# Pages listing shows as upcoming/past also expire at their next show start,
+# when a show moves from one bucket to the other.
+#
+# PAGE_CACHE_BACKEND picks the storage: "memory" is an LRU per worker process,
+# so with several gunicorn workers an invalidation only reaches the worker
+# that handled the write; "filesystem" stores pages under PAGE_CACHE_DIR and
+# is shared by all workers on the host; "none" disables caching.
+
+class LRUBackend:
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires <= time.time():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self.lock:
+            self.entries[key] = (time.time() + ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def delete_prefix(self, prefix):
+        with self.lock:
+            for key in [key for key in self.entries if key.startswith(prefix)]:
+                del self.entries[key]
+
+
+class FileSystemBackend:
+    # one file per entry, named after the first KEY_HEAD characters of its key
+    # (enough for every invalidation prefix) plus a hash of the whole key, so
+    # names stay short whatever the key; the oldest files are removed once
+    # there are more than maxsize
+
+    KEY_HEAD = 64
+
+    def __init__(self, directory, maxsize=1024):
+        self.directory = directory
+        self.maxsize = maxsize
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, key):
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, quote(key[:self.KEY_HEAD], safe="") + "." + digest)
+
+    def get(self, key):
+        try:
+            with open(self.path(key), encoding="utf-8") as cache_file:
+                expires = float(cache_file.readline())
+                if expires > time.time():
+                    return cache_file.read()
+        except (OSError, ValueError):
+            return None
+        self.remove(self.path(key))
+        return None
+
+    def set(self, key, value, ttl):
+        # write to a temp file and rename so readers never see partial pages;
+        # a page that cannot be stored is simply not cached
+        handle, temp_path = tempfile.mkstemp(dir=self.directory, prefix=".tmp")
+        try:
+            with os.fdopen(handle, "w", encoding="utf-8") as cache_file:
+                cache_file.write("%f\n" % (time.time() + ttl))
+                cache_file.write(value)
+            os.replace(temp_path, self.path(key))
+        except OSError:
+            self.remove(temp_path)
+            return
+        self.evict()
+
+    def entries(self):
+        return [name for name in os.listdir(self.directory) if not name.startswith(".tmp")]
+
+    def evict(self):
+        names = self.entries()
+        if len(names) <= self.maxsize:
+            return
+        ages = []
+        for name in names:
+            try:
+                ages.append((os.stat(os.path.join(self.directory, name)).st_mtime, name))
+            except OSError:
+                pass
+        ages.sort()
+        for _, name in ages[:len(ages) - self.maxsize]:
+            self.remove(os.path.join(self.directory, name))
+
+    def delete_prefix(self, prefix):
+        prefix = quote(prefix, safe="")
+        for name in self.entries():
+            if name.startswith(prefix):
+                self.remove(os.path.join(self.directory, name))
+
+    def remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+class PageCache:
+
+    def __init__(self):
+        self.backend = None
+        self.ttl = 300
+
+    def init_app(self, app):
+        backend = app.config.get("PAGE_CACHE_BACKEND", "memory")
+        self.ttl = app.config.get("PAGE_CACHE_TTL", 300)
+        if backend == "memory":
+            self.backend = LRUBackend(app.config.get("PAGE_CACHE_SIZE", 1024))
+        elif backend == "filesystem":
+            self.backend = FileSystemBackend(app.config["PAGE_CACHE_DIR"], app.config.get("PAGE_CACHE_SIZE", 1024))
+        elif backend == "none":
+            self.backend = None
+        else:
+            raise ValueError("PAGE_CACHE_BACKEND must be memory, filesystem or none")
+
+    def cacheable(self):
+        # pages rendered with pending flash messages must not be served to,
+        # or stored for, anyone else
+        return self.backend is not None and request.method == "GET" and "_flashes" not in session
+
+    def get(self, key):
+        if not self.cacheable():
+            return None
+        return self.backend.get(key)
+
+    def set(self, key, page, expires_at=None):
+        # only pages read from the primary, which has every committed write
+        if not self.cacheable() or g.get("read_replica") is not None:
+            return
+        ttl = self.ttl
+        if expires_at is not None:
+            ttl = min(ttl, (expires_at - show_clock()).total_seconds())
+        if ttl > 0:
+            self.backend.set(key, page, ttl)
+
+    def invalidate(self, *prefixes):
+        # drop every entry whose key starts with one of the prefixes
+        if self.backend is None:
+            return
+        for prefix in prefixes:
+            self.backend.delete_prefix(prefix)
+
+
+page_cache = PageCache()
+
+def next_show_start(venue_id=None, artist_id=None):
+    # start of the next upcoming show, when the upcoming/past split changes
+    query = db.session.query(db.func.min(Show.time)).filter(Show.time > show_clock())
+    if venue_id is not None:
+        query = query.filter(Show.venue_id == venue_id)
+    if artist_id is not None:
+        query = query.filter(Show.artist_id == artist_id)
+    return query.scalar()
+
+# Keys end in ";" so that invalidating "venue:1;" leaves "venue:12;" alone.
+
+def invalidate_venue(venue_id, artist_ids=None):
+    # a venue's name and image appear on its page, the listings and the pages
+    # of artists who played there; pass artist_ids when the shows are gone
+    if artist_ids is None:
+        rows = db.session.query(Show.artist_id).filter(Show.venue_id == venue_id).distinct()
+        artist_ids = [row.artist_id for row in rows]
+    page_cache.invalidate("venue:%s;" % venue_id, "venues;", "shows:")
+    page_cache.invalidate(*["artist:%s;" % artist_id for artist_id in set(artist_ids)])
+
+def invalidate_deleted_venues(venue_ids, artist_ids):
+    page_cache.invalidate("venues;", "shows:", *["venue:%s;" % venue_id for venue_id in venue_ids])
+    page_cache.invalidate(*["artist:%s;" % artist_id for artist_id in set(artist_ids)])
+
+def invalidate_artist(artist_id):
+    rows = db.session.query(Show.venue_id).filter(Show.artist_id == artist_id).distinct()
+    page_cache.invalidate("artist:%s;" % artist_id, "artists;", "shows:")
+    page_cache.invalidate(*["venue:%s;" % row.venue_id for row in rows])
+
+def invalidate_show(venue_id, artist_id):
+    page_cache.invalidate("venue:%s;" % venue_id, "artist:%s;" % artist_id, "venues;", "shows:")
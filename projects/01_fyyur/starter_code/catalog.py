@@ -0,0 +1,95 @@
+from datetime import datetime
+from models import db, Venue, Artist, Show, ShowFeed, bump_versions
+from summaries import remove_from_feed, refresh_show_totals, genre_changes, adjust_genre_counts, update_feed_fields
+
+#----------------------------------------------------------------------------#
+# Venue deletion.
+#----------------------------------------------------------------------------#
+
+# Deleting venues through the ORM loads every show of every venue and deletes
+# them one statement at a time (the cascade on Venue.shows). delete_venues
+# does the same work with a fixed number of set-based statements, however many
+# venues and shows there are: the feed rows, the shows and the venues are each
+# removed with one DELETE ... WHERE venue_id IN (...), and the show totals of
+# the artists who played there and the genre counts are updated in one go.
+
+def delete_venues(venue_ids):
+    # delete the given venues with their shows; returns (venues deleted,
+    # shows deleted, ids of the artists whose shows were deleted). Ids of
+    # missing venues are ignored. Does not commit.
+    venue_ids = list(set(venue_ids))
+    if not venue_ids:
+        return 0, 0, []
+    rows = db.session.query(Show.artist_id).filter(Show.venue_id.in_(venue_ids)).distinct()
+    artist_ids = [row.artist_id for row in rows]
+    genre_counts = {}
+    for (genres,) in db.session.query(Venue.genres).filter(Venue.id.in_(venue_ids)):
+        for genre, change in genre_changes(genres, []).items():
+            genre_counts[genre] = genre_counts.get(genre, 0) + change
+    adjust_genre_counts(db.session.connection(), "venue", genre_counts)
+    remove_from_feed(venue_ids)
+    shows = Show.query.filter(Show.venue_id.in_(venue_ids)).delete(synchronize_session=False)
+    venues = Venue.query.filter(Venue.id.in_(venue_ids)).delete(synchronize_session=False)
+    refresh_show_totals("venue", venue_ids)
+    refresh_show_totals("artist", artist_ids)
+    bump_versions(Artist, artist_ids)
+    return venues, shows, artist_ids
+
+#----------------------------------------------------------------------------#
+# Listing edits.
+#----------------------------------------------------------------------------#
+
+# An edit form is saved with one UPDATE of just the columns whose values
+# changed, guarded by the edit_version the form was rendered with, so an edit
+# saved by someone else in the meantime is never silently overwritten (shows
+# booked meanwhile only bump version, and do not count). The
+# read models that the ORM hooks in summaries.py would refresh are refreshed
+# here for the changed columns only, and a form saved unchanged writes
+# nothing at all. A new name or image also bumps the versions of the
+# counterparts whose API pages show it.
+
+def changed_values(current, values):
+    # values that differ from the row; None and "" count as the same
+    changes = {}
+    for key, value in values.items():
+        old = getattr(current, key)
+        if old != value and not (old in (None, "") and value in (None, "")):
+            changes[key] = value
+    return changes
+
+def update_listing(model, object_id, values, edit_version=None):
+    # save a venue's or artist's edited values; returns the changed ones ({}
+    # when nothing changed), or None when the listing is gone or no longer at
+    # edit_version (when given). Does not commit.
+    # name and image_link are read too, for the feed rows, whichever changed
+    keys = set(values) | {"name", "image_link"}
+    current = db.session.query(model.edit_version, *[getattr(model, key) for key in keys]).filter(
+        model.id == object_id).first()
+    if current is None or edit_version is not None and current.edit_version != edit_version:
+        return None
+    changes = changed_values(current, values)
+    if not changes:
+        return changes
+    table = model.__table__
+    updated = db.session.execute(table.update().where(
+        db.and_(table.c.id == object_id, table.c.edit_version == current.edit_version)
+    ).values(version=table.c.version + 1, edit_version=table.c.edit_version + 1,
+             updated_at=datetime.utcnow(), **changes)).rowcount
+    if not updated:
+        return None
+    kind = "venue" if model is Venue else "artist"
+    connection = db.session.connection()
+    if "name" in changes or "image_link" in changes:
+        update_feed_fields(connection, kind, object_id, changes.get("name", current.name),
+                           changes.get("image_link", current.image_link))
+        # the name and image also appear on the pages of the artists who
+        # played at a venue, or the venues an artist played at
+        if model is Venue:
+            rows = db.session.query(ShowFeed.artist_id).filter(ShowFeed.venue_id == object_id).distinct()
+            bump_versions(Artist, [row.artist_id for row in rows])
+        else:
+            rows = db.session.query(ShowFeed.venue_id).filter(ShowFeed.artist_id == object_id).distinct()
+            bump_versions(Venue, [row.venue_id for row in rows])
+    if "genres" in changes:
+        adjust_genre_counts(connection, kind, genre_changes(current.genres, changes["genres"]))
+    return changes
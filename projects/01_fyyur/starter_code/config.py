@@ -10,5 +10,117 @@ DEBUG = True
 
 
 # IMPLEMENT DATABASE URL
-SQLALCHEMY_DATABASE_URI = "postgres://vbrech@localhost:5432/fyyur"
+# DATABASE_URL overrides it, e.g. to point benchmarks at a scratch database
+SQLALCHEMY_DATABASE_URI = os.environ.get("DATABASE_URL", "postgres://vbrech@localhost:5432/fyyur")
 SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+# Read replicas for the read-only views (see routing.py), as a comma separated
+# DATABASE_REPLICA_URLS, e.g. two SQLite files for local testing:
+#   DATABASE_URL=sqlite:////tmp/primary.db DATABASE_REPLICA_URLS=sqlite:////tmp/replica.db
+# After a write the browser stays on the primary for DATABASE_REPLICA_STICKY
+# seconds so it sees its own changes despite replication lag.
+DATABASE_REPLICA_URLS = [url for url in os.environ.get("DATABASE_REPLICA_URLS", "").split(",") if url]
+DATABASE_REPLICA_STICKY = 10
+SQLALCHEMY_BINDS = {"replica_%d" % number: url for number, url in enumerate(DATABASE_REPLICA_URLS)}
+
+# Connection pool of each worker process (see pool.py). On Postgres a worker
+# keeps DATABASE_POOL_SIZE connections, roughly its thread count, and opens up
+# to DATABASE_MAX_OVERFLOW more in bursts; keep workers * (size + overflow)
+# below the server's max_connections. A request that finds every connection
+# busy waits DATABASE_POOL_TIMEOUT seconds and then fails.
+DATABASE_POOL_SIZE = int(os.environ.get("DATABASE_POOL_SIZE", "5"))
+DATABASE_MAX_OVERFLOW = int(os.environ.get("DATABASE_MAX_OVERFLOW", "5"))
+DATABASE_POOL_TIMEOUT = 10
+# Seconds after which idle connections are replaced; checked out connections
+# are tested first so ones dropped by the server or a restart are not used
+DATABASE_POOL_RECYCLE = 1800
+DATABASE_POOL_PRE_PING = True
+# Milliseconds after which Postgres cancels a statement run for a request;
+# CLI commands and background refreshes are not limited. 0 disables
+DATABASE_STATEMENT_TIMEOUT = 5000
+# Set when connecting through PgBouncer in transaction pooling mode: PgBouncer
+# does the pooling, so each checkout opens a connection to it
+DATABASE_PGBOUNCER = os.environ.get("DATABASE_PGBOUNCER", "") == "1"
+# Connections per process to the primary and to each replica in the async
+# serving mode (see asgi.py), shared by all in-flight requests
+ASYNC_POOL_SIZE = 20
+ASYNC_MAX_OVERFLOW = 10
+# Serve connection pool counters at /metrics; the route has no access
+# control, so only enable it where the port is reachable by the scraper alone
+POOL_METRICS_ENABLED = os.environ.get("POOL_METRICS_ENABLED", "") == "1"
+
+# Number of results per page on the venue and artist search pages
+SEARCH_PAGE_SIZE = 20
+# Search engine for venue and artist names: "database" (ILIKE, pg_trgm indexed
+# on Postgres) or "memory" (in-process trigram index, see search.py)
+SEARCH_ENGINE = "database"
+# Seconds between rebuilds of the "memory" engine's indexes, which is how
+# long writes from other workers and imports take to become searchable;
+# 0 builds them once at startup
+SEARCH_INDEX_MAX_AGE = 60
+# Shortest search term that is searched (shorter terms have no trigram to use
+# an index with), and the most matches counted and paged through per search
+SEARCH_MIN_TERM_LENGTH = 3
+SEARCH_MAX_COUNT = 1000
+
+# Shows per page on /shows, and rows fetched per round trip when the page is
+# streamed with /shows?stream=1
+SHOWS_PAGE_SIZE = 60
+SHOWS_STREAM_CHUNK_SIZE = 500
+
+# Time zone show times are entered and stored in, as naive wall clock times,
+# e.g. "America/New_York"; decides which shows are upcoming. None uses the
+# server's local time.
+SHOWS_TIMEZONE = None
+# Upcoming and past shows listed on each venue and artist page; the counts
+# above them cover all shows
+SHOWS_PER_BUCKET = 20
+
+# Maximum age in seconds of the venues-by-area summary; each worker rebuilds
+# it in the background once it is older, which bounds how stale upcoming show
+# counts get as shows move into the past. 0 leaves it to
+# "flask refresh-area-summary"
+AREA_SUMMARY_MAX_AGE = 300
+
+# Rendered page cache (see cache.py): "memory" (LRU per worker process),
+# "filesystem" (shared by all workers on a host) or "none"
+PAGE_CACHE_BACKEND = "memory"
+PAGE_CACHE_TTL = 300
+PAGE_CACHE_SIZE = 1024
+PAGE_CACHE_DIR = os.path.join(basedir, 'page_cache')
+
+# Locale of the datetime template filter, and how many formatted values it
+# keeps memoized
+DATETIME_LOCALE = "en_US"
+DATETIME_CACHE_SIZE = 4096
+
+# Rows per batch for "flask import-catalog"
+IMPORT_CHUNK_SIZE = 5000
+
+# Longest range in days GET /api/v1/venues/<id>/free-slots answers for
+FREE_SLOTS_MAX_DAYS = 92
+
+# Venue/artist matching (see recommendations.py): matches kept per seeking
+# venue and artist, the weights of the genre overlap, same area and past
+# shows scores, and seeking venues scored per block (bounds memory: a block
+# holds RECOMMENDATION_BLOCK_SIZE x seeking artists scores)
+RECOMMENDATIONS_TOP_K = 10
+RECOMMENDATION_WEIGHTS = {"genres": 0.6, "area": 0.25, "history": 0.15}
+RECOMMENDATION_BLOCK_SIZE = 256
+
+# Most venue ids accepted by one POST /venues/delete
+VENUE_DELETE_MAX_IDS = 1000
+
+# Seconds for which JSON API validators (ETag, Last-Modified) of resources
+# that split shows into upcoming and past stay valid
+API_ETAG_WINDOW = 60
+
+# Per-request query profiling (see profiler.py). Requests running more than
+# PROFILER_MAX_QUERIES queries, spending more than PROFILER_MAX_DB_TIME ms in
+# the database or repeating one statement PROFILER_MAX_REPEATS times are
+# logged as warnings; PROFILER_PANEL overlays the numbers on HTML pages.
+PROFILER_ENABLED = True
+PROFILER_PANEL = DEBUG
+PROFILER_MAX_QUERIES = 20
+PROFILER_MAX_DB_TIME = 200
+PROFILER_MAX_REPEATS = 5
@@ -0,0 +1,101 @@
+import functools
+import dateutil.parser
+from dateutil import tz
+from datetime import datetime
+from babel import Locale
+from babel.dates import parse_pattern
+
+#----------------------------------------------------------------------------#
+# Date formatting.
+#----------------------------------------------------------------------------#
+
+# CLDR patterns behind the named formats accepted by the datetime filter; any
+# other format string is treated as a pattern itself.
+NAMED_FORMATS = {
+    "full": "EEEE MMMM, d, y 'at' h:mma",
+    "medium": "EE MM, dd, y h:mma",
+}
+
+class DateTimeFormatter:
+    # Same output as babel.dates.format_datetime for these patterns, but the
+    # locale and patterns are parsed once and recent results are memoized.
+
+    def __init__(self, locale="en_US", cache_size=4096):
+        self.locale = Locale.parse(locale)
+        self.patterns = {name: parse_pattern(pattern) for name, pattern in NAMED_FORMATS.items()}
+        self.format = functools.lru_cache(maxsize=cache_size)(self.format_value)
+
+    def pattern(self, format):
+        pattern = self.patterns.get(format)
+        if pattern is None:
+            pattern = self.patterns[format] = parse_pattern(format)
+        return pattern
+
+    def format_value(self, value, format="medium"):
+        if isinstance(value, datetime):
+            date = value
+        else:
+            date = dateutil.parser.parse(value)
+        return self.pattern(format).apply(date, self.locale)
+
+    def format_many(self, values, format="medium"):
+        return [self.format(value, format) for value in values]
+
+#----------------------------------------------------------------------------#
+# iCalendar.
+#----------------------------------------------------------------------------#
+
+# Just enough of RFC 5545 to publish shows as events. Show times are naive
+# wall clock times; when their zone is known they are written in UTC with a
+# "Z" suffix, which needs no VTIMEZONE definition, and otherwise as floating
+# times that calendars show unchanged in the reader's own zone.
+
+ICAL_TIME_FORMAT = "%Y%m%dT%H%M%S"
+
+def ical_text(value):
+    # escape a TEXT value
+    return (str(value).replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,")
+            .replace("\r\n", "\\n").replace("\n", "\\n"))
+
+def ical_line(line):
+    # a content line, folded so no line is longer than 75 octets
+    encoded = line.encode("utf-8")
+    parts = []
+    while len(encoded) > 75:
+        # continuation lines start with a space; never split a character
+        cut = 75 if not parts else 74
+        while encoded[cut] & 0xC0 == 0x80:
+            cut -= 1
+        parts.append(encoded[:cut])
+        encoded = encoded[cut:]
+    parts.append(encoded)
+    return "\r\n ".join(part.decode("utf-8") for part in parts) + "\r\n"
+
+def ical_time(value, zone=None):
+    # a naive wall clock time in zone as a UTC time, or floating without zone
+    if zone is None:
+        return value.strftime(ICAL_TIME_FORMAT)
+    return value.replace(tzinfo=zone).astimezone(tz.UTC).strftime(ICAL_TIME_FORMAT) + "Z"
+
+def ical_calendar(events, timezone_name=None):
+    # yield a VCALENDAR piece by piece from dicts with uid, start, end, summary
+    # and location
+    zone = None
+    if timezone_name:
+        zone = tz.gettz(timezone_name)
+        if zone is None:
+            raise ValueError("Unknown time zone " + timezone_name)
+    yield "BEGIN:VCALENDAR\r\nVERSION:2.0\r\nPRODID:-//Fyyur//Shows//EN\r\n"
+    stamp = datetime.utcnow().strftime(ICAL_TIME_FORMAT) + "Z"
+    for event in events:
+        yield "".join([
+            "BEGIN:VEVENT\r\n",
+            ical_line("UID:" + event["uid"]),
+            "DTSTAMP:" + stamp + "\r\n",
+            "DTSTART:" + ical_time(event["start"], zone) + "\r\n",
+            "DTEND:" + ical_time(event["end"], zone) + "\r\n",
+            ical_line("SUMMARY:" + ical_text(event["summary"])),
+            ical_line("LOCATION:" + ical_text(event["location"])),
+            "END:VEVENT\r\n"
+        ])
+    yield "END:VCALENDAR\r\n"
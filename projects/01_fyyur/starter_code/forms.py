@@ -4,125 +4,80 @@ from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField
 from wtforms.validators import DataRequired, AnyOf, URL, ValidationError, Optional
 import re
 
+# Choice tables and validators are built once and shared by every form
+# instance and by the dict validators at the bottom of this module.
+
+STATES = (
+    "AL", "AK", "AZ", "AR", "CA", "CO", "CT", "DE", "DC", "FL", "GA", "HI", "ID",
+    "IL", "IN", "IA", "KS", "KY", "LA", "ME", "MT", "NE", "NV", "NH", "NJ", "NM",
+    "NY", "NC", "ND", "OH", "OK", "OR", "MD", "MA", "MI", "MN", "MS", "MO", "PA",
+    "RI", "SC", "SD", "TN", "TX", "UT", "VT", "VA", "WA", "WV", "WI", "WY",
+)
+GENRES = (
+    "Alternative", "Blues", "Classical", "Country", "Electronic", "Folk", "Funk",
+    "Hip-Hop", "Heavy Metal", "Instrumental", "Jazz", "Musical Theatre", "Pop",
+    "Punk", "R&B", "Reggae", "Rock n Roll", "Soul", "Other",
+)
+STATE_CHOICES = tuple((state, state) for state in STATES)
+GENRE_CHOICES = tuple((genre, genre) for genre in GENRES)
+STATE_VALUES = frozenset(STATES)
+GENRE_VALUES = frozenset(GENRES)
+
+PHONE_PATTERN = re.compile(r"\d{3}-\d{3}-\d{4}")
+PHONE_MESSAGE = "Please format phone number as xxx-xxx-xxxx."
+SHOW_TIME_FORMAT = '%Y-%m-%d %H:%M'
+
 def validate_us_phone(form, field):
-    if not re.match(r"\d{3}-\d{3}-\d{4}", field.data):
-        raise ValidationError("Please format phone number as xxx-xxx-xxxx.")
+    if not PHONE_PATTERN.match(field.data):
+        raise ValidationError(PHONE_MESSAGE)
+
+required = DataRequired()
+optional = Optional()
+valid_url = URL()
 
 
 class ShowForm(FlaskForm):
     artist_id = StringField(
-        'artist_id', validators=[DataRequired()]
+        'artist_id', validators=[required]
     )
     venue_id = StringField(
-        'venue_id', validators=[DataRequired()]
+        'venue_id', validators=[required]
     )
     start_time = DateTimeField(
         'start_time',
-        format='%Y-%m-%d %H:%M',
-        validators=[DataRequired()]
+        format=SHOW_TIME_FORMAT,
+        validators=[required]
     )
 
 class VenueForm(FlaskForm):
     name = StringField(
-        'name', validators=[DataRequired()]
+        'name', validators=[required]
     )
     city = StringField(
-        'city', validators=[DataRequired()]
+        'city', validators=[required]
     )
     state = SelectField(
-        'state', validators=[DataRequired()],
-        choices=[
-            ('AL', 'AL'),
-            ('AK', 'AK'),
-            ('AZ', 'AZ'),
-            ('AR', 'AR'),
-            ('CA', 'CA'),
-            ('CO', 'CO'),
-            ('CT', 'CT'),
-            ('DE', 'DE'),
-            ('DC', 'DC'),
-            ('FL', 'FL'),
-            ('GA', 'GA'),
-            ('HI', 'HI'),
-            ('ID', 'ID'),
-            ('IL', 'IL'),
-            ('IN', 'IN'),
-            ('IA', 'IA'),
-            ('KS', 'KS'),
-            ('KY', 'KY'),
-            ('LA', 'LA'),
-            ('ME', 'ME'),
-            ('MT', 'MT'),
-            ('NE', 'NE'),
-            ('NV', 'NV'),
-            ('NH', 'NH'),
-            ('NJ', 'NJ'),
-            ('NM', 'NM'),
-            ('NY', 'NY'),
-            ('NC', 'NC'),
-            ('ND', 'ND'),
-            ('OH', 'OH'),
-            ('OK', 'OK'),
-            ('OR', 'OR'),
-            ('MD', 'MD'),
-            ('MA', 'MA'),
-            ('MI', 'MI'),
-            ('MN', 'MN'),
-            ('MS', 'MS'),
-            ('MO', 'MO'),
-            ('PA', 'PA'),
-            ('RI', 'RI'),
-            ('SC', 'SC'),
-            ('SD', 'SD'),
-            ('TN', 'TN'),
-            ('TX', 'TX'),
-            ('UT', 'UT'),
-            ('VT', 'VT'),
-            ('VA', 'VA'),
-            ('WA', 'WA'),
-            ('WV', 'WV'),
-            ('WI', 'WI'),
-            ('WY', 'WY'),
-        ]
+        'state', validators=[required],
+        choices=STATE_CHOICES
     )
     address = StringField(
-        'address', validators=[DataRequired()]
+        'address', validators=[required]
     )
     phone = StringField(
-        'phone', validators=[Optional(), validate_us_phone]
+        'phone', validators=[optional, validate_us_phone]
     )
     image_link = StringField(
-        'image_link', validators=[Optional(), URL()]
+        'image_link', validators=[optional, valid_url]
     )
     genres = SelectMultipleField(
-        'genres', validators=[DataRequired()],
-        choices=[
-            ('Alternative', 'Alternative'),
-            ('Blues', 'Blues'),
-            ('Classical', 'Classical'),
-            ('Country', 'Country'),
-            ('Electronic', 'Electronic'),
-            ('Folk', 'Folk'),
-            ('Funk', 'Funk'),
-            ('Hip-Hop', 'Hip-Hop'),
-            ('Heavy Metal', 'Heavy Metal'),
-            ('Instrumental', 'Instrumental'),
-            ('Jazz', 'Jazz'),
-            ('Musical Theatre', 'Musical Theatre'),
-            ('Pop', 'Pop'),
-            ('Punk', 'Punk'),
-            ('R&B', 'R&B'),
-            ('Reggae', 'Reggae'),
-            ('Rock n Roll', 'Rock n Roll'),
-            ('Soul', 'Soul'),
-            ('Other', 'Other'),
-        ]
+        'genres', validators=[required],
+        choices=GENRE_CHOICES
     )
     facebook_link = StringField(
-        'facebook_link', validators=[Optional(), URL()]
+        'facebook_link', validators=[optional, valid_url]
     )
     website_link = StringField(
-        'website_link', validators=[Optional(), URL()]
+        'website_link', validators=[optional, valid_url]
     )
     seeking_talent_message = StringField(
         "seeking_talent_message"
@@ -130,105 +85,134 @@ class VenueForm(FlaskForm):
 
 class ArtistForm(FlaskForm):
     name = StringField(
-        'name', validators=[DataRequired()]
+        'name', validators=[required]
     )
     city = StringField(
-        'city', validators=[DataRequired()]
+        'city', validators=[required]
     )
     state = SelectField(
-        'state', validators=[DataRequired()],
-        choices=[
-            ('AL', 'AL'),
-            ('AK', 'AK'),
-            ('AZ', 'AZ'),
-            ('AR', 'AR'),
-            ('CA', 'CA'),
-            ('CO', 'CO'),
-            ('CT', 'CT'),
-            ('DE', 'DE'),
-            ('DC', 'DC'),
-            ('FL', 'FL'),
-            ('GA', 'GA'),
-            ('HI', 'HI'),
-            ('ID', 'ID'),
-            ('IL', 'IL'),
-            ('IN', 'IN'),
-            ('IA', 'IA'),
-            ('KS', 'KS'),
-            ('KY', 'KY'),
-            ('LA', 'LA'),
-            ('ME', 'ME'),
-            ('MT', 'MT'),
-            ('NE', 'NE'),
-            ('NV', 'NV'),
-            ('NH', 'NH'),
-            ('NJ', 'NJ'),
-            ('NM', 'NM'),
-            ('NY', 'NY'),
-            ('NC', 'NC'),
-            ('ND', 'ND'),
-            ('OH', 'OH'),
-            ('OK', 'OK'),
-            ('OR', 'OR'),
-            ('MD', 'MD'),
-            ('MA', 'MA'),
-            ('MI', 'MI'),
-            ('MN', 'MN'),
-            ('MS', 'MS'),
-            ('MO', 'MO'),
-            ('PA', 'PA'),
-            ('RI', 'RI'),
-            ('SC', 'SC'),
-            ('SD', 'SD'),
-            ('TN', 'TN'),
-            ('TX', 'TX'),
-            ('UT', 'UT'),
-            ('VT', 'VT'),
-            ('VA', 'VA'),
-            ('WA', 'WA'),
-            ('WV', 'WV'),
-            ('WI', 'WI'),
-            ('WY', 'WY'),
-        ]
+        'state', validators=[required],
+        choices=STATE_CHOICES
     )
     phone = StringField(
-        'phone', validators=[Optional(), validate_us_phone]
+        'phone', validators=[optional, validate_us_phone]
     )
     image_link = StringField(
-        'image_link', validators=[Optional(), URL()]
+        'image_link', validators=[optional, valid_url]
     )
     genres = SelectMultipleField(
-        'genres', validators=[DataRequired()],
-        choices=[
-            ('Alternative', 'Alternative'),
-            ('Blues', 'Blues'),
-            ('Classical', 'Classical'),
-            ('Country', 'Country'),
-            ('Electronic', 'Electronic'),
-            ('Folk', 'Folk'),
-            ('Funk', 'Funk'),
-            ('Hip-Hop', 'Hip-Hop'),
-            ('Heavy Metal', 'Heavy Metal'),
-            ('Instrumental', 'Instrumental'),
-            ('Jazz', 'Jazz'),
-            ('Musical Theatre', 'Musical Theatre'),
-            ('Pop', 'Pop'),
-            ('Punk', 'Punk'),
-            ('R&B', 'R&B'),
-            ('Reggae', 'Reggae'),
-            ('Rock n Roll', 'Rock n Roll'),
-            ('Soul', 'Soul'),
-            ('Other', 'Other'),
-        ]
+        'genres', validators=[required],
+        choices=GENRE_CHOICES
     )
     facebook_link = StringField(
-        'facebook_link', validators=[Optional(), URL()]
+        'facebook_link', validators=[optional, valid_url]
     )
     website_link = StringField(
-        'website_link', validators=[Optional(), URL()]
+        'website_link', validators=[optional, valid_url]
     )
     seeking_venue_message = StringField(
         "seeking_venue_message"
     )
 
 # TODO IMPLEMENT NEW ARTIST FORM AND NEW SHOW FORM
+
+#----------------------------------------------------------------------------#
+# Dict validators.
+#----------------------------------------------------------------------------#
+
+# The rules of the forms above applied to plain dicts, for bulk imports that
+# would otherwise build a form per row. Values are strings, or lists of
+# strings for genres; the result is (data, None) with data shaped like
+# form.data, or (None, errors) with errors shaped like form.errors.
+
+def check_state(value):
+    if value not in STATE_VALUES:
+        return "Not a valid choice"
+
+def check_genres(values):
+    for value in values:
+        if value not in GENRE_VALUES:
+            return "'%s' is not a valid choice for this field" % value
+
+def check_phone(value):
+    if not PHONE_PATTERN.match(value):
+        return PHONE_MESSAGE
+
+def check_url(value):
+    match = valid_url.regex.match(value)
+    if not match or not valid_url.validate_hostname(match.group("host")):
+        return "Invalid URL."
+
+CHECKS = {
+    "state": check_state,
+    "genres": check_genres,
+    "phone": check_phone,
+    "url": check_url,
+}
+
+# (field, kind, required), in form field order
+SHOW_FIELDS = (
+    ("artist_id", "text", True),
+    ("venue_id", "text", True),
+    ("start_time", "datetime", True),
+)
+VENUE_FIELDS = (
+    ("name", "text", True),
+    ("city", "text", True),
+    ("state", "state", True),
+    ("address", "text", True),
+    ("phone", "phone", False),
+    ("image_link", "url", False),
+    ("genres", "genres", True),
+    ("facebook_link", "url", False),
+    ("website_link", "url", False),
+    ("seeking_talent_message", "text", False),
+)
+ARTIST_FIELDS = (
+    ("name", "text", True),
+    ("city", "text", True),
+    ("state", "state", True),
+    ("phone", "phone", False),
+    ("image_link", "url", False),
+    ("genres", "genres", True),
+    ("facebook_link", "url", False),
+    ("website_link", "url", False),
+    ("seeking_venue_message", "text", False),
+)
+
+def validate_fields(fields, values):
+    data, errors = {}, {}
+    for name, kind, is_required in fields:
+        value = values.get(name)
+        if kind == "genres":
+            value = list(value or ())
+        elif value is None:
+            value = ""
+        if kind == "datetime" and value:
+            try:
+                value = datetime.strptime(value, SHOW_TIME_FORMAT)
+            except ValueError:
+                # DataRequired replaces the form's parse error
+                errors[name] = ["This field is required." if is_required else "Not a valid datetime value"]
+                continue
+        data[name] = value
+        if not value or kind not in ("genres", "datetime") and not value.strip():
+            if is_required:
+                errors[name] = ["This field is required."]
+            continue
+        if kind in CHECKS:
+            message = CHECKS[kind](value)
+            if message:
+                errors[name] = [message]
+    if errors:
+        return None, errors
+    return data, None
+
+def validate_show_data(values):
+    return validate_fields(SHOW_FIELDS, values)
+
+def validate_venue_data(values):
+    return validate_fields(VENUE_FIELDS, values)
+
+def validate_artist_data(values):
+    return validate_fields(ARTIST_FIELDS, values)
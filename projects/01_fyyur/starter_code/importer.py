@@ -0,0 +1,214 @@
+import csv
+import json
+from itertools import islice
+from models import db, Venue, Artist, Show, bump_versions
+from forms import validate_venue_data, validate_artist_data, validate_show_data
+from summaries import add_to_feed, refresh_show_totals, genre_changes, adjust_genre_counts
+from bookings import BookingIndex, SHOW_LENGTH
+
+#----------------------------------------------------------------------------#
+# Bulk import.
+#----------------------------------------------------------------------------#
+
+# Rows are streamed from a CSV or JSONL file and handled chunk by chunk, so
+# memory stays flat however large the file is. Each row is checked against
+# the rules of the matching create form, as a plain dict (see forms.py);
+# venues and artists already listed in the same city (or repeated within a
+# chunk) are skipped, as are shows whose artist or venue does not exist or
+# that overlap another show of either (see bookings.py). Every chunk is
+# inserted with one executemany and committed, so an interrupted import can
+# be rerun from the start.
+
+def read_rows(path):
+    # yield (line number, row dict) pairs from a .csv or .jsonl file; a JSONL
+    # line that does not parse is yielded as the ValueError, and rejected by
+    # CatalogImport.validate like any other invalid row
+    with open(path, newline="", encoding="utf-8") as source:
+        if path.endswith(".csv"):
+            reader = csv.DictReader(source)
+            for row in reader:
+                yield reader.line_num, row
+        else:
+            for line_number, line in enumerate(source, start=1):
+                if line.strip():
+                    try:
+                        row = json.loads(line)
+                    except ValueError as error:
+                        row = error
+                    yield line_number, row
+
+def chunked(rows, size):
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+def row_values(row):
+    # values as strings, as a browser would post them; CSV genres are comma
+    # separated
+    values = {}
+    for key, value in row.items():
+        if value is None:
+            continue
+        if key == "genres" and isinstance(value, str):
+            value = [genre.strip() for genre in value.split(",") if genre.strip()]
+        if isinstance(value, list):
+            values[key] = [str(item) for item in value]
+        else:
+            values[key] = str(value)
+    return values
+
+
+class CatalogImport:
+
+    validate_data = None
+    model = None
+
+    def __init__(self, chunk_size=5000):
+        self.chunk_size = chunk_size
+        self.inserted = 0
+        self.skipped = 0
+        self.errors = []
+
+    def validate(self, row):
+        if isinstance(row, ValueError):
+            return None, {"line": ["Not valid JSON: " + str(row)]}
+        if not isinstance(row, dict):
+            return None, {"line": ["Each line must be a JSON object."]}
+        values, errors = self.validate_data(row_values(row))
+        if errors:
+            return None, errors
+        return self.values(values), None
+
+    def values(self, data):
+        return data
+
+    def filter_chunk(self, rows):
+        return rows
+
+    def after_insert(self, rows):
+        pass
+
+    def run(self, rows):
+        for chunk in chunked(rows, self.chunk_size):
+            valid = []
+            for line_number, row in chunk:
+                values, errors = self.validate(row)
+                if errors:
+                    self.errors.append((line_number, errors))
+                else:
+                    valid.append(values)
+            new_rows = self.filter_chunk(valid)
+            self.skipped += len(valid) - len(new_rows)
+            if new_rows:
+                db.session.execute(self.model.__table__.insert(), new_rows)
+                self.after_insert(new_rows)
+                db.session.commit()
+                self.inserted += len(new_rows)
+        return self
+
+
+class ListingImport(CatalogImport):
+    # venues and artists, deduplicated on (name, city, state)
+
+    def filter_chunk(self, rows):
+        model = self.model
+        names = {row["name"] for row in rows}
+        if not names:
+            return rows
+        existing = set(db.session.query(model.name, model.city, model.state).filter(model.name.in_(names)))
+        new_rows = []
+        for row in rows:
+            key = (row["name"], row["city"], row["state"])
+            if key not in existing:
+                existing.add(key)
+                new_rows.append(row)
+        return new_rows
+
+    def after_insert(self, rows):
+        genre_counts = {}
+        for row in rows:
+            for genre, change in genre_changes([], row["genres"]).items():
+                genre_counts[genre] = genre_counts.get(genre, 0) + change
+        adjust_genre_counts(db.session.connection(), self.kind, genre_counts)
+
+
+class VenueImport(ListingImport):
+    validate_data = staticmethod(validate_venue_data)
+    model = Venue
+    kind = "venue"
+
+    def values(self, data):
+        data["seeking_talent"] = data["seeking_talent_message"] != ""
+        return data
+
+
+class ArtistImport(ListingImport):
+    validate_data = staticmethod(validate_artist_data)
+    model = Artist
+    kind = "artist"
+
+    def values(self, data):
+        data["seeking_venue"] = data["seeking_venue_message"] != ""
+        return data
+
+
+class ShowImport(CatalogImport):
+    validate_data = staticmethod(validate_show_data)
+    model = Show
+
+    def values(self, data):
+        return {
+            "venue_id": int(data["venue_id"]),
+            "artist_id": int(data["artist_id"]),
+            "time": data["start_time"]
+        }
+
+    def validate(self, row):
+        try:
+            return super().validate(row)
+        except ValueError:
+            return None, {"ids": ["artist_id and venue_id must be numbers."]}
+
+    def filter_chunk(self, rows):
+        if not rows:
+            return rows
+        venue_ids = {row["venue_id"] for row in rows}
+        artist_ids = {row["artist_id"] for row in rows}
+        known_venues = {row.id for row in db.session.query(Venue.id).filter(Venue.id.in_(venue_ids))}
+        known_artists = {row.id for row in db.session.query(Artist.id).filter(Artist.id.in_(artist_ids))}
+        rows = [row for row in rows if row["venue_id"] in known_venues and row["artist_id"] in known_artists]
+        if not rows:
+            return rows
+        # drop shows overlapping a booked show, or an earlier row, of their
+        # venue or artist
+        times = [row["time"] for row in rows]
+        bookings = BookingIndex.load(venue_ids, artist_ids, min(times), max(times), SHOW_LENGTH)
+        new_rows = []
+        for row in rows:
+            if not bookings.conflicts(row["venue_id"], row["artist_id"], row["time"]):
+                bookings.add(row["venue_id"], row["artist_id"], row["time"])
+                new_rows.append(row)
+        return new_rows
+
+    def after_insert(self, rows):
+        # new shows change their venues' and artists' pages
+        venue_ids = {row["venue_id"] for row in rows}
+        artist_ids = {row["artist_id"] for row in rows}
+        add_to_feed(venue_ids=venue_ids)
+        refresh_show_totals("venue", venue_ids)
+        refresh_show_totals("artist", artist_ids)
+        bump_versions(Venue, venue_ids)
+        bump_versions(Artist, artist_ids)
+
+
+IMPORTS = {
+    "venues": VenueImport,
+    "artists": ArtistImport,
+    "shows": ShowImport,
+}
+
+def import_file(kind, path, chunk_size=5000):
+    return IMPORTS[kind](chunk_size).run(read_rows(path))
@@ -0,0 +1,311 @@
+import itertools
+from flask import current_app
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import Query
+from models import db, Venue, Artist, ShowFeed, ShowCount, Recommendation
+from summaries import venue_areas, show_clock
+
+#----------------------------------------------------------------------------#
+# Page data.
+#----------------------------------------------------------------------------#
+
+# The dictionaries behind the venue, artist and show pages, shared by the HTML
+# views in app.py, the JSON API in api.py and the async read routes in
+# asgi.py. The *_query functions build queries without a session so asgi.py
+# can run their statements on its own engine; the sync code binds them to
+# db.session. Show rows come from the ShowFeed read model (see summaries.py),
+# so only the calendar, which filters and labels shows by their venue's area,
+# needs a join.
+#
+# Venue and artist pages list at most SHOWS_PER_BUCKET upcoming and past
+# shows, each bucket read as one range of the feed's (venue or artist, start
+# time) index, with exact counts from show_counts_query.
+
+def venue_show_dict(row):
+    # show as listed on a venue page
+    return {
+        "artist_id": row.artist_id,
+        "artist_name": row.artist_name,
+        "artist_image_link": row.artist_image_link,
+        "start_time": row.start_time
+    }
+
+def artist_show_dict(row):
+    # show as listed on an artist page
+    return {
+        "venue_id": row.venue_id,
+        "venue_name": row.venue_name,
+        "venue_image_link": row.venue_image_link,
+        "start_time": row.start_time
+    }
+
+def show_listing_dict(row):
+    # show as listed on the /shows page
+    return {
+        "venue_id": row.venue_id,
+        "venue_name": row.venue_name,
+        "artist_id": row.artist_id,
+        "artist_name": row.artist_name,
+        "artist_image_link": row.artist_image_link,
+        "start_time": row.start_time
+    }
+
+def genre_filter(column, genres, match_all=False):
+    # listings whose genres column includes any (or all) of the given genres;
+    # on Postgres an array overlap or containment test served by the GIN
+    # index, on SQLite a lookup in the JSON list
+    genres = list(genres)
+    if db.engine.dialect.name == "postgresql":
+        wanted = db.cast(postgresql.array(genres), postgresql.ARRAY(db.String))
+        return column.op("@>" if match_all else "&&")(wanted)
+    value = db.literal_column("value")
+    if match_all:
+        return db.select([db.func.count(db.distinct(value))]).select_from(
+            db.func.json_each(column)).where(value.in_(genres)).as_scalar() == len(set(genres))
+    return db.exists(db.select([db.literal_column("1")]).select_from(
+        db.func.json_each(column)).where(value.in_(genres)))
+
+def area_listing(genres=None, match_all=False):
+    # venues come presorted by area from the summary table, so grouping them
+    # is a single pass
+    data = []
+    rows = venue_areas()
+    if genres:
+        matching = {row.id for row in db.session.query(Venue.id).filter(genre_filter(Venue.genres, genres, match_all))}
+        rows = [row for row in rows if row.venue_id in matching]
+    for (city, state), area_rows in itertools.groupby(rows, key=lambda row: (row.city, row.state)):
+        data.append({
+            "city": city,
+            "state": state,
+            "venues": [{
+                "id": row.venue_id,
+                "name": row.name,
+                "num_upcoming_shows": row.num_upcoming_shows
+            } for row in area_rows]
+        })
+    return data
+
+def venue_shows_query(venue_id, current_time, upcoming, limit):
+    # a venue's next or latest shows with each artist's display fields
+    query = Query([
+        ShowFeed.start_time,
+        ShowFeed.artist_id,
+        ShowFeed.artist_name,
+        ShowFeed.artist_image_link
+    ]).filter(ShowFeed.venue_id == venue_id)
+    if upcoming:
+        return query.filter(ShowFeed.start_time > current_time).order_by(ShowFeed.start_time).limit(limit)
+    return query.filter(ShowFeed.start_time <= current_time).order_by(ShowFeed.start_time.desc()).limit(limit)
+
+def artist_shows_query(artist_id, current_time, upcoming, limit):
+    # an artist's next or latest shows with each venue's display fields
+    query = Query([
+        ShowFeed.start_time,
+        ShowFeed.venue_id,
+        ShowFeed.venue_name,
+        ShowFeed.venue_image_link
+    ]).filter(ShowFeed.artist_id == artist_id)
+    if upcoming:
+        return query.filter(ShowFeed.start_time > current_time).order_by(ShowFeed.start_time).limit(limit)
+    return query.filter(ShowFeed.start_time <= current_time).order_by(ShowFeed.start_time.desc()).limit(limit)
+
+def show_counts_query(kind, object_id, current_time):
+    # exact upcoming and total show counts of a venue or artist (kind "venue"
+    # or "artist"); upcoming shows are counted over the feed's index, the
+    # total comes from ShowCount and past shows are the difference
+    key = ShowFeed.venue_id if kind == "venue" else ShowFeed.artist_id
+    upcoming = db.select([db.func.count(ShowFeed.show_id)]).where(
+        db.and_(key == object_id, ShowFeed.start_time > current_time)).as_scalar()
+    total = db.select([ShowCount.total]).where(
+        db.and_(ShowCount.kind == kind, ShowCount.object_id == object_id)).as_scalar()
+    return Query([upcoming.label("upcoming"), db.func.coalesce(total, 0).label("total")])
+
+def add_show_buckets(data, upcoming_shows, past_shows, counts):
+    data["past_shows"] = past_shows
+    data["upcoming_shows"] = upcoming_shows
+    data["past_shows_count"] = max(counts.total - counts.upcoming, 0)
+    data["upcoming_shows_count"] = counts.upcoming
+    return data
+
+def venue_page_dict(venue, upcoming_rows, past_rows, counts):
+    # works with a Venue or a row of the Venue table
+    data = {
+        "id": venue.id,
+        "name": venue.name,
+        "genres": venue.genres,
+        "address": venue.address,
+        "city": venue.city,
+        "state": venue.state,
+        "phone": venue.phone,
+        "website": venue.website_link,
+        "facebook_link": venue.facebook_link,
+        "seeking_talent": venue.seeking_talent,
+        "image_link": venue.image_link
+    }
+    if venue.seeking_talent == True:
+        data["seeking_description"] = venue.seeking_talent_message
+
+    return add_show_buckets(data,
+                            [venue_show_dict(row) for row in upcoming_rows],
+                            [venue_show_dict(row) for row in past_rows],
+                            counts)
+
+def artist_page_dict(artist, upcoming_rows, past_rows, counts):
+    # works with an Artist or a row of the Artist table
+    data = {
+        "id": artist.id,
+        "name": artist.name,
+        "genres": artist.genres,
+        "city": artist.city,
+        "state": artist.state,
+        "phone": artist.phone,
+        "website": artist.website_link,
+        "facebook_link": artist.facebook_link,
+        "seeking_venue": artist.seeking_venue,
+        "image_link": artist.image_link
+    }
+    if artist.seeking_venue == True:
+        data["seeking_description"] = artist.seeking_venue_message
+
+    return add_show_buckets(data,
+                            [artist_show_dict(row) for row in upcoming_rows],
+                            [artist_show_dict(row) for row in past_rows],
+                            counts)
+
+def venue_page(venue):
+    current_time = show_clock()
+    per_bucket = current_app.config["SHOWS_PER_BUCKET"]
+    session = db.session()
+    return venue_page_dict(
+        venue,
+        venue_shows_query(venue.id, current_time, True, per_bucket).with_session(session),
+        venue_shows_query(venue.id, current_time, False, per_bucket).with_session(session),
+        show_counts_query("venue", venue.id, current_time).with_session(session).one()
+    )
+
+def artist_page(artist):
+    current_time = show_clock()
+    per_bucket = current_app.config["SHOWS_PER_BUCKET"]
+    session = db.session()
+    return artist_page_dict(
+        artist,
+        artist_shows_query(artist.id, current_time, True, per_bucket).with_session(session),
+        artist_shows_query(artist.id, current_time, False, per_bucket).with_session(session),
+        show_counts_query("artist", artist.id, current_time).with_session(session).one()
+    )
+
+def artist_listing(genres=None, match_all=False):
+    artists = db.session.query(Artist.id, Artist.name)
+    if genres:
+        artists = artists.filter(genre_filter(Artist.genres, genres, match_all))
+    return [{"id": row.id, "name": row.name} for row in artists]
+
+def show_listing_query():
+    # shows ordered by start time, with venue and artist display fields
+    return Query([
+        ShowFeed.show_id,
+        ShowFeed.start_time,
+        ShowFeed.venue_id,
+        ShowFeed.venue_name,
+        ShowFeed.artist_id,
+        ShowFeed.artist_name,
+        ShowFeed.artist_image_link
+    ]).order_by(ShowFeed.start_time, ShowFeed.show_id)
+
+def show_listing():
+    return show_listing_query().with_session(db.session())
+
+def show_listing_page_query(page_size, after_time=None, after_id=None):
+    # one page of show_listing_query() rows continuing after the (start time,
+    # id) of the previous page's last show, so deep pages cost the same as the
+    # first; fetches one row extra to tell whether there is a next page
+    return continue_after(show_listing_query(), after_time, after_id).limit(page_size + 1)
+
+def continue_after(listing, after_time, after_id):
+    if after_time is None or after_id is None:
+        return listing
+    return listing.filter(db.or_(
+        ShowFeed.start_time > after_time,
+        db.and_(ShowFeed.start_time == after_time, ShowFeed.show_id > after_id)
+    ))
+
+def split_page(rows, page_size):
+    # the rows of the page and the (start time, id) key of the next one, if any
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        return rows, (rows[-1].start_time, rows[-1].show_id)
+    return rows, None
+
+def show_listing_page(page_size, after_time=None, after_id=None):
+    rows = show_listing_page_query(page_size, after_time, after_id).with_session(db.session()).all()
+    return split_page(rows, page_size)
+
+def show_calendar_query(start=None, end=None, city=None, state=None):
+    # shows starting in [start, end), optionally at venues of one city and/or
+    # state (exact match), ordered like show_listing_query(), with the venue's
+    # address. The area is looked up on Venue's (state, city) index and each
+    # venue's shows in the range on the feed's (venue_id, start_time) index.
+    calendar = Query([
+        ShowFeed.show_id,
+        ShowFeed.start_time,
+        ShowFeed.venue_id,
+        ShowFeed.venue_name,
+        Venue.address,
+        Venue.city,
+        Venue.state,
+        ShowFeed.artist_id,
+        ShowFeed.artist_name,
+        ShowFeed.artist_image_link
+    ]).join(Venue, Venue.id == ShowFeed.venue_id).order_by(ShowFeed.start_time, ShowFeed.show_id)
+    if start is not None:
+        calendar = calendar.filter(ShowFeed.start_time >= start)
+    if end is not None:
+        calendar = calendar.filter(ShowFeed.start_time < end)
+    if state is not None:
+        calendar = calendar.filter(Venue.state == state)
+    if city is not None:
+        calendar = calendar.filter(Venue.city == city)
+    return calendar
+
+def show_calendar_dict(row):
+    data = show_listing_dict(row)
+    data.update({
+        "show_id": row.show_id,
+        "address": row.address,
+        "city": row.city,
+        "state": row.state
+    })
+    return data
+
+def show_calendar_page(page_size, start=None, end=None, city=None, state=None, after_time=None, after_id=None):
+    calendar = continue_after(show_calendar_query(start, end, city, state), after_time, after_id)
+    rows = calendar.limit(page_size + 1).with_session(db.session()).all()
+    return split_page(rows, page_size)
+
+def show_calendar(start=None, end=None, city=None, state=None):
+    # all matching rows, fetched SHOWS_STREAM_CHUNK_SIZE at a time through a
+    # server-side cursor
+    return show_calendar_query(start, end, city, state).with_session(db.session()).execution_options(
+        stream_results=True).yield_per(current_app.config["SHOWS_STREAM_CHUNK_SIZE"])
+
+def recommendations(kind, object_id):
+    # the precomputed best matches of a venue (artists) or artist (venues)
+    # that are still seeking, best first
+    if kind == "venue":
+        match, seeking = Artist, Artist.seeking_venue
+    else:
+        match, seeking = Venue, Venue.seeking_talent
+    rows = db.session.query(Recommendation.match_id, Recommendation.score, match.name, match.city,
+                            match.state, match.genres, match.image_link).join(
+        match, match.id == Recommendation.match_id).filter(
+        Recommendation.kind == kind, Recommendation.object_id == object_id, seeking == True
+    ).order_by(Recommendation.rank)
+    return [{
+        "id": row.match_id,
+        "name": row.name,
+        "city": row.city,
+        "state": row.state,
+        "genres": row.genres,
+        "image_link": row.image_link,
+        "score": row.score
+    } for row in rows]
@@ -0,0 +1,29 @@
+"""trigram indexes for venue and artist name search
+
+Revision ID: 5f2c8e1d9a34
+Revises: ae7eb6e06f82
+Create Date: 2026-10-18 10:12:41.381205
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '5f2c8e1d9a34'
+down_revision = 'ae7eb6e06f82'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # pg_trgm lets the GIN indexes below serve ILIKE '%term%' lookups
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    op.create_index('ix_Venue_name_trgm', 'Venue', ['name'], unique=False,
+                    postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+    op.create_index('ix_Artist_name_trgm', 'Artist', ['name'], unique=False,
+                    postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+
+
+def downgrade():
+    op.drop_index('ix_Artist_name_trgm', table_name='Artist')
+    op.drop_index('ix_Venue_name_trgm', table_name='Venue')
@@ -0,0 +1,36 @@
+"""exclusion constraints against overlapping shows
+
+Revision ID: a4d6c1e9f273
+Revises: f3b8d2e61c07
+Create Date: 2026-10-18 18:26:03.517942
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'a4d6c1e9f273'
+down_revision = 'f3b8d2e61c07'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # a show occupies its venue and artist for SHOW_LENGTH (bookings.py, 180
+    # minutes) from its start; btree_gist lets one GiST index combine the id
+    # equality with the range overlap. Fails if overlapping shows already
+    # exist, which have to be moved or removed first.
+    op.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+    op.execute('''
+        ALTER TABLE "Show" ADD CONSTRAINT "ex_Show_venue_id_time"
+        EXCLUDE USING gist (venue_id WITH =, tsrange(time, time + interval '180 minutes') WITH &&)
+    ''')
+    op.execute('''
+        ALTER TABLE "Show" ADD CONSTRAINT "ex_Show_artist_id_time"
+        EXCLUDE USING gist (artist_id WITH =, tsrange(time, time + interval '180 minutes') WITH &&)
+    ''')
+
+
+def downgrade():
+    op.drop_constraint('ex_Show_artist_id_time', 'Show')
+    op.drop_constraint('ex_Show_venue_id_time', 'Show')
@@ -0,0 +1,23 @@
+"""venue area index for the show calendar
+
+Revision ID: b2e9f4d70a18
+Revises: a4d6c1e9f273
+Create Date: 2026-10-18 19:02:44.180395
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'b2e9f4d70a18'
+down_revision = 'a4d6c1e9f273'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_Venue_state_city', 'Venue', ['state', 'city'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_Venue_state_city', table_name='Venue')
@@ -0,0 +1,32 @@
+"""show lookup indexes and unique venue/artist identity
+
+Revision ID: b7e3a90c1f25
+Revises: 9d41b7c2e6f0
+Create Date: 2026-10-18 11:48:05.209114
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7e3a90c1f25'
+down_revision = '9d41b7c2e6f0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # shows are always looked up by venue or artist and then split on time
+    op.create_index('ix_Show_venue_id_time', 'Show', ['venue_id', 'time'], unique=False)
+    op.create_index('ix_Show_artist_id_time', 'Show', ['artist_id', 'time'], unique=False)
+    # back the duplicate checks in create_venue_submission and
+    # create_artist_submission; fails if duplicates already exist
+    op.create_index('ix_Venue_name_city_state', 'Venue', ['name', 'city', 'state'], unique=True)
+    op.create_index('ix_Artist_name_city_state', 'Artist', ['name', 'city', 'state'], unique=True)
+
+
+def downgrade():
+    op.drop_index('ix_Artist_name_city_state', table_name='Artist')
+    op.drop_index('ix_Venue_name_city_state', table_name='Venue')
+    op.drop_index('ix_Show_artist_id_time', table_name='Show')
+    op.drop_index('ix_Show_venue_id_time', table_name='Show')
@@ -0,0 +1,30 @@
+"""version stamps on venues and artists
+
+Revision ID: c5a8f3e27b19
+Revises: b7e3a90c1f25
+Create Date: 2026-10-18 13:20:44.917352
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5a8f3e27b19'
+down_revision = 'b7e3a90c1f25'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table in ('Venue', 'Artist'):
+        op.add_column(table, sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+        op.add_column(table, sa.Column('updated_at', sa.DateTime(), server_default=sa.text("(now() at time zone 'utc')"), nullable=False))
+        op.create_index('ix_%s_updated_at' % table, table, ['updated_at'], unique=False)
+
+
+def downgrade():
+    for table in ('Artist', 'Venue'):
+        op.drop_index('ix_%s_updated_at' % table, table_name=table)
+        op.drop_column(table, 'updated_at')
+        op.drop_column(table, 'version')
@@ -0,0 +1,43 @@
+"""genre indexes and facet counts
+
+Revision ID: c7f1a5e3b940
+Revises: b2e9f4d70a18
+Create Date: 2026-10-18 19:48:15.902361
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7f1a5e3b940'
+down_revision = 'b2e9f4d70a18'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # GIN indexes serve the array overlap (&&) and containment (@>) filters
+    op.create_index('ix_Venue_genres', 'Venue', ['genres'], unique=False, postgresql_using='gin')
+    op.create_index('ix_Artist_genres', 'Artist', ['genres'], unique=False, postgresql_using='gin')
+    op.create_table('GenreCount',
+    sa.Column('kind', sa.String(length=6), nullable=False),
+    sa.Column('genre', sa.String(), nullable=False),
+    sa.Column('total', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('kind', 'genre')
+    )
+    # fill it from the listings; "flask rebuild-genre-counts" does the same
+    op.execute('''
+        INSERT INTO "GenreCount" (kind, genre, total)
+        SELECT 'venue', genre, count(DISTINCT id) FROM "Venue", unnest(genres) AS genre GROUP BY genre
+    ''')
+    op.execute('''
+        INSERT INTO "GenreCount" (kind, genre, total)
+        SELECT 'artist', genre, count(DISTINCT id) FROM "Artist", unnest(genres) AS genre GROUP BY genre
+    ''')
+
+
+def downgrade():
+    op.drop_table('GenreCount')
+    op.drop_index('ix_Artist_genres', table_name='Artist')
+    op.drop_index('ix_Venue_genres', table_name='Venue')
@@ -0,0 +1,32 @@
+"""venue and artist recommendations
+
+Revision ID: d5a2e8c4f611
+Revises: c7f1a5e3b940
+Create Date: 2026-10-18 20:31:57.046218
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd5a2e8c4f611'
+down_revision = 'c7f1a5e3b940'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # filled by "flask build-recommendations"
+    op.create_table('Recommendation',
+    sa.Column('kind', sa.String(length=6), nullable=False),
+    sa.Column('object_id', sa.Integer(), nullable=False),
+    sa.Column('rank', sa.Integer(), nullable=False),
+    sa.Column('match_id', sa.Integer(), nullable=False),
+    sa.Column('score', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('kind', 'object_id', 'rank')
+    )
+
+
+def downgrade():
+    op.drop_table('Recommendation')
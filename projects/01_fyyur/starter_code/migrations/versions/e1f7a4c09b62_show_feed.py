@@ -0,0 +1,53 @@
+"""show feed read model
+
+Revision ID: e1f7a4c09b62
+Revises: c5a8f3e27b19
+Create Date: 2026-10-18 15:41:09.208113
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e1f7a4c09b62'
+down_revision = 'c5a8f3e27b19'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('ShowFeed',
+    sa.Column('show_id', sa.Integer(), nullable=False),
+    sa.Column('venue_id', sa.Integer(), nullable=False),
+    sa.Column('venue_name', sa.String(), nullable=False),
+    sa.Column('venue_image_link', sa.String(length=500), nullable=True),
+    sa.Column('artist_id', sa.Integer(), nullable=False),
+    sa.Column('artist_name', sa.String(), nullable=False),
+    sa.Column('artist_image_link', sa.String(length=500), nullable=True),
+    sa.Column('start_time', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['show_id'], ['Show.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['venue_id'], ['Venue.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['artist_id'], ['Artist.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('show_id')
+    )
+    op.create_index('ix_ShowFeed_start_time', 'ShowFeed', ['start_time', 'show_id'], unique=False)
+    op.create_index('ix_ShowFeed_venue_id_start_time', 'ShowFeed', ['venue_id', 'start_time'], unique=False)
+    op.create_index('ix_ShowFeed_artist_id_start_time', 'ShowFeed', ['artist_id', 'start_time'], unique=False)
+    # fill it from the existing shows; "flask rebuild-show-feed" does the same
+    op.execute('''
+        INSERT INTO "ShowFeed" (show_id, venue_id, venue_name, venue_image_link,
+                                artist_id, artist_name, artist_image_link, start_time)
+        SELECT "Show".id, "Venue".id, "Venue".name, "Venue".image_link,
+               "Artist".id, "Artist".name, "Artist".image_link, "Show".time
+        FROM "Show"
+        JOIN "Venue" ON "Venue".id = "Show".venue_id
+        JOIN "Artist" ON "Artist".id = "Show".artist_id
+    ''')
+
+
+def downgrade():
+    op.drop_index('ix_ShowFeed_artist_id_start_time', table_name='ShowFeed')
+    op.drop_index('ix_ShowFeed_venue_id_start_time', table_name='ShowFeed')
+    op.drop_index('ix_ShowFeed_start_time', table_name='ShowFeed')
+    op.drop_table('ShowFeed')
@@ -0,0 +1,28 @@
+"""edit versions on venues and artists
+
+Revision ID: e9c3b6f1a274
+Revises: d5a2e8c4f611
+Create Date: 2026-10-18 21:12:40.318275
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e9c3b6f1a274'
+down_revision = 'd5a2e8c4f611'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # counts edits of the listing itself, unlike version, which show bookings
+    # and deletions bump too; the edit forms are checked against it
+    for table in ('Venue', 'Artist'):
+        op.add_column(table, sa.Column('edit_version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade():
+    for table in ('Artist', 'Venue'):
+        op.drop_column(table, 'edit_version')
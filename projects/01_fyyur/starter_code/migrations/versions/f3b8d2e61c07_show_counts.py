@@ -0,0 +1,38 @@
+"""show count totals
+
+Revision ID: f3b8d2e61c07
+Revises: e1f7a4c09b62
+Create Date: 2026-10-18 17:05:52.631480
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3b8d2e61c07'
+down_revision = 'e1f7a4c09b62'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('ShowCount',
+    sa.Column('kind', sa.String(length=6), nullable=False),
+    sa.Column('object_id', sa.Integer(), nullable=False),
+    sa.Column('total', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('kind', 'object_id')
+    )
+    # fill it from the show feed; "flask rebuild-show-feed" does the same
+    op.execute('''
+        INSERT INTO "ShowCount" (kind, object_id, total)
+        SELECT 'venue', venue_id, count(show_id) FROM "ShowFeed" GROUP BY venue_id
+    ''')
+    op.execute('''
+        INSERT INTO "ShowCount" (kind, object_id, total)
+        SELECT 'artist', artist_id, count(show_id) FROM "ShowFeed" GROUP BY artist_id
+    ''')
+
+
+def downgrade():
+    op.drop_table('ShowCount')
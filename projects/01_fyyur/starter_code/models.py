@@ -1,18 +1,30 @@
+from datetime import datetime
 from flask import Flask
-from flask_sqlalchemy import SQLAlchemy
+from routing import RoutingSQLAlchemy
 from flask_migrate import Migrate
 
 
 app = Flask(__name__)
-db = SQLAlchemy(app)
+db = RoutingSQLAlchemy(app)
 migrate = Migrate(app, db)
 
 #----------------------------------------------------------------------------#
 # Models.
 #----------------------------------------------------------------------------#
 
+# Postgres stores genres as an array; SQLite, used for local testing and
+# benchmarks, falls back to JSON
+GenreList = db.ARRAY(db.String()).with_variant(db.JSON(), 'sqlite')
+
 class Venue(db.Model):
     __tablename__ = 'Venue'
+    __table_args__ = (
+        db.Index('ix_Venue_name_trgm', 'name', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+        db.Index('ix_Venue_name_city_state', 'name', 'city', 'state', unique=True),
+        db.Index('ix_Venue_updated_at', 'updated_at'),
+        db.Index('ix_Venue_state_city', 'state', 'city'),
+        db.Index('ix_Venue_genres', 'genres', postgresql_using='gin'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String, nullable=False)
@@ -20,33 +32,145 @@ class Venue(db.Model):
     state = db.Column(db.String(120), nullable=False)
     address = db.Column(db.String(120), nullable=False)
     phone = db.Column(db.String(120))
-    genres = db.Column(db.ARRAY(db.String()))
+    genres = db.Column(GenreList)
     image_link = db.Column(db.String(500))
     website_link = db.Column(db.String(120))
     facebook_link = db.Column(db.String(120))
     seeking_talent = db.Column(db.Boolean, default=False)
     seeking_talent_message = db.Column(db.String(120))
-    shows = db.relationship("Show", backref="venue", cascade="all, delete-orphan")
+    shows = db.relationship("Show", back_populates="venue", cascade="all, delete-orphan")
+    # bumped whenever anything shown on the venue's page changes
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    # bumped only when the venue itself is edited; guards the edit form
+    edit_version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
 
 class Artist(db.Model):
     __tablename__ = 'Artist'
+    __table_args__ = (
+        db.Index('ix_Artist_name_trgm', 'name', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+        db.Index('ix_Artist_name_city_state', 'name', 'city', 'state', unique=True),
+        db.Index('ix_Artist_updated_at', 'updated_at'),
+        db.Index('ix_Artist_genres', 'genres', postgresql_using='gin'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String, nullable=False)
     city = db.Column(db.String(120), nullable=False)
     state = db.Column(db.String(120), nullable=False)
     phone = db.Column(db.String(120))
-    genres = db.Column(db.ARRAY(db.String()), nullable=False)
+    genres = db.Column(GenreList, nullable=False)
     image_link = db.Column(db.String(500))
     website_link = db.Column(db.String(120))
     facebook_link = db.Column(db.String(120))
     seeking_venue = db.Column(db.Boolean, default=False)
     seeking_venue_message = db.Column(db.String(120))
-    shows = db.relationship("Show", backref="artist")
+    shows = db.relationship("Show", back_populates="artist")
+    # bumped whenever anything shown on the artist's page changes
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    # bumped only when the artist itself is edited; guards the edit form
+    edit_version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
 
 class Show(db.Model):
+    # on Postgres, exclusion constraints (migration a4d6c1e9f273) keep shows of
+    # the same venue or artist from overlapping
     __tablename__ = "Show"
+    __table_args__ = (
+        db.Index('ix_Show_venue_id_time', 'venue_id', 'time'),
+        db.Index('ix_Show_artist_id_time', 'artist_id', 'time'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     time = db.Column(db.DateTime, nullable=False)
     venue_id = db.Column(db.Integer, db.ForeignKey("Venue.id"), nullable=False)
-    artist_id = db.Column(db.Integer, db.ForeignKey("Artist.id"), nullable=False)
\ No newline at end of file
+    artist_id = db.Column(db.Integer, db.ForeignKey("Artist.id"), nullable=False)
+    venue = db.relationship("Venue", back_populates="shows")
+    artist = db.relationship("Artist", back_populates="shows")
+
+#----------------------------------------------------------------------------#
+# Version stamps.
+#----------------------------------------------------------------------------#
+
+# Venue.version/Artist.version and updated_at (UTC) back the ETag and
+# Last-Modified headers of the JSON API. ORM updates bump them automatically;
+# writes that change a page without updating its row, like adding a show,
+# call bump_versions. edit_version only counts edits of the row itself, so an
+# open edit form is not invalidated by a show being booked.
+
+@db.event.listens_for(Venue, 'before_update')
+@db.event.listens_for(Artist, 'before_update')
+def bump_version_on_update(mapper, connection, target):
+    # before_update also fires for rows whose attributes were set to the
+    # values they already had
+    if not db.session.object_session(target).is_modified(target, include_collections=False):
+        return
+    target.version = (target.version or 0) + 1
+    target.edit_version = (target.edit_version or 0) + 1
+    target.updated_at = datetime.utcnow()
+
+def bump_versions(model, ids):
+    ids = list(ids)
+    if ids:
+        db.session.query(model).filter(model.id.in_(ids)).update({
+            model.version: model.version + 1,
+            model.updated_at: datetime.utcnow()
+        }, synchronize_session=False)
+
+class VenueAreaSummary(db.Model):
+    # read model for the venues-by-area page, maintained by summaries.py
+    __tablename__ = "VenueAreaSummary"
+    __table_args__ = (
+        db.Index('ix_VenueAreaSummary_area', 'state', 'city', 'name'),
+        db.Index('ix_VenueAreaSummary_refreshed_at', 'refreshed_at'),
+    )
+    venue_id = db.Column(db.Integer, db.ForeignKey("Venue.id", ondelete="CASCADE"), primary_key=True)
+    name = db.Column(db.String, nullable=False)
+    city = db.Column(db.String(120), nullable=False)
+    state = db.Column(db.String(120), nullable=False)
+    num_upcoming_shows = db.Column(db.Integer, nullable=False, default=0)
+    refreshed_at = db.Column(db.DateTime, nullable=False)
+
+class ShowFeed(db.Model):
+    # read model for the show listings: each show with its venue's and
+    # artist's display fields, maintained by summaries.py
+    __tablename__ = "ShowFeed"
+    __table_args__ = (
+        db.Index('ix_ShowFeed_start_time', 'start_time', 'show_id'),
+        db.Index('ix_ShowFeed_venue_id_start_time', 'venue_id', 'start_time'),
+        db.Index('ix_ShowFeed_artist_id_start_time', 'artist_id', 'start_time'),
+    )
+    show_id = db.Column(db.Integer, db.ForeignKey("Show.id", ondelete="CASCADE"), primary_key=True)
+    venue_id = db.Column(db.Integer, db.ForeignKey("Venue.id", ondelete="CASCADE"), nullable=False)
+    venue_name = db.Column(db.String, nullable=False)
+    venue_image_link = db.Column(db.String(500))
+    artist_id = db.Column(db.Integer, db.ForeignKey("Artist.id", ondelete="CASCADE"), nullable=False)
+    artist_name = db.Column(db.String, nullable=False)
+    artist_image_link = db.Column(db.String(500))
+    start_time = db.Column(db.DateTime, nullable=False)
+
+class ShowCount(db.Model):
+    # total shows of each venue (kind "venue") and artist (kind "artist"),
+    # maintained by summaries.py
+    __tablename__ = "ShowCount"
+    kind = db.Column(db.String(6), primary_key=True)
+    object_id = db.Column(db.Integer, primary_key=True)
+    total = db.Column(db.Integer, nullable=False, default=0)
+
+class GenreCount(db.Model):
+    # number of venues (kind "venue") and artists (kind "artist") listing each
+    # genre, maintained by summaries.py
+    __tablename__ = "GenreCount"
+    kind = db.Column(db.String(6), primary_key=True)
+    genre = db.Column(db.String, primary_key=True)
+    total = db.Column(db.Integer, nullable=False, default=0)
+
+class Recommendation(db.Model):
+    # the best matches of each seeking venue (kind "venue", matches are
+    # artists) and seeking artist (kind "artist", matches are venues), ranked
+    # from 1; written by "flask build-recommendations" (see recommendations.py)
+    __tablename__ = "Recommendation"
+    kind = db.Column(db.String(6), primary_key=True)
+    object_id = db.Column(db.Integer, primary_key=True)
+    rank = db.Column(db.Integer, primary_key=True)
+    match_id = db.Column(db.Integer, nullable=False)
+    score = db.Column(db.Float, nullable=False)
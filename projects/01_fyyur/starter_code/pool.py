@@ -0,0 +1,152 @@
+import threading
+import time
+from flask import Response, has_request_context
+from sqlalchemy import event, exc
+from sqlalchemy.engine import Engine
+from sqlalchemy.engine.url import make_url
+from sqlalchemy.pool import Pool, QueuePool, NullPool
+from models import db
+
+#----------------------------------------------------------------------------#
+# Connection pool.
+#----------------------------------------------------------------------------#
+
+# Turns the DATABASE_* settings in config.py into SQLALCHEMY_ENGINE_OPTIONS and
+# counts what the pool does, served in Prometheus text format at /metrics.
+#
+# On Postgres connections are handed out last in, first out, so after a burst
+# the extra connections sit idle and get recycled instead of all staying warm.
+# Requests that find the pool exhausted queue for DATABASE_POOL_TIMEOUT seconds
+# rather than opening more connections. With DATABASE_PGBOUNCER the local pool
+# is dropped in favour of PgBouncer's. psycopg2 never prepares statements on
+# the server, so nothing else needs to change for transaction pooling.
+#
+# DATABASE_STATEMENT_TIMEOUT is set with SET LOCAL at the start of every
+# transaction run while serving a request, so it bounds page and API queries
+# but not the CLI commands and background refreshes, which legitimately run
+# long batch statements on the same engine. SET LOCAL also suits PgBouncer,
+# where a session setting would leak to other clients.
+#
+# SQLite only gets pre-ping and recycling. Counters are per worker process.
+
+def engine_options(config):
+    options = {
+        "pool_pre_ping": config["DATABASE_POOL_PRE_PING"],
+        "pool_recycle": config["DATABASE_POOL_RECYCLE"],
+    }
+    if not make_url(config["SQLALCHEMY_DATABASE_URI"]).drivername.startswith("postgres"):
+        return options
+    if config["DATABASE_PGBOUNCER"]:
+        options["poolclass"] = NullPool
+        return options
+    options.update(
+        poolclass=TimedQueuePool,
+        pool_size=config["DATABASE_POOL_SIZE"],
+        max_overflow=config["DATABASE_MAX_OVERFLOW"],
+        pool_timeout=config["DATABASE_POOL_TIMEOUT"],
+        pool_use_lifo=True,
+    )
+    return options
+
+
+class PoolStats:
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {
+            "connects": 0,
+            "checkouts": 0,
+            "checkins": 0,
+            "invalidations": 0,
+            "timeouts": 0,
+            "wait_seconds": 0.0,
+        }
+        self.max_wait = 0.0
+
+    def add(self, name, amount=1):
+        with self.lock:
+            self.counters[name] += amount
+
+    def add_wait(self, seconds, timed_out=False):
+        with self.lock:
+            self.counters["wait_seconds"] += seconds
+            self.counters["timeouts"] += timed_out
+            self.max_wait = max(self.max_wait, seconds)
+
+
+pool_stats = PoolStats()
+
+
+class TimedQueuePool(QueuePool):
+    # QueuePool that records how long checkouts wait for a free connection,
+    # including opening a new one within the overflow
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            pool_stats.add_wait(time.perf_counter() - start, timed_out=True)
+            raise
+        pool_stats.add_wait(time.perf_counter() - start)
+        return connection
+
+
+class PoolMonitor:
+
+    def __init__(self, app=None):
+        self.app = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        options = engine_options(app.config)
+        # anything set explicitly in SQLALCHEMY_ENGINE_OPTIONS wins
+        options.update(app.config.get("SQLALCHEMY_ENGINE_OPTIONS") or {})
+        app.config["SQLALCHEMY_ENGINE_OPTIONS"] = options
+        if app.config["DATABASE_STATEMENT_TIMEOUT"]:
+            event.listen(Engine, "begin", self.set_statement_timeout)
+
+        event.listen(Pool, "connect", lambda *args: pool_stats.add("connects"))
+        event.listen(Pool, "checkout", lambda *args: pool_stats.add("checkouts"))
+        event.listen(Pool, "checkin", lambda *args: pool_stats.add("checkins"))
+        event.listen(Pool, "invalidate", lambda *args: pool_stats.add("invalidations"))
+        if app.config.get("POOL_METRICS_ENABLED", False):
+            app.add_url_rule('/metrics', 'metrics', self.metrics)
+
+    def set_statement_timeout(self, conn):
+        if conn.dialect.name != "postgresql" or not has_request_context():
+            return
+        cursor = conn.connection.cursor()
+        cursor.execute("SET LOCAL statement_timeout = %d" % self.app.config["DATABASE_STATEMENT_TIMEOUT"])
+        cursor.close()
+
+    def metrics(self):
+        pool = db.get_engine().pool
+        with pool_stats.lock:
+            counters = dict(pool_stats.counters)
+            max_wait = pool_stats.max_wait
+        lines = []
+
+        def metric(name, kind, value, help_text):
+            lines.append("# HELP fyyur_db_pool_%s %s" % (name, help_text))
+            lines.append("# TYPE fyyur_db_pool_%s %s" % (name, kind))
+            lines.append("fyyur_db_pool_%s %s" % (name, value))
+
+        if isinstance(pool, QueuePool):
+            metric("size", "gauge", pool.size(), "Connections kept open by the pool.")
+            metric("checked_out", "gauge", pool.checkedout(), "Connections currently in use.")
+            metric("checked_in", "gauge", pool.checkedin(), "Idle connections in the pool.")
+            metric("overflow", "gauge", max(pool.overflow(), 0), "Connections open beyond the pool size.")
+        metric("connects_total", "counter", counters["connects"], "Database connections opened.")
+        metric("checkouts_total", "counter", counters["checkouts"], "Connections handed out by the pool.")
+        metric("checkins_total", "counter", counters["checkins"], "Connections returned to the pool.")
+        metric("invalidations_total", "counter", counters["invalidations"], "Connections discarded as broken.")
+        metric("timeouts_total", "counter", counters["timeouts"], "Checkouts that gave up waiting for a connection.")
+        metric("wait_seconds_total", "counter", "%.6f" % counters["wait_seconds"], "Time spent waiting for a connection.")
+        metric("wait_seconds_max", "gauge", "%.6f" % max_wait, "Longest wait for a connection.")
+        return Response("\n".join(lines) + "\n", mimetype="text/plain; version=0.0.4")
+
+
+pool_monitor = PoolMonitor()
@@ -0,0 +1,107 @@
+import re
+import time
+from collections import Counter
+from flask import g, has_app_context, request
+from markupsafe import escape
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+#----------------------------------------------------------------------------#
+# Query profiler.
+#----------------------------------------------------------------------------#
+
+# Counts the queries each request runs, their total time and how often the
+# same statement repeats, which is how N+1 patterns show up. Results go out as
+# X-Query-Count / X-Query-Time / Server-Timing headers (and an overlay on HTML
+# pages with PROFILER_PANEL), and requests over the PROFILER_MAX_* thresholds
+# are logged as warnings through app.logger, i.e. to error.log outside debug.
+#
+# The listeners sit on the Engine class, so they cover the engine Flask-
+# SQLAlchemy creates for db without needing an app context at startup. Queries
+# run while a streamed response is being sent come after the headers and are
+# not counted.
+
+# placeholder lists such as "IN (?, ?, ?)" collapse to one fingerprint
+PLACEHOLDER_LIST = re.compile(r"\((?:\s*(?:\?|%\(\w+\)s|:\w+|%s)\s*,?)+\)")
+WHITESPACE = re.compile(r"\s+")
+
+def fingerprint(statement):
+    return PLACEHOLDER_LIST.sub("(?)", WHITESPACE.sub(" ", statement)).strip()
+
+
+class QueryProfiler:
+
+    def __init__(self, app=None):
+        self.app = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        if not app.config.get("PROFILER_ENABLED", False):
+            return
+        self.app = app
+        event.listen(Engine, "before_cursor_execute", self.before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", self.after_cursor_execute)
+        app.before_request(self.start_request)
+        app.after_request(self.finish_request)
+
+    # the start time is kept on the statement's execution context rather than
+    # on the connection, so a statement that raises (and never reaches
+    # after_cursor_execute) leaves nothing behind; the few internal
+    # statements run without a context are counted with no time
+    def before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._profiler_start = time.perf_counter()
+
+    def after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        start = getattr(context, "_profiler_start", None)
+        elapsed = time.perf_counter() - start if start is not None else 0.0
+        if not has_app_context():
+            return
+        stats = g.get("query_stats")
+        if stats is None:
+            return
+        stats["count"] += 1
+        stats["time"] += elapsed
+        stats["statements"][fingerprint(statement)] += 1
+
+    def start_request(self):
+        g.query_stats = {"count": 0, "time": 0.0, "statements": Counter()}
+
+    def finish_request(self, response):
+        stats = g.pop("query_stats", None)
+        if stats is None:
+            return response
+        config = self.app.config
+        db_time = stats["time"] * 1000
+        repeated = [(statement, count) for statement, count in stats["statements"].most_common(5)
+                    if count >= config["PROFILER_MAX_REPEATS"]]
+
+        response.headers["X-Query-Count"] = str(stats["count"])
+        response.headers["X-Query-Time"] = "%.1f" % db_time
+        response.headers["Server-Timing"] = 'db;dur=%.1f;desc="%d queries"' % (db_time, stats["count"])
+
+        if (stats["count"] > config["PROFILER_MAX_QUERIES"]
+                or db_time > config["PROFILER_MAX_DB_TIME"] or repeated):
+            message = "%s %s ran %d queries in %.1fms" % (request.method, request.path, stats["count"], db_time)
+            for statement, count in repeated:
+                message += "\n  %dx %s" % (count, statement)
+            self.app.logger.warning(message)
+
+        if config.get("PROFILER_PANEL") and response.mimetype == "text/html" and not response.is_streamed:
+            self.add_panel(response, stats, db_time)
+        return response
+
+    def add_panel(self, response, stats, db_time):
+        rows = "".join("<li>%dx <code>%s</code></li>" % (count, escape(statement))
+                       for statement, count in stats["statements"].most_common(5))
+        panel = ('<div style="position:fixed;bottom:0;right:0;z-index:9999;max-width:50%%;'
+                 'max-height:40%%;overflow:auto;background:#fff;border:1px solid #ccc;'
+                 'padding:6px;font-size:11px"><strong>%d queries, %.1fms</strong><ul>%s</ul></div>'
+                 % (stats["count"], db_time, rows))
+        body = response.get_data(as_text=True)
+        if "</body>" in body:
+            response.set_data(body.replace("</body>", panel + "</body>", 1))
+
+
+query_profiler = QueryProfiler()
@@ -0,0 +1,147 @@
+import numpy as np
+from scipy import sparse
+from flask import current_app
+from models import db, Venue, Artist, Show, Recommendation
+
+#----------------------------------------------------------------------------#
+# Venue and artist matching.
+#----------------------------------------------------------------------------#
+
+# "flask build-recommendations" scores every pair of a venue seeking talent
+# and an artist seeking a venue, and replaces the Recommendation table with
+# the RECOMMENDATIONS_TOP_K best matches of each, which the API then reads by
+# primary key. A pair's score is the RECOMMENDATION_WEIGHTS weighted sum of
+#
+#   genres   cosine similarity of their genre lists
+#   area     1 in the same city, 0.5 elsewhere in the same state
+#   history  1 - 1 / (1 + shows the artist has played at the venue)
+#
+# and pairs scoring 0 are never recommended. Genre lists are rows of sparse
+# matrices; venues are scored RECOMMENDATION_BLOCK_SIZE at a time against all
+# artists with one matrix product and a few array comparisons, while running
+# top-k arrays collect each artist's best venues, so 20k venues and 100k
+# artists take a single pass of about 80 blocks.
+#
+# Needs NumPy and SciPy, which the web app itself does not:
+#
+#   pip install -r requirements-batch.txt
+
+def seeking_listings(model, seeking):
+    return db.session.query(model.id, model.city, model.state, model.genres).filter(
+        seeking == True).order_by(model.id).all()
+
+def genre_matrix(rows, vocabulary):
+    # one L2-normalised row of genre indicators per listing, so the product
+    # of two rows is their cosine similarity
+    indptr, indices, data = [0], [], []
+    for row in rows:
+        columns = sorted({vocabulary.setdefault(genre, len(vocabulary)) for genre in row.genres or []})
+        if columns:
+            indices.extend(columns)
+            data.extend([1 / np.sqrt(len(columns))] * len(columns))
+        indptr.append(len(indices))
+    return indptr, indices, data
+
+def to_csr(parts, shape):
+    indptr, indices, data = parts
+    return sparse.csr_matrix((np.array(data, dtype=np.float32), indices, indptr), shape=shape)
+
+def area_codes(rows, states, cities):
+    # small integers standing for each listing's state and city
+    state_codes = [states.setdefault(row.state, len(states)) for row in rows]
+    city_codes = [cities.setdefault((row.city.strip().lower(), row.state), len(cities)) for row in rows]
+    return np.array(state_codes, dtype=np.int32), np.array(city_codes, dtype=np.int32)
+
+def history_matrix(venue_positions, artist_positions):
+    # shows played per (seeking venue, seeking artist) pair
+    pairs = db.session.query(Show.venue_id, Show.artist_id, db.func.count(Show.id)).filter(
+        Show.venue_id.in_(db.session.query(Venue.id).filter(Venue.seeking_talent == True)),
+        Show.artist_id.in_(db.session.query(Artist.id).filter(Artist.seeking_venue == True))
+    ).group_by(Show.venue_id, Show.artist_id)
+    rows, columns, counts = [], [], []
+    for venue_id, artist_id, count in pairs:
+        rows.append(venue_positions[venue_id])
+        columns.append(artist_positions[artist_id])
+        counts.append(1 - 1 / (1 + count))
+    return sparse.csr_matrix((np.array(counts, dtype=np.float32), (rows, columns)),
+                             shape=(len(venue_positions), len(artist_positions)))
+
+def top_k(scores, k, axis):
+    # positions of the k best scores along axis, best first
+    best = np.argpartition(-scores, k - 1, axis=axis)
+    best = best[:, :k] if axis == 1 else best[:k]
+    order = np.argsort(-np.take_along_axis(scores, best, axis=axis), axis=axis, kind="stable")
+    return np.take_along_axis(best, order, axis=axis)
+
+def recommendation_rows(kind, object_ids, match_ids, scores):
+    for object_id, matches, match_scores in zip(object_ids, match_ids, scores):
+        rank = 0
+        for match_id, score in zip(matches, match_scores):
+            if score > 0:
+                rank += 1
+                yield {"kind": kind, "object_id": int(object_id), "rank": rank,
+                       "match_id": int(match_id), "score": round(float(score), 6)}
+
+def insert_rows(rows, chunk_size=10000):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            db.session.execute(Recommendation.__table__.insert(), chunk)
+            chunk = []
+    if chunk:
+        db.session.execute(Recommendation.__table__.insert(), chunk)
+
+def build_recommendations():
+    # returns the number of venues and artists given recommendations
+    config = current_app.config
+    weights = config["RECOMMENDATION_WEIGHTS"]
+    block_size = config["RECOMMENDATION_BLOCK_SIZE"]
+    venues = seeking_listings(Venue, Venue.seeking_talent)
+    artists = seeking_listings(Artist, Artist.seeking_venue)
+    Recommendation.query.delete(synchronize_session=False)
+    if not venues or not artists:
+        db.session.commit()
+        return 0, 0
+
+    vocabulary, states, cities = {}, {}, {}
+    venue_parts, artist_parts = genre_matrix(venues, vocabulary), genre_matrix(artists, vocabulary)
+    venue_genres = to_csr(venue_parts, (len(venues), len(vocabulary)))
+    # dense as genres are few: sparse block times dense gives dense scores
+    artist_genres = to_csr(artist_parts, (len(artists), len(vocabulary))).T.toarray()
+    venue_states, venue_cities = area_codes(venues, states, cities)
+    artist_states, artist_cities = area_codes(artists, states, cities)
+    venue_ids = np.array([row.id for row in venues])
+    artist_ids = np.array([row.id for row in artists])
+    history = history_matrix({row.id: position for position, row in enumerate(venues)},
+                             {row.id: position for position, row in enumerate(artists)})
+    area_weight = np.float32(weights["area"] / 2)
+
+    k = config["RECOMMENDATIONS_TOP_K"]
+    venue_k, artist_k = min(k, len(artists)), min(k, len(venues))
+    # each artist's best venues so far, as scores and venue positions
+    best_scores = np.full((artist_k, len(artists)), -np.inf, dtype=np.float32)
+    best_venues = np.zeros((artist_k, len(artists)), dtype=np.int64)
+    for start in range(0, len(venues), block_size):
+        stop = min(start + block_size, len(venues))
+        scores = np.asarray(venue_genres[start:stop] @ artist_genres, dtype=np.float32)
+        scores *= weights["genres"]
+        scores += (venue_states[start:stop, None] == artist_states[None, :]) * area_weight
+        scores += (venue_cities[start:stop, None] == artist_cities[None, :]) * area_weight
+        played = history[start:stop].tocoo()
+        scores[played.row, played.col] += weights["history"] * played.data
+
+        matches = top_k(scores, venue_k, axis=1)
+        insert_rows(recommendation_rows("venue", venue_ids[start:stop], artist_ids[matches],
+                                        np.take_along_axis(scores, matches, axis=1)))
+
+        candidates = np.vstack([best_scores, scores])
+        positions = np.vstack([best_venues, np.broadcast_to(
+            np.arange(start, stop)[:, None], scores.shape)])
+        keep = top_k(candidates, artist_k, axis=0)
+        best_scores = np.take_along_axis(candidates, keep, axis=0)
+        best_venues = np.take_along_axis(positions, keep, axis=0)
+
+    insert_rows(recommendation_rows("artist", artist_ids, venue_ids[best_venues.T], best_scores.T))
+    db.session.commit()
+    return len(venues), len(artists)
@@ -0,0 +1,68 @@
+import functools
+import random
+import time
+from flask import current_app, g, has_app_context, request
+from flask_sqlalchemy import SQLAlchemy, SignallingSession, get_state
+from sqlalchemy import orm
+from sqlalchemy.sql.dml import UpdateBase
+
+#----------------------------------------------------------------------------#
+# Read replica routing.
+#----------------------------------------------------------------------------#
+
+# Views decorated with @replica_reads run their queries against one of the
+# DATABASE_REPLICA_URLS, picked at random per request; everything else,
+# including flushes and INSERT/UPDATE/DELETE statements, goes to the primary.
+# Decorated views only read: a write computed from what they read would be
+# based on the replica's possibly stale copy.
+#
+# Pages rendered from a replica are not stored in the page cache (see
+# cache.py), where they could replace a fresh page just invalidated by a
+# write and be served to the writer after the sticky period.
+#
+# A write request leaves a cookie that keeps the browser on the primary for
+# DATABASE_REPLICA_STICKY seconds, long enough for the redirect after a form
+# submission to show the change even if the replicas lag behind.
+
+STICKY_COOKIE = "fyyur_primary_until"
+
+def replica_keys(app):
+    return sorted(key for key in app.config.get("SQLALCHEMY_BINDS") or {} if key.startswith("replica_"))
+
+
+class RoutingSession(SignallingSession):
+
+    def get_bind(self, mapper=None, clause=None):
+        replica = g.get("read_replica") if has_app_context() else None
+        if replica is None or self._flushing or isinstance(clause, UpdateBase):
+            return SignallingSession.get_bind(self, mapper, clause)
+        return get_state(self.app).db.get_engine(self.app, bind=replica)
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+
+def replica_reads(view):
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        g.replica_view = True
+        keys = replica_keys(current_app)
+        sticky_until = request.cookies.get(STICKY_COOKIE, type=float)
+        if keys and (sticky_until is None or sticky_until < time.time()):
+            g.read_replica = random.choice(keys)
+        return view(*args, **kwargs)
+    return wrapper
+
+def stick_to_primary(response):
+    # decorated POST views, such as the searches, only read
+    if request.method not in ("GET", "HEAD", "OPTIONS") and not g.get("replica_view"):
+        sticky = current_app.config["DATABASE_REPLICA_STICKY"]
+        response.set_cookie(STICKY_COOKIE, "%.3f" % (time.time() + sticky), max_age=sticky, httponly=True)
+    return response
+
+def init_replica_routing(app):
+    if replica_keys(app):
+        app.after_request(stick_to_primary)
@@ -0,0 +1,205 @@
+import threading
+import time
+from collections import defaultdict
+from sqlalchemy.exc import SQLAlchemyError
+from models import db, Venue, Artist
+
+#----------------------------------------------------------------------------#
+# Name search.
+#----------------------------------------------------------------------------#
+
+# Two engines answer /venues/search and /artists/search, picked with
+# SEARCH_ENGINE in config.py:
+#
+# "database": case-insensitive substring match in SQL. On Postgres the ILIKE
+#   is served by the pg_trgm GIN indexes on Venue.name and Artist.name; on
+#   SQLite it compiles to lower(name) LIKE lower(term).
+# "memory": an in-process trigram index per model, for deployments without
+#   pg_trgm. init_search starts a thread in each worker process that builds
+#   the indexes at startup and rebuilds them every SEARCH_INDEX_MAX_AGE
+#   seconds; in between, the create, edit and delete handlers keep them
+#   current. Writes made through another worker or by "flask import-catalog"
+#   show up at the next rebuild. Until the first build, searches fall back to
+#   the database.
+#
+# Terms shorter than SEARCH_MIN_TERM_LENGTH are not searched at all: they have
+# no trigram to look up, so they would match by scanning every name. Counts
+# stop at SEARCH_MAX_COUNT, which bounds the rows counted for a common term;
+# only the first SEARCH_MAX_COUNT matches can be paged through.
+
+def like_pattern(search_term):
+    # escape LIKE wildcards so user input only ever matches literally
+    escaped = search_term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return "%" + escaped + "%"
+
+def page_bounds(count, page, per_page):
+    pages = max(1, -(-count // per_page))
+    page = min(max(1, page), pages)
+    return page, pages
+
+def search_results(count, page, per_page, max_count):
+    # count capped at max_count, and the page within it; "more" is set when
+    # there are further matches beyond the cap
+    more = count > max_count
+    count = min(count, max_count)
+    page, pages = page_bounds(count, page, per_page)
+    return {"count": count, "more": more, "too_short": False, "page": page, "pages": pages, "data": []}
+
+def database_search(model, search_term, page=1, per_page=20, max_count=1000):
+    # at most max_count + 1 matches are read, in index order, and only those
+    # are counted and sorted by name, so a broad term costs no more than a
+    # narrow one; past the cap the pages hold the first matches found
+    matches = db.session.query(model.id, model.name).filter(
+        model.name.ilike(like_pattern(search_term), escape="\\")
+    ).limit(max_count + 1).subquery()
+    count = db.session.query(db.func.count()).select_from(matches).scalar()
+    results = search_results(count, page, per_page, max_count)
+    offset = (results["page"] - 1) * per_page
+    # the extra row read to detect "more" is not listed
+    rows = db.session.query(matches.c.id, matches.c.name).order_by(
+        matches.c.name, matches.c.id).offset(offset).limit(max(0, min(per_page, results["count"] - offset))).all()
+    results["data"] = [{"id": row.id, "name": row.name} for row in rows]
+    return results
+
+
+class NameIndex:
+    # inverted index from lower-cased character n-grams to ids
+
+    def __init__(self, model, gram_size=3):
+        self.model = model
+        self.gram_size = gram_size
+        self.ready = False
+        self.built_at = None
+        self.names = {}
+        self.keys = {}
+        self.postings = defaultdict(set)
+        self.lock = threading.Lock()
+        # changes made while a build runs, replayed onto the new index; None
+        # when no build is running
+        self.pending = None
+
+    def grams(self, key):
+        n = self.gram_size
+        return {key[i:i + n] for i in range(len(key) - n + 1)}
+
+    def insert(self, object_id, name):
+        key = name.lower()
+        self.names[object_id] = name
+        self.keys[object_id] = key
+        for gram in self.grams(key):
+            self.postings[gram].add(object_id)
+
+    def discard(self, object_id):
+        key = self.keys.pop(object_id, None)
+        if key is None:
+            return
+        del self.names[object_id]
+        for gram in self.grams(key):
+            posting = self.postings[gram]
+            posting.discard(object_id)
+            if not posting:
+                del self.postings[gram]
+
+    def change(self, object_id, name):
+        # name None removes; call with the lock held
+        self.discard(object_id)
+        if name is not None:
+            self.insert(object_id, name)
+
+    def build(self):
+        # read every name into a new index and swap it in; returns False
+        # without building when another thread is already building
+        with self.lock:
+            if self.pending is not None:
+                return False
+            self.pending = []
+        try:
+            fresh = NameIndex(self.model, self.gram_size)
+            for row in db.session.query(self.model.id, self.model.name):
+                fresh.insert(row.id, row.name)
+            with self.lock:
+                for object_id, name in self.pending:
+                    fresh.change(object_id, name)
+                self.names, self.keys, self.postings = fresh.names, fresh.keys, fresh.postings
+                self.ready = True
+                self.built_at = time.time()
+        finally:
+            with self.lock:
+                self.pending = None
+        return True
+
+    def add(self, object_id, name):
+        # also used for renames
+        with self.lock:
+            if self.pending is not None:
+                self.pending.append((object_id, name))
+            if self.ready:
+                self.change(object_id, name)
+
+    def remove(self, object_id):
+        with self.lock:
+            if self.pending is not None:
+                self.pending.append((object_id, None))
+            if self.ready:
+                self.change(object_id, None)
+
+    def search(self, search_term):
+        # ids whose name contains search_term, ordered like database_search
+        term = search_term.lower()
+        with self.lock:
+            if len(term) < self.gram_size:
+                candidates = self.keys
+            else:
+                postings = sorted((self.postings.get(gram, set()) for gram in self.grams(term)), key=len)
+                candidates = set.intersection(*postings)
+            matches = [object_id for object_id in candidates if term in self.keys[object_id]]
+            names = self.names
+            return sorted(((names[object_id], object_id) for object_id in matches))
+
+    def search_page(self, search_term, page=1, per_page=20, max_count=1000):
+        matches = self.search(search_term)
+        results = search_results(len(matches), page, per_page, max_count)
+        start = (results["page"] - 1) * per_page
+        results["data"] = [{"id": object_id, "name": name} for name, object_id in matches[start:start + per_page]]
+        return results
+
+
+venue_index = NameIndex(Venue)
+artist_index = NameIndex(Artist)
+name_indexes = {Venue: venue_index, Artist: artist_index}
+
+def search_names(model, search_term, page=1, per_page=20, engine="database", min_length=3, max_count=1000):
+    # surrounding spaces are not part of the term
+    search_term = search_term.strip()
+    if len(search_term) < min_length:
+        results = search_results(0, 1, per_page, max_count)
+        results["too_short"] = True
+        return results
+    if engine == "memory":
+        index = name_indexes[model]
+        if index.ready:
+            return index.search_page(search_term, page, per_page, max_count)
+    return database_search(model, search_term, page, per_page, max_count)
+
+
+def rebuild_indexes(app, max_age):
+    # build now and then every max_age seconds (only once when max_age is 0)
+    while True:
+        with app.app_context():
+            for index in name_indexes.values():
+                try:
+                    index.build()
+                except SQLAlchemyError:
+                    app.logger.exception("Building the %s name index failed", index.model.__name__)
+                    db.session.rollback()
+            db.session.remove()
+        if not max_age:
+            return
+        time.sleep(max_age)
+
+def init_search(app):
+    if app.config.get("SEARCH_ENGINE") != "memory":
+        return
+    thread = threading.Thread(target=rebuild_indexes, args=(app, app.config.get("SEARCH_INDEX_MAX_AGE", 60)),
+                              name="search-index", daemon=True)
+    thread.start()
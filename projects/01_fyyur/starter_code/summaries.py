@@ -0,0 +1,303 @@
+import threading
+import time
+from datetime import datetime, timedelta
+from dateutil import tz
+from flask import current_app
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.exc import SQLAlchemyError
+from models import db, Venue, Artist, Show, VenueAreaSummary, ShowFeed, ShowCount, GenreCount
+
+#----------------------------------------------------------------------------#
+# Show counts.
+#----------------------------------------------------------------------------#
+
+# Show times are stored as naive wall clock times in SHOWS_TIMEZONE, or in
+# the server's local time when that is None, so whether a show is upcoming is
+# decided against the current time in that zone.
+
+def now_in(timezone_name):
+    if not timezone_name:
+        return datetime.now()
+    zone = tz.gettz(timezone_name)
+    if zone is None:
+        raise ValueError("Unknown time zone " + timezone_name)
+    return datetime.now(zone).replace(tzinfo=None)
+
+def show_clock():
+    # the current time to compare show times with
+    return now_in(current_app.config["SHOWS_TIMEZONE"])
+
+def upcoming_show_counts(objectIDs=None, object="venue"):
+    # count upcoming shows for many venues/artists with a single grouped query
+    if object == "venue":
+        key = Show.venue_id
+    elif object == "artist":
+        key = Show.artist_id
+    else:
+        raise ValueError("object must be venue or artist")
+    if objectIDs is not None and len(objectIDs) == 0:
+        return {}
+    query = db.session.query(key, db.func.count(Show.id)).filter(Show.time > show_clock())
+    if objectIDs is not None:
+        query = query.filter(key.in_(objectIDs))
+    return dict(query.group_by(key).all())
+
+#----------------------------------------------------------------------------#
+# Venues by area.
+#----------------------------------------------------------------------------#
+
+# VenueAreaSummary holds one row per venue with its area and upcoming show
+# count. Venue and show writes refresh the affected rows; upcoming counts also
+# drift as shows move into the past, so init_area_summary starts a thread in
+# each worker process that rebuilds the whole table once its oldest row is
+# older than AREA_SUMMARY_MAX_AGE. "flask refresh-area-summary" rebuilds it on
+# demand. Page views only ever read the table.
+#
+# A refresh deletes and re-inserts its rows, so two refreshes of the same
+# venue running at once would both insert it; on Postgres they are run one at
+# a time with a transaction-scoped advisory lock taken before anything is
+# read. The staleness check is made under the same lock, so workers noticing
+# a stale table at the same moment rebuild it once.
+
+AREA_SUMMARY_LOCK = 0x56454e55  # pg_advisory_xact_lock key
+
+def lock_area_summary():
+    # held until the transaction ends
+    if db.session.get_bind().dialect.name == "postgresql":
+        db.session.execute(db.select([db.func.pg_advisory_xact_lock(AREA_SUMMARY_LOCK)]))
+
+def refresh_area_summary(venue_ids=None):
+    # rebuild summary rows for the given venues, or for all venues when None
+    lock_area_summary()
+    now = datetime.now()
+    venues = db.session.query(Venue.id, Venue.name, Venue.city, Venue.state)
+    stale_rows = VenueAreaSummary.query
+    if venue_ids is not None:
+        venues = venues.filter(Venue.id.in_(venue_ids))
+        stale_rows = stale_rows.filter(VenueAreaSummary.venue_id.in_(venue_ids))
+    show_counts = upcoming_show_counts(venue_ids)
+    rows = [{
+        "venue_id": venue.id,
+        "name": venue.name,
+        "city": venue.city,
+        "state": venue.state,
+        "num_upcoming_shows": show_counts.get(venue.id, 0),
+        "refreshed_at": now
+    } for venue in venues]
+    stale_rows.delete(synchronize_session=False)
+    if rows:
+        db.session.execute(VenueAreaSummary.__table__.insert(), rows)
+    db.session.commit()
+
+def refresh_stale_area_summary(max_age):
+    # rebuild the whole summary if its oldest row is older than max_age
+    # seconds, or it is empty; returns whether it did
+    lock_area_summary()
+    oldest = db.session.query(db.func.min(VenueAreaSummary.refreshed_at)).scalar()
+    if oldest is not None and oldest > datetime.now() - timedelta(seconds=max_age):
+        db.session.commit()
+        return False
+    refresh_area_summary()
+    return True
+
+def refresh_area_summary_periodically(app, max_age):
+    # check a few times per max_age, so no row gets much older than it
+    while True:
+        time.sleep(max(1, max_age / 4))
+        with app.app_context():
+            try:
+                refresh_stale_area_summary(max_age)
+            except SQLAlchemyError:
+                app.logger.exception("Refreshing the venue area summary failed")
+                db.session.rollback()
+            db.session.remove()
+
+def init_area_summary(app):
+    max_age = app.config.get("AREA_SUMMARY_MAX_AGE")
+    if not max_age:
+        return
+    thread = threading.Thread(target=refresh_area_summary_periodically, args=(app, max_age),
+                              name="area-summary", daemon=True)
+    thread.start()
+
+def venue_areas():
+    # summary rows ordered by area
+    return VenueAreaSummary.query.order_by(
+        VenueAreaSummary.state,
+        VenueAreaSummary.city,
+        VenueAreaSummary.name
+    ).all()
+
+#----------------------------------------------------------------------------#
+# Show feed.
+#----------------------------------------------------------------------------#
+
+# ShowFeed copies every show's venue and artist display fields so the show
+# listings read a single table. The write handlers and the importer add and
+# remove rows in the same transaction as the shows themselves; the hooks
+# below update them in the same flush when a venue or artist changes its name
+# or image. "flask rebuild-show-feed" recreates the whole table, along with
+# ShowCount.
+
+FEED_COLUMNS = ["show_id", "venue_id", "venue_name", "venue_image_link",
+                "artist_id", "artist_name", "artist_image_link", "start_time"]
+
+def add_to_feed(show_ids=None, venue_ids=None):
+    # copy shows missing from the feed into it: the given shows, the shows of
+    # the given venues, or all of them; does not commit
+    source = db.session.query(
+        Show.id, Show.venue_id, Venue.name, Venue.image_link,
+        Show.artist_id, Artist.name, Artist.image_link, Show.time
+    ).join(Venue, Show.venue_id == Venue.id).join(Artist, Show.artist_id == Artist.id).outerjoin(
+        ShowFeed, ShowFeed.show_id == Show.id
+    ).filter(ShowFeed.show_id == None)
+    if show_ids is not None:
+        source = source.filter(Show.id.in_(show_ids))
+    if venue_ids is not None:
+        source = source.filter(Show.venue_id.in_(venue_ids))
+    db.session.execute(ShowFeed.__table__.insert().from_select(FEED_COLUMNS, source.statement))
+
+def remove_from_feed(venue_ids):
+    # drop the feed rows of the given venues' shows; does not commit
+    ShowFeed.query.filter(ShowFeed.venue_id.in_(venue_ids)).delete(synchronize_session=False)
+
+def rebuild_show_feed():
+    ShowFeed.query.delete(synchronize_session=False)
+    add_to_feed()
+    refresh_show_totals("venue")
+    refresh_show_totals("artist")
+    db.session.commit()
+
+def refresh_show_totals(kind, object_ids=None):
+    # recount the total shows of the given venues or artists (kind "venue" or
+    # "artist"), or of all of them, from the feed; does not commit. Only
+    # totals are kept: upcoming shows are few and counted on the fly, and the
+    # past ones are the difference, so the counts never go stale.
+    key = ShowFeed.venue_id if kind == "venue" else ShowFeed.artist_id
+    stale_rows = ShowCount.query.filter(ShowCount.kind == kind)
+    totals = db.session.query(db.literal(kind), key, db.func.count(ShowFeed.show_id))
+    if object_ids is not None:
+        object_ids = list(object_ids)
+        if not object_ids:
+            return
+        stale_rows = stale_rows.filter(ShowCount.object_id.in_(object_ids))
+        totals = totals.filter(key.in_(object_ids))
+    stale_rows.delete(synchronize_session=False)
+    db.session.execute(ShowCount.__table__.insert().from_select(
+        ["kind", "object_id", "total"], totals.group_by(key).statement))
+
+def add_show_totals(kind, object_ids):
+    # add one show to the totals of the given venues or artists, for a single
+    # new show; each total changes in one statement, so concurrent bookings
+    # neither lose an update nor both insert a first row, as recounting would.
+    # Bulk changes use refresh_show_totals. Does not commit.
+    table = ShowCount.__table__
+    for object_id in set(object_ids):
+        if db.session.get_bind().dialect.name == "postgresql":
+            insert = postgresql.insert(table).values(kind=kind, object_id=object_id, total=1)
+            db.session.execute(insert.on_conflict_do_update(
+                index_elements=[table.c.kind, table.c.object_id], set_={"total": table.c.total + 1}))
+            continue
+        matching = db.and_(table.c.kind == kind, table.c.object_id == object_id)
+        if not db.session.execute(table.update().where(matching).values(total=table.c.total + 1)).rowcount:
+            db.session.execute(table.insert().values(kind=kind, object_id=object_id, total=1))
+
+def display_fields_changed(target):
+    attrs = db.inspect(target).attrs
+    return attrs.name.history.has_changes() or attrs.image_link.history.has_changes()
+
+def update_feed_fields(connection, kind, object_id, name, image_link):
+    # copy a venue's or artist's new name and image into its feed rows
+    if kind == "venue":
+        connection.execute(ShowFeed.__table__.update().where(ShowFeed.venue_id == object_id).values(
+            venue_name=name, venue_image_link=image_link))
+    else:
+        connection.execute(ShowFeed.__table__.update().where(ShowFeed.artist_id == object_id).values(
+            artist_name=name, artist_image_link=image_link))
+
+@db.event.listens_for(Venue, 'after_update')
+def update_feed_venue(mapper, connection, target):
+    if display_fields_changed(target):
+        update_feed_fields(connection, "venue", target.id, target.name, target.image_link)
+
+@db.event.listens_for(Artist, 'after_update')
+def update_feed_artist(mapper, connection, target):
+    if display_fields_changed(target):
+        update_feed_fields(connection, "artist", target.id, target.name, target.image_link)
+
+#----------------------------------------------------------------------------#
+# Genre facets.
+#----------------------------------------------------------------------------#
+
+# GenreCount holds how many venues and artists list each genre, so the facet
+# counts are read from a table of a few dozen rows rather than by scanning
+# every listing. The hooks below apply the difference in the same flush as
+# any ORM insert or edit; bulk writes (delete_venues, the importer) call
+# adjust_genre_counts themselves. "flask rebuild-genre-counts" recounts it all.
+
+def genre_changes(old_genres, new_genres):
+    # {genre: +1 or -1} between two genre lists of one listing
+    old_genres, new_genres = set(old_genres or []), set(new_genres or [])
+    changes = dict.fromkeys(new_genres - old_genres, 1)
+    changes.update(dict.fromkeys(old_genres - new_genres, -1))
+    return changes
+
+def adjust_genre_counts(connection, kind, changes):
+    # add changes ({genre: difference}) to the counts of kind "venue" or
+    # "artist", one UPDATE per distinct difference; does not commit
+    table = GenreCount.__table__
+    genres_by_change = {}
+    for genre, change in changes.items():
+        if change:
+            genres_by_change.setdefault(change, []).append(genre)
+    for change, genres in genres_by_change.items():
+        matching = db.and_(table.c.kind == kind, table.c.genre.in_(genres))
+        updated = connection.execute(table.update().where(matching).values(total=table.c.total + change)).rowcount
+        if updated < len(genres):
+            # first listing of a genre
+            existing = {row.genre for row in connection.execute(db.select([table.c.genre]).where(matching))}
+            connection.execute(table.insert(), [{"kind": kind, "genre": genre, "total": max(change, 0)}
+                                                for genre in genres if genre not in existing])
+
+def rebuild_genre_counts():
+    counts = {}
+    for kind, model in (("venue", Venue), ("artist", Artist)):
+        for (genres,) in db.session.query(model.genres).yield_per(1000):
+            for genre in set(genres or []):
+                counts[kind, genre] = counts.get((kind, genre), 0) + 1
+    GenreCount.query.delete(synchronize_session=False)
+    if counts:
+        db.session.execute(GenreCount.__table__.insert(), [
+            {"kind": kind, "genre": genre, "total": total} for (kind, genre), total in counts.items()])
+    db.session.commit()
+
+def genre_facets():
+    # {"venue": [(genre, count), ...], "artist": [...]}, most listed first
+    facets = {"venue": [], "artist": []}
+    rows = GenreCount.query.filter(GenreCount.total > 0).order_by(GenreCount.total.desc(), GenreCount.genre)
+    for row in rows:
+        facets[row.kind].append((row.genre, row.total))
+    return facets
+
+@db.event.listens_for(Venue, 'after_insert')
+def count_new_venue_genres(mapper, connection, target):
+    adjust_genre_counts(connection, "venue", genre_changes([], target.genres))
+
+@db.event.listens_for(Artist, 'after_insert')
+def count_new_artist_genres(mapper, connection, target):
+    adjust_genre_counts(connection, "artist", genre_changes([], target.genres))
+
+def changed_genres(target):
+    history = db.inspect(target).attrs.genres.history
+    if not history.has_changes():
+        return {}
+    return genre_changes(history.deleted[0] if history.deleted else [],
+                         history.added[0] if history.added else [])
+
+@db.event.listens_for(Venue, 'after_update')
+def count_venue_genres(mapper, connection, target):
+    adjust_genre_counts(connection, "venue", changed_genres(target))
+
+@db.event.listens_for(Artist, 'after_update')
+def count_artist_genres(mapper, connection, target):
+    adjust_genre_counts(connection, "artist", changed_genres(target))
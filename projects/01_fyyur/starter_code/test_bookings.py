@@ -0,0 +1,141 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+
+# run against a throwaway SQLite database; config.py reads DATABASE_URL on import
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "fyyur_test.db")
+
+from app import app
+from models import db, Venue, Artist, Show
+from bookings import SHOW_LENGTH, BookingIndex, booking_conflicts, free_slots
+
+MINUTE = timedelta(minutes=1)
+BOOKED = datetime(2030, 6, 1, 20, 0)
+
+# start times of a new show, and whether it overlaps a show starting at BOOKED
+CONFLICT_CASES = [
+    (BOOKED, True),
+    (BOOKED - SHOW_LENGTH, False),
+    (BOOKED + SHOW_LENGTH, False),
+    (BOOKED - SHOW_LENGTH + MINUTE, True),
+    (BOOKED + SHOW_LENGTH - MINUTE, True),
+]
+
+
+class BookingTestCase(unittest.TestCase):
+    """Overlap checks at the boundaries of SHOW_LENGTH"""
+
+    def setUp(self):
+        """Create two venues and two artists with no shows."""
+        self.context = app.app_context()
+        self.context.push()
+        db.create_all()
+        self.venues = [Venue(name="Venue %d" % i, city="San Francisco", state="CA", address="1 Main St",
+                             genres=["Jazz"]) for i in range(2)]
+        self.artists = [Artist(name="Artist %d" % i, city="San Francisco", state="CA", genres=["Jazz"])
+                        for i in range(2)]
+        db.session.add_all(self.venues + self.artists)
+        db.session.commit()
+        self.venue_ids = [venue.id for venue in self.venues]
+        self.artist_ids = [artist.id for artist in self.artists]
+
+    def tearDown(self):
+        """Drop every table."""
+        db.session.remove()
+        db.drop_all()
+        self.context.pop()
+
+    def book(self, venue, artist, start_time):
+        show = Show(venue_id=self.venue_ids[venue], artist_id=self.artist_ids[artist], time=start_time)
+        db.session.add(show)
+        db.session.commit()
+        return show.id
+
+    #----------------------------------------------------------------------------#
+    # booking_conflicts and BookingIndex.
+    #----------------------------------------------------------------------------#
+
+    def test_conflicts_at_the_venue(self):
+        show_id = self.book(0, 0, BOOKED)
+        for start_time, overlaps in CONFLICT_CASES:
+            with self.subTest(start_time=start_time):
+                conflicts = booking_conflicts(self.venue_ids[0], self.artist_ids[1], start_time, SHOW_LENGTH)
+                self.assertEqual([show.id for show in conflicts], [show_id] if overlaps else [])
+
+    def test_conflicts_with_the_artist(self):
+        show_id = self.book(0, 0, BOOKED)
+        for start_time, overlaps in CONFLICT_CASES:
+            with self.subTest(start_time=start_time):
+                conflicts = booking_conflicts(self.venue_ids[1], self.artist_ids[0], start_time, SHOW_LENGTH)
+                self.assertEqual([show.id for show in conflicts], [show_id] if overlaps else [])
+
+    def test_no_conflicts_with_other_venues_and_artists(self):
+        self.book(0, 0, BOOKED)
+        self.assertEqual(booking_conflicts(self.venue_ids[1], self.artist_ids[1], BOOKED, SHOW_LENGTH), [])
+
+    def test_booking_index_conflicts(self):
+        index = BookingIndex(SHOW_LENGTH)
+        index.add(self.venue_ids[0], self.artist_ids[0], BOOKED)
+        for start_time, overlaps in CONFLICT_CASES:
+            with self.subTest(start_time=start_time):
+                self.assertEqual(index.conflicts(self.venue_ids[0], self.artist_ids[1], start_time), overlaps)
+                self.assertEqual(index.conflicts(self.venue_ids[1], self.artist_ids[0], start_time), overlaps)
+                self.assertFalse(index.conflicts(self.venue_ids[1], self.artist_ids[1], start_time))
+
+    def test_loaded_booking_index_agrees_with_the_database(self):
+        self.book(0, 0, BOOKED)
+        for start_time, overlaps in CONFLICT_CASES:
+            with self.subTest(start_time=start_time):
+                index = BookingIndex.load([self.venue_ids[0]], [self.artist_ids[1]], start_time, start_time,
+                                          SHOW_LENGTH)
+                self.assertEqual(index.conflicts(self.venue_ids[0], self.artist_ids[1], start_time), overlaps)
+
+    def test_back_to_back_shows_can_all_be_booked(self):
+        index = BookingIndex(SHOW_LENGTH)
+        for number in range(4):
+            start_time = BOOKED + number * SHOW_LENGTH
+            self.assertFalse(index.conflicts(self.venue_ids[0], self.artist_ids[0], start_time))
+            self.assertEqual(booking_conflicts(self.venue_ids[0], self.artist_ids[0], start_time, SHOW_LENGTH), [])
+            index.add(self.venue_ids[0], self.artist_ids[0], start_time)
+            self.book(0, 0, start_time)
+
+    #----------------------------------------------------------------------------#
+    # free_slots.
+    #----------------------------------------------------------------------------#
+
+    def test_free_slots_around_a_show(self):
+        self.book(0, 0, BOOKED)
+        start, end = BOOKED - 2 * SHOW_LENGTH, BOOKED + 2 * SHOW_LENGTH
+        self.assertEqual(free_slots(self.venue_ids[0], start, end, SHOW_LENGTH),
+                         [(start, BOOKED), (BOOKED + SHOW_LENGTH, end)])
+
+    def test_free_slots_keep_a_gap_of_exactly_one_show(self):
+        self.book(0, 0, BOOKED)
+        self.book(0, 0, BOOKED + 2 * SHOW_LENGTH)
+        slots = free_slots(self.venue_ids[0], BOOKED, BOOKED + 3 * SHOW_LENGTH, SHOW_LENGTH)
+        self.assertEqual(slots, [(BOOKED + SHOW_LENGTH, BOOKED + 2 * SHOW_LENGTH)])
+
+    def test_free_slots_drop_a_gap_one_minute_short(self):
+        self.book(0, 0, BOOKED)
+        self.book(0, 0, BOOKED + 2 * SHOW_LENGTH - MINUTE)
+        slots = free_slots(self.venue_ids[0], BOOKED, BOOKED + 3 * SHOW_LENGTH - MINUTE, SHOW_LENGTH)
+        self.assertEqual(slots, [])
+
+    def test_free_slots_after_a_show_started_before_the_range(self):
+        self.book(0, 0, BOOKED)
+        start = BOOKED + SHOW_LENGTH - MINUTE
+        end = start + 2 * SHOW_LENGTH
+        self.assertEqual(free_slots(self.venue_ids[0], start, end, SHOW_LENGTH), [(BOOKED + SHOW_LENGTH, end)])
+
+    def test_free_slots_include_the_artists_shows(self):
+        self.book(1, 0, BOOKED)
+        start, end = BOOKED - SHOW_LENGTH, BOOKED + 2 * SHOW_LENGTH
+        self.assertEqual(free_slots(self.venue_ids[0], start, end, SHOW_LENGTH), [(start, end)])
+        self.assertEqual(free_slots(self.venue_ids[0], start, end, SHOW_LENGTH, self.artist_ids[0]),
+                         [(start, BOOKED), (BOOKED + SHOW_LENGTH, end)])
+
+
+# Make the tests conveniently executable
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,189 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from datetime import timedelta
+from unittest import mock
+
+# run against a throwaway SQLite database; config.py reads DATABASE_URL on import
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "fyyur_test.db")
+
+from flask import flash, g
+from app import app
+from models import db, Venue, Artist, Show
+from cache import page_cache, FileSystemBackend, invalidate_venue, invalidate_show
+from summaries import show_clock
+
+
+class PageCacheTestCase(unittest.TestCase):
+    """Storing, expiring and invalidating cached pages"""
+
+    def setUp(self):
+        """Create a venue and an artist with one upcoming show, and empty the cache."""
+        self.context = app.app_context()
+        self.context.push()
+        db.create_all()
+        venue = Venue(name="The Fillmore", city="San Francisco", state="CA", address="1805 Geary Blvd",
+                      genres=["Jazz"])
+        artist = Artist(name="Guns N Petals", city="San Francisco", state="CA", genres=["Jazz"])
+        db.session.add_all([venue, artist])
+        db.session.commit()
+        self.venue_id = venue.id
+        self.artist_id = artist.id
+        db.session.add(Show(venue_id=venue.id, artist_id=artist.id, time=show_clock() + timedelta(days=1)))
+        db.session.commit()
+        page_cache.invalidate("")
+
+    def tearDown(self):
+        """Drop every table and empty the cache."""
+        page_cache.invalidate("")
+        db.session.remove()
+        db.drop_all()
+        self.context.pop()
+
+    #----------------------------------------------------------------------------#
+    # Invalidation on write.
+    #----------------------------------------------------------------------------#
+
+    def test_new_venue_invalidates_the_listing(self):
+        reader = app.test_client()
+        self.assertNotIn(b"Cafe Du Nord", reader.get("/venues").data)
+        self.assertIsNotNone(page_cache.backend.get("venues;"))
+
+        writer = app.test_client()
+        # keep the csrf_token field the view expects, without checking it
+        skip_csrf = mock.patch("flask_wtf.csrf._FlaskFormCSRF.validate_csrf_token", return_value=None)
+        with skip_csrf:
+            response = writer.post("/venues/create", data=dict(name="Cafe Du Nord", city="San Francisco",
+                                                              state="CA", address="2170 Market St",
+                                                              genres=["Jazz"], seeking_talent_message=""))
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(page_cache.backend.get("venues;"))
+        self.assertIn(b"Cafe Du Nord", reader.get("/venues").data)
+
+    def test_invalidate_venue_drops_the_pages_showing_it(self):
+        keys = ["venue:%d;" % self.venue_id, "venue:%d0;" % self.venue_id, "artist:%d;" % self.artist_id,
+                "artists;", "venues;", "shows:,;"]
+        with app.test_request_context("/"):
+            for key in keys:
+                page_cache.set(key, "page")
+            invalidate_venue(self.venue_id)
+            self.assertEqual([key for key in keys if page_cache.get(key) is not None],
+                             ["venue:%d0;" % self.venue_id, "artists;"])
+
+    def test_invalidate_show(self):
+        keys = ["venue:%d;" % self.venue_id, "artist:%d;" % self.artist_id, "artists;", "venues;", "shows:,;"]
+        with app.test_request_context("/"):
+            for key in keys:
+                page_cache.set(key, "page")
+            invalidate_show(self.venue_id, self.artist_id)
+            self.assertEqual([key for key in keys if page_cache.get(key) is not None], ["artists;"])
+
+    #----------------------------------------------------------------------------#
+    # Expiry at the next show boundary.
+    #----------------------------------------------------------------------------#
+
+    def test_page_expires_when_the_next_show_starts(self):
+        with app.test_request_context("/"):
+            page_cache.set("venue:1;", "page", expires_at=show_clock() + timedelta(seconds=30))
+            self.assertEqual(page_cache.get("venue:1;"), "page")
+            now = time.time()
+            with mock.patch("cache.time.time", return_value=now + 29):
+                self.assertEqual(page_cache.get("venue:1;"), "page")
+            with mock.patch("cache.time.time", return_value=now + 31):
+                self.assertIsNone(page_cache.get("venue:1;"))
+
+    def test_page_is_not_stored_after_a_show_started(self):
+        with app.test_request_context("/"):
+            page_cache.set("venue:1;", "page", expires_at=show_clock() - timedelta(seconds=1))
+            self.assertIsNone(page_cache.get("venue:1;"))
+
+    def test_venue_page_expires_at_its_upcoming_show(self):
+        client = app.test_client()
+        now = time.time()
+        client.get("/venues/%d" % self.venue_id)
+        # cached until the show a day ahead starts, well before PAGE_CACHE_TTL if that is longer
+        with mock.patch("cache.time.time", return_value=now + min(page_cache.ttl, 86400) - 60):
+            self.assertIsNotNone(page_cache.backend.get("venue:%d;" % self.venue_id))
+        with mock.patch("cache.time.time", return_value=now + 86400 + 60):
+            self.assertIsNone(page_cache.backend.get("venue:%d;" % self.venue_id))
+
+    #----------------------------------------------------------------------------#
+    # Pages that are not cached.
+    #----------------------------------------------------------------------------#
+
+    def test_pages_with_flash_messages_are_skipped(self):
+        with app.test_request_context("/"):
+            flash("Venue The Fillmore was successfully listed!")
+            page_cache.set("venues;", "page with a message")
+            self.assertIsNone(page_cache.get("venues;"))
+        self.assertIsNone(page_cache.backend.get("venues;"))
+
+    def test_pages_read_from_a_replica_are_skipped(self):
+        with app.test_request_context("/"):
+            g.read_replica = "replica_0"
+            page_cache.set("venues;", "page")
+        self.assertIsNone(page_cache.backend.get("venues;"))
+
+    def test_only_get_requests_are_cached(self):
+        with app.test_request_context("/venues/search", method="POST"):
+            page_cache.set("venues;", "page")
+        self.assertIsNone(page_cache.backend.get("venues;"))
+
+
+class FileSystemBackendTestCase(unittest.TestCase):
+    """The file backend shared by all workers on a host"""
+
+    def setUp(self):
+        """Create an empty cache directory."""
+        self.directory = tempfile.mkdtemp()
+        self.backend = FileSystemBackend(self.directory, maxsize=2)
+
+    def tearDown(self):
+        """Remove the cache directory."""
+        shutil.rmtree(self.directory)
+
+    def age(self, key, seconds):
+        path = self.backend.path(key)
+        mtime = os.stat(path).st_mtime - seconds
+        os.utime(path, (mtime, mtime))
+
+    def test_oldest_entries_are_evicted(self):
+        self.backend.set("venue:1;", "one", 60)
+        self.backend.set("venue:2;", "two", 60)
+        self.age("venue:1;", 20)
+        self.age("venue:2;", 10)
+        self.backend.set("venue:3;", "three", 60)
+        self.assertEqual(len(self.backend.entries()), 2)
+        self.assertIsNone(self.backend.get("venue:1;"))
+        self.assertEqual(self.backend.get("venue:2;"), "two")
+        self.assertEqual(self.backend.get("venue:3;"), "three")
+
+    def test_expired_entries_are_removed(self):
+        self.backend.set("venue:1;", "one", 60)
+        with mock.patch("cache.time.time", return_value=time.time() + 61):
+            self.assertIsNone(self.backend.get("venue:1;"))
+        self.assertEqual(self.backend.entries(), [])
+
+    def test_delete_prefix(self):
+        self.backend.set("venue:1;", "one", 60)
+        self.backend.set("venue:12;", "twelve", 60)
+        self.backend.delete_prefix("venue:1;")
+        self.assertIsNone(self.backend.get("venue:1;"))
+        self.assertEqual(self.backend.get("venue:12;"), "twelve")
+
+    def test_long_keys(self):
+        first = "shows:" + "1" * 300 + ";"
+        second = "shows:" + "1" * 299 + "2;"
+        self.backend.set(first, "first", 60)
+        self.backend.set(second, "second", 60)
+        self.assertEqual(self.backend.get(first), "first")
+        self.assertEqual(self.backend.get(second), "second")
+        self.backend.delete_prefix("shows:")
+        self.assertEqual(self.backend.entries(), [])
+
+
+# Make the tests conveniently executable
+if __name__ == "__main__":
+    unittest.main()
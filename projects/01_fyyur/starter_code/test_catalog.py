@@ -0,0 +1,118 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime
+
+# run against a throwaway SQLite database; config.py reads DATABASE_URL on import
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "fyyur_test.db")
+
+from app import app
+from models import db, Venue, Artist, Show, ShowFeed
+from catalog import update_listing
+from summaries import add_to_feed
+
+
+class ListingEditTestCase(unittest.TestCase):
+    """Saving edited venues and artists with update_listing"""
+
+    def setUp(self):
+        """Create a venue and an artist with one show in the feed."""
+        self.context = app.app_context()
+        self.context.push()
+        db.create_all()
+        venue = Venue(name="The Fillmore", city="San Francisco", state="CA", address="1805 Geary Blvd",
+                      genres=["Jazz"], phone=None, seeking_talent_message="")
+        artist = Artist(name="Guns N Petals", city="San Francisco", state="CA", genres=["Jazz"])
+        db.session.add_all([venue, artist])
+        db.session.commit()
+        db.session.add(Show(venue_id=venue.id, artist_id=artist.id, time=datetime(2030, 6, 1, 20, 0)))
+        db.session.flush()
+        add_to_feed()
+        db.session.commit()
+        self.venue_id = venue.id
+        self.artist_id = artist.id
+        db.session.remove()
+
+    def tearDown(self):
+        """Drop every table."""
+        db.session.remove()
+        db.drop_all()
+        self.context.pop()
+
+    def stamps(self, model, object_id):
+        row = db.session.query(model.version, model.edit_version).filter(model.id == object_id).one()
+        db.session.remove()
+        return tuple(row)
+
+    def save(self, model, object_id, values, edit_version=None):
+        changes = update_listing(model, object_id, values, edit_version)
+        db.session.commit()
+        db.session.remove()
+        return changes
+
+    #----------------------------------------------------------------------------#
+    # Conflicting and unchanged saves.
+    #----------------------------------------------------------------------------#
+
+    def test_conflicting_save(self):
+        version, edit_version = self.stamps(Venue, self.venue_id)
+        self.assertEqual(self.save(Venue, self.venue_id, {"city": "Oakland"}, edit_version), {"city": "Oakland"})
+        # a form rendered before that edit
+        self.assertIsNone(self.save(Venue, self.venue_id, {"city": "Berkeley"}, edit_version))
+        self.assertEqual(Venue.query.get(self.venue_id).city, "Oakland")
+        self.assertEqual(self.stamps(Venue, self.venue_id), (version + 1, edit_version + 1))
+
+    def test_shows_booked_meanwhile_do_not_conflict(self):
+        _, edit_version = self.stamps(Venue, self.venue_id)
+        db.session.query(Venue).filter(Venue.id == self.venue_id).update({Venue.version: Venue.version + 1})
+        db.session.commit()
+        self.assertEqual(self.save(Venue, self.venue_id, {"city": "Oakland"}, edit_version), {"city": "Oakland"})
+
+    def test_unchanged_save(self):
+        stamps = self.stamps(Venue, self.venue_id)
+        # the form posts "" for the empty phone stored as None, and the reverse
+        values = {"name": "The Fillmore", "phone": "", "seeking_talent_message": None, "genres": ["Jazz"]}
+        self.assertEqual(self.save(Venue, self.venue_id, values, stamps[1]), {})
+        self.assertEqual(self.stamps(Venue, self.venue_id), stamps)
+
+    def test_missing_listing(self):
+        self.assertIsNone(self.save(Venue, self.venue_id + 100, {"city": "Oakland"}))
+
+    #----------------------------------------------------------------------------#
+    # Renames.
+    #----------------------------------------------------------------------------#
+
+    def test_venue_rename_updates_the_feed(self):
+        artist_version, artist_edit_version = self.stamps(Artist, self.artist_id)
+        self.save(Venue, self.venue_id, {"name": "The Warfield", "image_link": "https://example.com/w.jpg"})
+        row = ShowFeed.query.one()
+        self.assertEqual((row.venue_name, row.venue_image_link), ("The Warfield", "https://example.com/w.jpg"))
+        # the artist's page lists the venue, but its open edit forms stay valid
+        self.assertEqual(self.stamps(Artist, self.artist_id), (artist_version + 1, artist_edit_version))
+
+    def test_artist_rename_updates_the_feed(self):
+        venue_version, _ = self.stamps(Venue, self.venue_id)
+        self.save(Artist, self.artist_id, {"name": "Guns N Roses"})
+        self.assertEqual(ShowFeed.query.one().artist_name, "Guns N Roses")
+        self.assertEqual(self.stamps(Venue, self.venue_id)[0], venue_version + 1)
+
+    def test_other_edits_leave_counterparts_alone(self):
+        artist_stamps = self.stamps(Artist, self.artist_id)
+        self.save(Venue, self.venue_id, {"city": "Oakland"})
+        self.assertEqual(self.stamps(Artist, self.artist_id), artist_stamps)
+
+    def test_rename_changes_the_counterpart_etag(self):
+        client = app.test_client()
+        response = client.get("/api/v1/artists/%d" % self.artist_id)
+        etag = response.headers["ETag"]
+        self.assertEqual(client.get("/api/v1/artists/%d" % self.artist_id,
+                                    headers={"If-None-Match": etag}).status_code, 304)
+        self.save(Venue, self.venue_id, {"name": "The Warfield"})
+        response = client.get("/api/v1/artists/%d" % self.artist_id, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("The Warfield", response.get_data(as_text=True))
+
+
+# Make the tests conveniently executable
+if __name__ == "__main__":
+    unittest.main()
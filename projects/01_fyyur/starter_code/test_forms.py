@@ -0,0 +1,98 @@
+import os
+import tempfile
+import unittest
+from werkzeug.datastructures import MultiDict
+
+# run against a throwaway SQLite database; config.py reads DATABASE_URL on import
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "fyyur_test.db")
+
+from app import app
+from forms import (VenueForm, ArtistForm, ShowForm, validate_venue_data, validate_artist_data,
+                   validate_show_data)
+
+VENUE = dict(name="The Fillmore", city="San Francisco", state="CA", address="1805 Geary Blvd",
+             phone="415-346-6000", image_link="https://example.com/fillmore.jpg", genres=["Jazz", "Folk"],
+             facebook_link="https://www.facebook.com/fillmore", website_link="https://example.com",
+             seeking_talent_message="Looking for jazz bands")
+ARTIST = dict(name="Guns N Petals", city="San Francisco", state="CA", phone="326-123-5000",
+              image_link="https://example.com/gnp.jpg", genres=["Rock n Roll"],
+              facebook_link="https://www.facebook.com/GunsNPetals", website_link="https://example.com",
+              seeking_venue_message="")
+
+# changes to a valid payload; None removes the field
+LISTING_CHANGES = [
+    {},
+    {"phone": None, "image_link": None, "facebook_link": None, "website_link": None},
+    {"phone": "", "image_link": "", "website_link": "   "},
+    {"name": None},
+    {"name": "   "},
+    {"city": ""},
+    {"state": "XX"},
+    {"state": None},
+    {"genres": []},
+    {"genres": ["Jazz", "Polka"]},
+    {"phone": "4153466000"},
+    {"phone": "415-346-6000 ext. 2"},
+    {"image_link": "not a url"},
+    {"facebook_link": "http://localhost/"},
+    {"website_link": "ftp://"},
+    {"name": "", "state": "XX", "genres": ["Polka"], "phone": "12"},
+]
+SHOW = dict(artist_id="1", venue_id="2", start_time="2030-06-01 20:00")
+SHOW_CHANGES = [
+    {},
+    {"artist_id": None},
+    {"venue_id": " "},
+    {"start_time": None},
+    {"start_time": ""},
+    {"start_time": "2030-06-01T20:00"},
+    {"start_time": "next tuesday"},
+    {"artist_id": "", "venue_id": "", "start_time": "June"},
+]
+
+
+def changed(payload, changes):
+    payload = dict(payload, **changes)
+    return {name: value for name, value in payload.items() if value is not None}
+
+
+class FormRulesTestCase(unittest.TestCase):
+    """The dict validators used by imports agree with the forms"""
+
+    def assert_same_rules(self, form_class, validate_data, payload):
+        # the form reads the payload as posted by a browser, the validator as
+        # a dict of strings and lists
+        formdata = MultiDict()
+        for name, value in payload.items():
+            for item in (value if isinstance(value, list) else [value]):
+                formdata.add(name, item)
+        with app.test_request_context("/", method="POST"):
+            form = form_class(formdata=formdata, meta={"csrf": False})
+            form_valid = form.validate()
+            data, errors = validate_data(dict(payload))
+        if form_valid:
+            self.assertIsNone(errors)
+            self.assertEqual(data, form.data)
+        else:
+            self.assertIsNone(data)
+            self.assertEqual(errors, form.errors)
+
+    def test_venue_rules(self):
+        for changes in LISTING_CHANGES:
+            with self.subTest(changes=changes):
+                self.assert_same_rules(VenueForm, validate_venue_data, changed(VENUE, changes))
+
+    def test_artist_rules(self):
+        for changes in LISTING_CHANGES:
+            with self.subTest(changes=changes):
+                self.assert_same_rules(ArtistForm, validate_artist_data, changed(ARTIST, changes))
+
+    def test_show_rules(self):
+        for changes in SHOW_CHANGES:
+            with self.subTest(changes=changes):
+                self.assert_same_rules(ShowForm, validate_show_data, changed(SHOW, changes))
+
+
+# Make the tests conveniently executable
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,147 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+# run against a throwaway SQLite database; config.py reads DATABASE_URL on import
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "fyyur_test.db")
+
+from app import app
+from models import db, Venue, Artist
+from cache import page_cache
+from summaries import refresh_area_summary
+
+VENUE = dict(city="San Francisco", state="CA", address="1 Main St", seeking_talent_message="")
+ARTIST = dict(city="San Francisco", state="CA", seeking_venue_message="")
+
+
+class GenreCountTestCase(unittest.TestCase):
+    """Genre facets kept up to date by listing writes"""
+
+    def setUp(self):
+        """Create two venues and two artists, and a client that skips CSRF checks."""
+        self.context = app.app_context()
+        self.context.push()
+        db.create_all()
+        venues = [Venue(name="Jazz Club", genres=["Jazz"], **VENUE),
+                  Venue(name="Folk Hall", genres=["Folk", "Jazz"], **VENUE)]
+        artists = [Artist(name="Trio", genres=["Jazz"], **ARTIST),
+                   Artist(name="Duo", genres=["Blues", "Folk"], **ARTIST)]
+        db.session.add_all(venues + artists)
+        db.session.commit()
+        refresh_area_summary()
+        self.venue_ids = [venue.id for venue in venues]
+        self.artist_ids = [artist.id for artist in artists]
+        db.session.remove()
+        page_cache.invalidate("")
+        self.client = app.test_client()
+        # keep the csrf_token field the views expect, without checking it
+        self.skip_csrf = mock.patch("flask_wtf.csrf._FlaskFormCSRF.validate_csrf_token", return_value=None)
+        self.skip_csrf.start()
+
+    def tearDown(self):
+        """Drop every table."""
+        self.skip_csrf.stop()
+        page_cache.invalidate("")
+        db.session.remove()
+        db.drop_all()
+        self.context.pop()
+
+    def facets(self):
+        response = self.client.get("/api/v1/genres")
+        self.assertEqual(response.status_code, 200)
+        data = response.get_json()
+        return ({row["genre"]: row["count"] for row in data["venues"]},
+                {row["genre"]: row["count"] for row in data["artists"]})
+
+    def recount(self, model):
+        # the counts straight from the listings
+        counts = {}
+        for (genres,) in db.session.query(model.genres):
+            for genre in set(genres):
+                counts[genre] = counts.get(genre, 0) + 1
+        db.session.remove()
+        return counts
+
+    def assert_facets_match_listings(self):
+        self.assertEqual(self.facets(), (self.recount(Venue), self.recount(Artist)))
+
+    def edit_version(self, model, object_id):
+        version = db.session.query(model.edit_version).filter(model.id == object_id).scalar()
+        db.session.remove()
+        return version
+
+    #----------------------------------------------------------------------------#
+    # Counts after create, edit and delete.
+    #----------------------------------------------------------------------------#
+
+    def test_initial_counts(self):
+        self.assertEqual(self.facets(), ({"Jazz": 2, "Folk": 1}, {"Jazz": 1, "Blues": 1, "Folk": 1}))
+
+    def test_create(self):
+        self.client.post("/venues/create", data=dict(VENUE, name="Blues Bar", genres=["Blues", "Jazz"]))
+        self.client.post("/artists/create", data=dict(ARTIST, name="Quartet", genres=["Jazz", "Soul"]))
+        self.assertEqual(self.facets(), ({"Jazz": 3, "Folk": 1, "Blues": 1},
+                                         {"Jazz": 2, "Blues": 1, "Folk": 1, "Soul": 1}))
+        self.assert_facets_match_listings()
+
+    def test_edit(self):
+        venue_id, artist_id = self.venue_ids[1], self.artist_ids[1]
+        self.client.post("/venues/%d/edit" % venue_id,
+                         data=dict(VENUE, name="Folk Hall", genres=["Folk", "Rock n Roll"],
+                                   edit_version=self.edit_version(Venue, venue_id)))
+        self.client.post("/artists/%d/edit" % artist_id,
+                         data=dict(ARTIST, name="Duo", genres=["Jazz"],
+                                   edit_version=self.edit_version(Artist, artist_id)))
+        self.assertEqual(self.facets(), ({"Jazz": 1, "Folk": 1, "Rock n Roll": 1}, {"Jazz": 2}))
+        self.assert_facets_match_listings()
+
+    def test_edit_without_genre_changes(self):
+        venue_id = self.venue_ids[1]
+        self.client.post("/venues/%d/edit" % venue_id,
+                         data=dict(VENUE, name="Folk Hall Renamed", genres=["Jazz", "Folk"],
+                                   edit_version=self.edit_version(Venue, venue_id)))
+        self.assertEqual(self.facets()[0], {"Jazz": 2, "Folk": 1})
+
+    def test_delete(self):
+        response = self.client.delete("/venues/%d" % self.venue_ids[1])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.facets()[0], {"Jazz": 1})
+        self.assert_facets_match_listings()
+
+    #----------------------------------------------------------------------------#
+    # Genre filters.
+    #----------------------------------------------------------------------------#
+
+    def venue_names(self, query):
+        data = self.client.get("/api/v1/venues" + query).get_json()
+        return sorted(venue["name"] for area in data["areas"] for venue in area["venues"])
+
+    def artist_names(self, query):
+        data = self.client.get("/api/v1/artists" + query).get_json()
+        return sorted(artist["name"] for artist in data["artists"])
+
+    def test_venue_filters(self):
+        self.assertEqual(self.venue_names(""), ["Folk Hall", "Jazz Club"])
+        self.assertEqual(self.venue_names("?genre=Folk"), ["Folk Hall"])
+        self.assertEqual(self.venue_names("?genre=Folk&genre=Jazz"), ["Folk Hall", "Jazz Club"])
+        self.assertEqual(self.venue_names("?genre=Folk&genre=Jazz&match=all"), ["Folk Hall"])
+        self.assertEqual(self.venue_names("?genre=Blues&genre=Jazz&match=all"), [])
+
+    def test_artist_filters(self):
+        self.assertEqual(self.artist_names("?genre=Blues"), ["Duo"])
+        self.assertEqual(self.artist_names("?genre=Blues&genre=Jazz"), ["Duo", "Trio"])
+        self.assertEqual(self.artist_names("?genre=Blues&genre=Folk&match=all"), ["Duo"])
+        self.assertEqual(self.artist_names("?genre=Blues&genre=Jazz&match=all"), [])
+
+    def test_filters_follow_edits(self):
+        venue_id = self.venue_ids[0]
+        self.client.post("/venues/%d/edit" % venue_id,
+                         data=dict(VENUE, name="Jazz Club", genres=["Jazz", "Folk"],
+                                   edit_version=self.edit_version(Venue, venue_id)))
+        self.assertEqual(self.venue_names("?genre=Folk&genre=Jazz&match=all"), ["Folk Hall", "Jazz Club"])
+
+
+# Make the tests conveniently executable
+if __name__ == "__main__":
+    unittest.main()
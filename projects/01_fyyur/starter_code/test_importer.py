@@ -0,0 +1,149 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime
+
+# run against a throwaway SQLite database; config.py reads DATABASE_URL on import
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "fyyur_test.db")
+
+from app import app
+from models import db, Venue, Artist, Show, ShowFeed, ShowCount, GenreCount
+from importer import import_file
+from summaries import rebuild_genre_counts
+
+VENUE_ROWS = [
+    {"name": "Cafe Du Nord", "city": "San Francisco", "state": "CA", "address": "2170 Market St",
+     "genres": ["Jazz", "Folk"]},
+    "not json",
+    ["not", "an", "object"],
+    {"name": "No City", "state": "CA", "address": "1 Main St", "genres": ["Jazz"]},
+    {"name": "Bad Genre", "city": "Oakland", "state": "CA", "address": "1 Main St", "genres": ["Polka"]},
+    {"name": "The Fillmore", "city": "San Francisco", "state": "CA", "address": "1805 Geary Blvd",
+     "genres": ["Jazz"]},
+    {"name": "The Independent", "city": "San Francisco", "state": "CA", "address": "628 Divisadero St",
+     "genres": ["Folk"], "seeking_talent_message": "Looking for folk bands"},
+    {"name": "Cafe Du Nord", "city": "San Francisco", "state": "CA", "address": "2170 Market St",
+     "genres": ["Jazz"]},
+]
+
+
+class ImporterTestCase(unittest.TestCase):
+    """Bulk imports of good and bad rows"""
+
+    def setUp(self):
+        """Create a venue and two artists with no shows."""
+        self.directory = tempfile.mkdtemp()
+        self.context = app.app_context()
+        self.context.push()
+        db.create_all()
+        venue = Venue(name="The Fillmore", city="San Francisco", state="CA", address="1805 Geary Blvd",
+                      genres=["Jazz"])
+        artists = [Artist(name="Artist %d" % i, city="San Francisco", state="CA", genres=["Jazz"])
+                   for i in range(2)]
+        db.session.add_all([venue] + artists)
+        db.session.commit()
+        self.venue_id = venue.id
+        self.artist_ids = [artist.id for artist in artists]
+        rebuild_genre_counts()
+
+    def tearDown(self):
+        """Drop every table."""
+        db.session.remove()
+        db.drop_all()
+        self.context.pop()
+        shutil.rmtree(self.directory)
+
+    def write_rows(self, rows):
+        # one line per row; strings are written as they are
+        path = os.path.join(self.directory, "rows.jsonl")
+        with open(path, "w", encoding="utf-8") as rows_file:
+            for row in rows:
+                rows_file.write((row if isinstance(row, str) else json.dumps(row)) + "\n")
+        return path
+
+    def genre_counts(self, kind):
+        return {row.genre: row.total for row in GenreCount.query.filter_by(kind=kind) if row.total}
+
+    def show_totals(self, kind):
+        return {row.object_id: row.total for row in ShowCount.query.filter_by(kind=kind)}
+
+    #----------------------------------------------------------------------------#
+    # Venues and artists.
+    #----------------------------------------------------------------------------#
+
+    def test_venue_import(self):
+        result = import_file("venues", self.write_rows(VENUE_ROWS), chunk_size=3)
+        self.assertEqual(result.inserted, 2)
+        # the listed Fillmore and the second Cafe Du Nord
+        self.assertEqual(result.skipped, 2)
+        self.assertEqual([(line, sorted(errors)) for line, errors in result.errors],
+                         [(2, ["line"]), (3, ["line"]), (4, ["city"]), (5, ["genres"])])
+
+        venues = {venue.name: venue for venue in Venue.query}
+        self.assertEqual(sorted(venues), ["Cafe Du Nord", "The Fillmore", "The Independent"])
+        self.assertFalse(venues["Cafe Du Nord"].seeking_talent)
+        self.assertTrue(venues["The Independent"].seeking_talent)
+        self.assertEqual(self.genre_counts("venue"), {"Jazz": 2, "Folk": 2})
+        self.assertEqual(self.genre_counts("artist"), {"Jazz": 2})
+
+    def test_rerun_inserts_nothing(self):
+        path = self.write_rows(VENUE_ROWS)
+        import_file("venues", path)
+        result = import_file("venues", path)
+        self.assertEqual(result.inserted, 0)
+        self.assertEqual(Venue.query.count(), 3)
+        self.assertEqual(self.genre_counts("venue"), {"Jazz": 2, "Folk": 2})
+
+    #----------------------------------------------------------------------------#
+    # Shows.
+    #----------------------------------------------------------------------------#
+
+    def show_row(self, artist, start_time, venue_id=None):
+        return {"venue_id": self.venue_id if venue_id is None else venue_id,
+                "artist_id": self.artist_ids[artist], "start_time": start_time}
+
+    def test_show_import(self):
+        rows = [
+            self.show_row(0, "2030-06-01 20:00"),
+            # overlaps the first show, at the same venue and within one chunk
+            self.show_row(1, "2030-06-01 21:00"),
+            self.show_row(1, "2030-06-02 20:00"),
+            self.show_row(0, "2030-06-03 20:00", venue_id=self.venue_id + 100),
+            {"venue_id": "x", "artist_id": self.artist_ids[0], "start_time": "2030-06-04 20:00"},
+            self.show_row(0, "next tuesday"),
+            "{",
+        ]
+        result = import_file("shows", self.write_rows(rows))
+        self.assertEqual(result.inserted, 2)
+        # the overlapping show and the one at an unknown venue
+        self.assertEqual(result.skipped, 2)
+        self.assertEqual([(line, sorted(errors)) for line, errors in result.errors],
+                         [(5, ["ids"]), (6, ["start_time"]), (7, ["line"])])
+
+        shows = [(show.artist_id, show.time) for show in Show.query.order_by(Show.time)]
+        self.assertEqual(shows, [(self.artist_ids[0], datetime(2030, 6, 1, 20, 0)),
+                                 (self.artist_ids[1], datetime(2030, 6, 2, 20, 0))])
+        feed = [(row.venue_name, row.artist_name, row.start_time)
+                for row in ShowFeed.query.order_by(ShowFeed.start_time)]
+        self.assertEqual(feed, [("The Fillmore", "Artist 0", datetime(2030, 6, 1, 20, 0)),
+                                ("The Fillmore", "Artist 1", datetime(2030, 6, 2, 20, 0))])
+        self.assertEqual(self.show_totals("venue"), {self.venue_id: 2})
+        self.assertEqual(self.show_totals("artist"), {self.artist_ids[0]: 1, self.artist_ids[1]: 1})
+
+    def test_shows_overlapping_an_earlier_chunk(self):
+        rows = [
+            self.show_row(0, "2030-06-01 20:00"),
+            self.show_row(1, "2030-06-05 20:00"),
+            self.show_row(1, "2030-06-01 22:00"),
+        ]
+        result = import_file("shows", self.write_rows(rows), chunk_size=2)
+        self.assertEqual((result.inserted, result.skipped, result.errors), (2, 1, []))
+        self.assertEqual(ShowFeed.query.count(), 2)
+        self.assertEqual(self.show_totals("venue"), {self.venue_id: 2})
+
+
+# Make the tests conveniently executable
+if __name__ == "__main__":
+    unittest.main()